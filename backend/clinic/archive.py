@@ -0,0 +1,100 @@
+"""
+Booking archive.
+Finished bookings (completed, cancelled, no-show, expired) older than BOOKING_ARCHIVE_DAYS
+are moved from Booking into ArchivedBooking in bounded batches, so slot counts, eligibility
+checks, booking lists and stats only scan recent and upcoming rows. Their ratings are
+re-pointed to the archived copy (Rating.archived_booking).
+
+Bookings still referenced by a rescheduling request, a reserved slot or a live booking's
+rescheduled_from stay live (deleting them would null the link); they follow once the
+booking that points at them has been archived.
+History reads both tiers (see BookingViewSet.history).
+
+A background thread runs this once a day; `python manage.py archive_bookings` runs it on demand.
+"""
+import threading
+import time
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_SECONDS = 24 * 60 * 60  # Once a day
+
+ARCHIVED_STATUSES = ['COMPLETED', 'CANCELLED', 'NO_SHOW', 'EXPIRED']
+
+ARCHIVED_FIELDS = [
+    'id', 'doctor_id', 'patient_id', 'is_walkin', 'walkin_patient_name', 'walkin_patient_phone',
+    'booking_datetime', 'number_of_people', 'is_overflow', 'status', 'booking_type', 'patient_notes',
+    'doctor_notes', 'cancellation_reason', 'created_at', 'updated_at', 'rescheduled_from_id', 'reminder_sent',
+]
+
+
+def archive_bookings(days=None, batch_size=None):
+    """Move old finished bookings to ArchivedBooking. Returns the number of bookings moved."""
+    from django.conf import settings
+    from django.db import transaction
+    from django.db.models import F
+    from django.utils import timezone
+    from .models import Booking, ArchivedBooking, Rating
+
+    days = days if days is not None else getattr(settings, 'BOOKING_ARCHIVE_DAYS', 365)
+    batch_size = batch_size or getattr(settings, 'BOOKING_ARCHIVE_BATCH_SIZE', 1000)
+    cutoff = timezone.now() - timedelta(days=days)
+
+    archivable = Booking.objects.filter(
+        booking_datetime__lt=cutoff,
+        status__in=ARCHIVED_STATUSES,
+        rescheduling_requests__isnull=True,
+        generated_from_request__isnull=True,
+        reserved_slot__isnull=True,
+        rescheduled_to_booking__isnull=True,
+    )
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                archivable.select_for_update().order_by('booking_datetime').values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not batch:
+                break
+            ids = [row['id'] for row in batch]
+
+            # Moving rows leaves the booking total (users/stats.py) unchanged: no counter to adjust
+            ArchivedBooking.objects.bulk_create([ArchivedBooking(**row) for row in batch], ignore_conflicts=True)
+            Rating.objects.filter(booking_id__in=ids).update(archived_booking_id=F('booking_id'), booking=None)
+            Booking.objects.filter(id__in=ids).delete()
+            total += len(batch)
+
+        if len(batch) < batch_size:
+            break
+
+    return total
+
+
+def _archive_loop():
+    """Background loop that archives old bookings once a day."""
+    from django.db import close_old_connections
+
+    # Wait 10 minutes after startup before the first run
+    time.sleep(10 * 60)
+
+    while True:
+        try:
+            moved = archive_bookings()
+            if moved:
+                logger.info(f"Archived {moved} booking(s)")
+        except Exception as e:
+            logger.error(f"Booking archive error: {e}")
+        finally:
+            close_old_connections()
+
+        time.sleep(INTERVAL_SECONDS)
+
+
+def start_booking_archive():
+    """Start the archive job as a daemon thread."""
+    thread = threading.Thread(target=_archive_loop, daemon=True)
+    thread.start()
+    logger.info("Booking archive job started (running daily)")
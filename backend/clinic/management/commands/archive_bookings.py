@@ -0,0 +1,23 @@
+"""
+Management command to move old finished bookings into the archive table.
+The in-process archive job already does this daily; this command can also be run from cron.
+
+Usage: python manage.py archive_bookings [--days 365] [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from clinic.archive import archive_bookings
+
+class Command(BaseCommand):
+    help = 'Moves finished bookings older than the archive horizon to ArchivedBooking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Archive horizon in days (default: BOOKING_ARCHIVE_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Bookings moved per transaction')
+
+    def handle(self, *args, **options):
+        moved = archive_bookings(days=options['days'], batch_size=options['batch_size'])
+
+        if moved > 0:
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} booking(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No bookings past the archive horizon'))
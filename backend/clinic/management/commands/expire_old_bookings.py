@@ -2,57 +2,169 @@
 Management command to expire old unhandled bookings.
 Run this at midnight or end of each day.
 
-Usage: python manage.py expire_old_bookings
+Walks the bookings from before today in (booking_datetime, id) order, in batches of
+--batch-size, so every UPDATE touches a bounded set of rows by primary key and holds its
+locks briefly. --sleep pauses between batches (e.g. to let replicas catch up).
+With --checkpoint, progress is written to that file after every batch and an interrupted
+run resumes from it; the file is removed once the run completes.
+
+Usage: python manage.py expire_old_bookings [--batch-size 1000] [--sleep 0] [--checkpoint PATH] [--dry-run]
 """
-from django.core.management.base import BaseCommand
+import json
+import logging
+import os
+import time
+from datetime import datetime, time as dt_time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from clinic.models import Booking
 
+logger = logging.getLogger(__name__)
+
+# status → (new status, cancellation reason, metrics label)
+TRANSITIONS = {
+    # 1. PENDING bookings → EXPIRED (no approval decision was made)
+    Booking.Status.PENDING: (
+        Booking.Status.EXPIRED,
+        'لم يتم اتخاذ قرار بشأن الموافقة - Expired: No approval decision made',
+        'expired',
+    ),
+    # 2. CONFIRMED bookings → NO_SHOW (approved but exam never started)
+    Booking.Status.CONFIRMED: (
+        Booking.Status.NO_SHOW,
+        'تمت الموافقة لكن لم يبدأ الفحص - No Show: Approved but exam never started',
+        'no-show',
+    ),
+    # 3. IN_PROGRESS bookings → EXPIRED (exam started but never completed)
+    Booking.Status.IN_PROGRESS: (
+        Booking.Status.EXPIRED,
+        'بدأ الفحص لكن لم يكتمل - Expired: Exam started but never completed',
+        'incomplete',
+    ),
+}
+
+
 class Command(BaseCommand):
     help = 'Marks old unhandled bookings as EXPIRED'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Bookings updated per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+        parser.add_argument('--checkpoint', default=None, help='File to record progress in and resume from')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the bookings each transition would change')
+
     def handle(self, *args, **options):
-        today = timezone.now().date()
-        total_updated = 0
-        
-        # 1. PENDING bookings → EXPIRED (no approval decision was made)
-        pending_expired = Booking.objects.filter(
-            booking_datetime__date__lt=today,
-            status=Booking.Status.PENDING
-        ).update(
-            status=Booking.Status.EXPIRED,
-            cancellation_reason='لم يتم اتخاذ قرار بشأن الموافقة - Expired: No approval decision made'
-        )
-        total_updated += pending_expired
-        
-        # 2. CONFIRMED bookings → NO_SHOW (approved but exam never started)
-        confirmed_noshow = Booking.objects.filter(
-            booking_datetime__date__lt=today,
-            status=Booking.Status.CONFIRMED
-        ).update(
-            status=Booking.Status.NO_SHOW,
-            cancellation_reason='تمت الموافقة لكن لم يبدأ الفحص - No Show: Approved but exam never started'
-        )
-        total_updated += confirmed_noshow
-        
-        # 3. IN_PROGRESS bookings → EXPIRED (exam started but never completed)
-        in_progress_expired = Booking.objects.filter(
-            booking_datetime__date__lt=today,
-            status=Booking.Status.IN_PROGRESS
-        ).update(
-            status=Booking.Status.EXPIRED,
-            cancellation_reason='بدأ الفحص لكن لم يكتمل - Expired: Exam started but never completed'
+        batch_size, checkpoint_path = options['batch_size'], options['checkpoint']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        # Same boundary as booking_datetime__date__lt=today, but as a range the index can use
+        cutoff = timezone.make_aware(datetime.combine(timezone.localdate(), dt_time.min))
+        position = self.load_checkpoint(checkpoint_path, cutoff)
+        if position:
+            self.stdout.write(f'Resuming after {position[0].isoformat()} ({position[1]})')
+
+        old_bookings = Booking.objects.filter(booking_datetime__lt=cutoff, status__in=list(TRANSITIONS))
+        if options['dry_run']:
+            return self.dry_run(self.after(old_bookings, position))
+
+        started = time.perf_counter()
+        updated = {label: 0 for _, _, label in TRANSITIONS.values()}
+        batches = scanned = 0
+        slowest_batch = 0.0
+
+        while True:
+            batch = list(
+                self.after(old_bookings, position)
+                .order_by('booking_datetime', 'id')
+                .values_list('id', 'booking_datetime', 'status')[:batch_size]
+            )
+            if not batch:
+                break
+
+            batch_started = time.perf_counter()
+            with transaction.atomic():
+                for status, (new_status, reason, label) in TRANSITIONS.items():
+                    ids = [booking_id for booking_id, _, booking_status in batch if booking_status == status]
+                    if ids:
+                        # Re-check the status: the booking may have been handled since it was read
+                        updated[label] += Booking.objects.filter(id__in=ids, status=status).update(
+                            status=new_status, cancellation_reason=reason
+                        )
+            slowest_batch = max(slowest_batch, time.perf_counter() - batch_started)
+            batches += 1
+            scanned += len(batch)
+
+            position = batch[-1][1], batch[-1][0]
+            self.save_checkpoint(checkpoint_path, cutoff, position)
+            if len(batch) < batch_size:
+                break
+            if options['sleep'] > 0:
+                time.sleep(options['sleep'])
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.perf_counter() - started
+        total_updated = sum(updated.values())
+        metrics = (
+            f'{batches} batch(es), {scanned} scanned, {total_updated} updated in {elapsed:.2f}s '
+            f'({scanned / max(elapsed, 1e-9):.0f} rows/s, slowest batch {slowest_batch * 1000:.0f}ms)'
         )
-        total_updated += in_progress_expired
-        
+        logger.info(f'expire_old_bookings: {metrics}; {updated}')
+        self.stdout.write(metrics)
+
         if total_updated > 0:
             self.stdout.write(
                 self.style.SUCCESS(
                     f'Updated {total_updated} booking(s): '
-                    f'{pending_expired} expired, {confirmed_noshow} no-show, {in_progress_expired} incomplete'
+                    f"{updated['expired']} expired, {updated['no-show']} no-show, {updated['incomplete']} incomplete"
                 )
             )
         else:
             self.stdout.write(
                 self.style.SUCCESS('No old bookings to update')
             )
+
+    def dry_run(self, queryset):
+        counts = dict(queryset.values_list('status').annotate(count=Count('id')).order_by())
+        for status, (new_status, _, label) in TRANSITIONS.items():
+            self.stdout.write(f'{status} → {new_status} ({label}): {counts.get(status, 0)}')
+        self.stdout.write(self.style.SUCCESS(f'Dry run: {sum(counts.values())} booking(s) would be updated'))
+
+    @staticmethod
+    def after(queryset, position):
+        """Bookings after the (booking_datetime, id) position"""
+        if position is None:
+            return queryset
+        booking_datetime, booking_id = position
+        return queryset.filter(
+            Q(booking_datetime__gt=booking_datetime) | Q(booking_datetime=booking_datetime, id__gt=booking_id)
+        )
+
+    def load_checkpoint(self, path, cutoff):
+        if not path or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if parse_datetime(checkpoint['cutoff']) != cutoff:
+            # Left over from an earlier day's run: every booking before the new cutoff is in scope again
+            self.stdout.write('Ignoring checkpoint from a previous day')
+            return None
+        return parse_datetime(checkpoint['booking_datetime']), checkpoint['id']
+
+    @staticmethod
+    def save_checkpoint(path, cutoff, position):
+        if not path:
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'cutoff': cutoff.isoformat(),
+                'booking_datetime': position[0].isoformat(),
+                'id': str(position[1]),
+            }, f)
+        os.replace(tmp_path, path)
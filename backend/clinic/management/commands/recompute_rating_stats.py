@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the doctors' denormalized rating aggregates
+(rating_sum / rating_count / rating_avg and the rating_N_count star histogram) from the
+Rating table, fixing any drift.
+
+Usage: python manage.py recompute_rating_stats
+"""
+from django.core.management.base import BaseCommand
+from clinic.rating_stats import recompute_rating_stats
+
+class Command(BaseCommand):
+    help = "Recomputes the doctors' rating aggregates from their public ratings"
+
+    def handle(self, *args, **options):
+        fixed = recompute_rating_stats()
+
+        if fixed > 0:
+            self.stdout.write(self.style.SUCCESS(f'Fixed the rating aggregates of {fixed} doctor(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All rating aggregates are up to date'))
@@ -0,0 +1,23 @@
+"""
+Management command to run the background jobs (core/background.py) in their own process:
+booking reminders, booking archive, rescheduling offer expiry, notification retention and
+the email worker pool. Run exactly one of these next to the web server processes.
+
+Usage: python manage.py runworkers
+"""
+import time
+from django.core.management.base import BaseCommand
+from core.background import BACKGROUND_JOBS, start_background_jobs
+
+class Command(BaseCommand):
+    help = 'Runs the background jobs until interrupted'
+
+    def handle(self, *args, **options):
+        start_background_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Started {len(BACKGROUND_JOBS)} background job(s); Ctrl+C to stop'))
+        try:
+            while True:
+                # The jobs are daemon threads: keep the process alive
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping background jobs')
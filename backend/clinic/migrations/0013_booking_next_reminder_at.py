@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:55
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compute_next_reminder_at(created_at, booking_datetime):
+    """Copy of clinic.reminder_scheduler.compute_next_reminder_at as of this migration."""
+    start = max(created_at + timedelta(hours=12), booking_datetime - timedelta(hours=2))
+    if start < min(created_at + timedelta(hours=48), booking_datetime):
+        return start
+
+    start = max(created_at + timedelta(hours=48), booking_datetime - timedelta(hours=24))
+    if start < booking_datetime:
+        return start
+
+    return None
+
+
+def backfill_next_reminder_at(apps, schema_editor):
+    """Compute next_reminder_at for the future bookings still waiting for a reminder."""
+    Booking = apps.get_model('clinic', 'Booking')
+    pending = Booking.objects.filter(
+        reminder_sent=False, booking_datetime__gt=timezone.now(), is_walkin=False, patient__isnull=False
+    ).only('id', 'created_at', 'booking_datetime')
+
+    batch = []
+    for booking in pending.iterator(chunk_size=1000):
+        booking.next_reminder_at = compute_next_reminder_at(booking.created_at, booking.booking_datetime)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ['next_reminder_at'])
+            batch = []
+    Booking.objects.bulk_update(batch, ['next_reminder_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0012_booking_reminder_sent'),
+        ('users', '0007_secretary_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['reminder_sent', 'next_reminder_at'], name='booking_reminder_due_idx'),
+        ),
+        migrations.RunPython(backfill_next_reminder_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0013_booking_next_reminder_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_claim',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
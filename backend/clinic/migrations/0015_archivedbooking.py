@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0014_booking_reminder_claim'),
+        ('users', '0007_secretary_permissions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rating',
+            name='booking',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rating', to='clinic.booking'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('is_walkin', models.BooleanField(default=False)),
+                ('walkin_patient_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('walkin_patient_phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('booking_datetime', models.DateTimeField()),
+                ('number_of_people', models.PositiveIntegerField(default=1)),
+                ('is_overflow', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('IN_PROGRESS', 'In Progress'), ('CANCELLED', 'Cancelled'), ('COMPLETED', 'Completed'), ('NO_SHOW', 'No Show'), ('EXPIRED', 'Expired - No Action Taken'), ('RESCHEDULING_PENDING', 'Rescheduling Pending')], max_length=30)),
+                ('booking_type', models.CharField(choices=[('NEW', 'New Patient'), ('FOLLOWUP', 'Follow-up')], default='NEW', max_length=20)),
+                ('patient_notes', models.TextField(blank=True, null=True)),
+                ('doctor_notes', models.TextField(blank=True, null=True)),
+                ('cancellation_reason', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('rescheduled_from_id', models.UUIDField(blank=True, null=True)),
+                ('reminder_sent', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='users.doctor')),
+                ('patient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to='users.patient')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rating',
+            name='archived_booking',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rating', to='clinic.archivedbooking'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['doctor', 'booking_datetime'], name='archived_booking_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['patient', 'booking_datetime'], name='archived_booking_patient_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0015_archivedbooking'),
+        ('users', '0025_doctor_facet_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['doctor', '-created_at'], name='rating_doctor_recent_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from users.models import Doctor, Patient
 from users.models import User # For ActivityLog actor
+from users.directory_cache import invalidate_booking_page
 
 class Booking(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -54,10 +56,85 @@ class Booking(models.Model):
 
     # Email Reminder
     reminder_sent = models.BooleanField(default=False)
+    # When the reminder is due (see clinic/reminder_scheduler.py); NULL = no reminder.
+    # Computed by save() from created_at and booking_datetime. Queryset .update() calls bypass
+    # save(): those that cancel a booking clear it, none may change booking_datetime.
+    next_reminder_at = models.DateTimeField(null=True, blank=True)
+    # Batch that claimed (and sent) the reminder
+    reminder_claim = models.UUIDField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reminder_sent', 'next_reminder_at'], name='booking_reminder_due_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .reminder_scheduler import compute_next_reminder_at, schedule_reminder
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'booking_datetime' in update_fields:
+            if self.is_walkin or self.patient_id is None:
+                self.next_reminder_at = None
+            else:
+                # Some views pass booking_datetime as an ISO string
+                booking_datetime = self._meta.get_field('booking_datetime').to_python(self.booking_datetime)
+                if timezone.is_naive(booking_datetime):
+                    booking_datetime = timezone.make_aware(booking_datetime)
+                self.next_reminder_at = compute_next_reminder_at(self.created_at or timezone.now(), booking_datetime)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'next_reminder_at'}
+        super(Booking, self).save(*args, **kwargs)
+
+        if self.next_reminder_at and not self.reminder_sent and self.next_reminder_at > timezone.now():
+            next_reminder_at = self.next_reminder_at
+            transaction.on_commit(lambda: schedule_reminder(next_reminder_at))
+        # Slot occupancy on the doctor's booking page
+        invalidate_booking_page(self.doctor_id)
+
+    def delete(self, *args, **kwargs):
+        from users.stats import bump_counter, BOOKINGS
+        invalidate_booking_page(self.doctor_id)
+        bump_counter(BOOKINGS, -1)
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"Booking {self.id} - {self.doctor} / {self.patient} ({self.status})"
 
+class ArchivedBooking(models.Model):
+    """
+    Finished bookings (completed, cancelled, no-show, expired) older than BOOKING_ARCHIVE_DAYS,
+    moved out of Booking by the archive job (see clinic/archive.py) so the live table only holds
+    recent and upcoming bookings. Keeps the original id; ratings follow via Rating.archived_booking.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_bookings')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='archived_bookings', null=True, blank=True)
+    is_walkin = models.BooleanField(default=False)
+    walkin_patient_name = models.CharField(max_length=255, blank=True, null=True)
+    walkin_patient_phone = models.CharField(max_length=20, blank=True, null=True)
+    booking_datetime = models.DateTimeField()
+    number_of_people = models.PositiveIntegerField(default=1)
+    is_overflow = models.BooleanField(default=False)
+    status = models.CharField(max_length=30, choices=Booking.Status.choices)
+    booking_type = models.CharField(max_length=20, choices=Booking.BookingType.choices, default=Booking.BookingType.NEW)
+    patient_notes = models.TextField(blank=True, null=True)
+    doctor_notes = models.TextField(blank=True, null=True)
+    cancellation_reason = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    rescheduled_from_id = models.UUIDField(null=True, blank=True)  # Live or archived booking
+    reminder_sent = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'booking_datetime'], name='archived_booking_doctor_idx'),
+            models.Index(fields=['patient', 'booking_datetime'], name='archived_booking_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived booking {self.id} - {self.doctor} / {self.patient} ({self.status})"
+
 class ActivityLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='activity_logs')
@@ -88,7 +165,9 @@ class ActivityLog(models.Model):
 
 class Rating(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='rating')
+    # Exactly one of booking / archived_booking is set once the booking has been archived
+    booking = models.OneToOneField(Booking, on_delete=models.SET_NULL, related_name='rating', null=True, blank=True)
+    archived_booking = models.OneToOneField(ArchivedBooking, on_delete=models.SET_NULL, related_name='rating', null=True, blank=True)
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='ratings')
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='ratings')
     
@@ -99,5 +178,11 @@ class Rating(models.Model):
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A doctor's ratings, newest first (RatingViewSet cursor pagination)
+            models.Index(fields=['doctor', '-created_at'], name='rating_doctor_recent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.stars} Stars for {self.doctor}"
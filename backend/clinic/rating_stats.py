@@ -0,0 +1,89 @@
+"""
+Denormalized rating aggregates.
+Doctor.rating_sum / rating_count / rating_avg summarize the doctor's public ratings so doctor
+lists don't aggregate the Rating table per card, and sorting by rating uses an index.
+Doctor.rating_1_count ... rating_5_count hold the star histogram.
+RatingViewSet updates them in the same transaction as the rating itself;
+`python manage.py recompute_rating_stats` rebuilds them from the Rating table.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+
+
+def _contribution(rating):
+    """(doctor_id, stars, count) that a rating adds to its doctor's aggregates"""
+    if rating is None or not rating.is_public:
+        return None
+    return rating.doctor_id, rating.stars, 1
+
+
+def _refresh_average(doctor_ids=None):
+    from users.models import Doctor
+
+    doctors = Doctor.objects.all() if doctor_ids is None else Doctor.objects.filter(id__in=doctor_ids)
+    # Separate UPDATE so rating_sum / rating_count already hold their new values
+    doctors.update(rating_avg=Case(
+        When(rating_count=0, then=Value(0)),
+        default=ExpressionWrapper(F('rating_sum') * 1.0 / F('rating_count'), output_field=DecimalField()),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    ))
+
+
+def update_rating_stats(old=None, new=None):
+    """
+    Apply a rating change to the doctors' aggregates. old / new are the rating before and
+    after the change (None when it is created / deleted). Call inside the transaction that
+    saves the rating.
+    """
+    from users.models import Doctor
+
+    deltas = {}
+    for contribution, sign in ((_contribution(old), -1), (_contribution(new), 1)):
+        if contribution:
+            doctor_id, stars, count = contribution
+            delta = deltas.setdefault(doctor_id, Counter())
+            delta['rating_sum'] += sign * stars
+            delta['rating_count'] += sign * count
+            delta[f'rating_{stars}_count'] += sign * count
+
+    changed = []
+    for doctor_id, delta in deltas.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            Doctor.objects.filter(id=doctor_id).update(**{field: F(field) + value for field, value in delta.items()})
+            changed.append(doctor_id)
+    if changed:
+        _refresh_average(changed)
+        from users.directory_cache import invalidate_doctor_directory
+        transaction.on_commit(invalidate_doctor_directory)
+
+
+def recompute_rating_stats():
+    """Rebuild every doctor's aggregates from the Rating table. Returns the number of doctors fixed."""
+    from users.models import Doctor
+
+    public = Q(ratings__is_public=True)
+    histogram = {
+        f'rating_{stars}_count': Count('ratings', filter=public & Q(ratings__stars=stars)) for stars in range(1, 6)
+    }
+    fields = ['rating_sum', 'rating_count', *histogram]
+    doctors = Doctor.objects.annotate(
+        actual_rating_sum=Sum('ratings__stars', filter=public, default=0),
+        actual_rating_count=Count('ratings', filter=public),
+        **{f'actual_{field}': aggregate for field, aggregate in histogram.items()},
+    ).values('id', *fields, *[f'actual_{field}' for field in fields])
+
+    drifted = []
+    for doctor in doctors:
+        actual = {field: doctor[f'actual_{field}'] for field in fields}
+        if any(doctor[field] != value for field, value in actual.items()):
+            drifted.append((doctor['id'], actual))
+    with transaction.atomic():
+        for doctor_id, actual in drifted:
+            Doctor.objects.filter(id=doctor_id).update(**actual)
+        _refresh_average()
+        if drifted:
+            from users.directory_cache import invalidate_doctor_directory
+            transaction.on_commit(invalidate_doctor_directory)
+    return len(drifted)
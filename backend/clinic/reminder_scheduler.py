@@ -1,103 +1,190 @@
 """
 Booking Reminder Scheduler
 Runs as a background thread within the Django process.
-Checks every 30 minutes for bookings that need reminders sent.
 
 Smart reminder logic:
 - Booked days before → remind the day before the appointment
 - Booked 1 day before → remind 2 hours before appointment
 - Booked only hours before → no reminder (too recent)
+
+The rules are evaluated once per booking, when it is saved: Booking.next_reminder_at holds
+the moment its reminder is due (NULL when it gets none). The scheduler only fetches rows that
+are due, and sleeps until the earliest upcoming next_reminder_at (a heap of due times, fed
+from the DB and by Booking.save) instead of re-checking every booking on a fixed interval.
+Booking.save only feeds the heap in the process running the scheduler; bookings saved in
+other processes (web workers when it runs under `manage.py runworkers`) are picked up by the
+next DB check, at most INTERVAL_SECONDS later.
 """
+import heapq
 import threading
 import time
+import uuid
 import logging
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
-INTERVAL_SECONDS = 30 * 60  # Check every 30 minutes
+# Longest sleep between checks: picks up bookings saved by other processes
+INTERVAL_SECONDS = 30 * 60
 
+_due_times = []  # Heap of upcoming next_reminder_at values
+_due_times_lock = threading.Lock()
+_wakeup = threading.Event()
+_scheduler_running = False  # Whether this process runs the scheduler thread
 
-def send_booking_reminders():
-    """Check for bookings that need reminders and send them."""
+
+def compute_next_reminder_at(created_at, booking_datetime):
+    """When the reminder for a booking made at created_at is due, or None if it gets none."""
+    # Case 2: Booked ~1 day before (12-48 hours ago) → remind 2 hours before
+    start = max(created_at + timedelta(hours=12), booking_datetime - timedelta(hours=2))
+    if start < min(created_at + timedelta(hours=48), booking_datetime):
+        return start
+
+    # Case 1: Booked days before (48+ hours ago) → remind within the last 24 hours
+    start = max(created_at + timedelta(hours=48), booking_datetime - timedelta(hours=24))
+    if start < booking_datetime:
+        return start
+
+    # Case 3: Booked only hours before → no reminder
+    return None
+
+
+def schedule_reminder(when):
+    """Wake the scheduler at `when` (called by Booking.save once the booking is committed)."""
+    if not _scheduler_running:
+        # Nothing pops the heap in this process
+        return
+    with _due_times_lock:
+        is_earliest = not _due_times or when < _due_times[0]
+        heapq.heappush(_due_times, when)
+    if is_earliest:
+        # The scheduler is sleeping until a later time
+        _wakeup.set()
+
+
+def _seconds_until_next_due():
     from django.utils import timezone
-    from clinic.models import Booking
-    from core.email_service import send_dynamic_email
 
     now = timezone.now()
+    with _due_times_lock:
+        # Drop the times that have just been handled
+        while _due_times and _due_times[0] <= now:
+            heapq.heappop(_due_times)
+        if not _due_times:
+            return INTERVAL_SECONDS
+        return min(max((_due_times[0] - now).total_seconds(), 0), INTERVAL_SECONDS)
+
+
+def _reminder_candidates():
+    from django.utils import timezone
+    from clinic.models import Booking
 
-    # Get all confirmed/pending bookings that haven't had reminders sent yet
-    upcoming_bookings = Booking.objects.filter(
+    return Booking.objects.filter(
         status__in=['CONFIRMED', 'PENDING'],
         reminder_sent=False,
-        booking_datetime__gt=now,
+        booking_datetime__gt=timezone.now(),
         is_walkin=False,  # Only for registered patients
         patient__isnull=False,
-    ).select_related('patient__user', 'doctor__user')
+    )
 
-    for booking in upcoming_bookings:
-        try:
-            time_until_appointment = booking.booking_datetime - now
-            time_since_booked = now - booking.created_at
-            hours_until = time_until_appointment.total_seconds() / 3600
-            hours_since_booked = time_since_booked.total_seconds() / 3600
-
-            should_send = False
-
-            # Case 1: Booked days before → remind when it's the day before (within 24 hours)
-            if hours_since_booked >= 48 and hours_until <= 24:
-                should_send = True
-
-            # Case 2: Booked ~1 day before → remind 2 hours before
-            elif 12 <= hours_since_booked < 48 and hours_until <= 2:
-                should_send = True
-
-            # Case 3: Booked only hours before → no reminder
-            # (hours_since_booked < 12 → skip)
-
-            if should_send:
-                patient_user = booking.patient.user
-                doctor_user = booking.doctor.user
-
-                appointment_date = booking.booking_datetime.strftime('%Y-%m-%d')
-                appointment_time = booking.booking_datetime.strftime('%I:%M %p')
-
-                send_dynamic_email(
-                    subject='تذكير بموعدك - عيادتك الرقمية',
-                    template_name='emails/booking_reminder.html',
-                    context={
-                        'patient_name': patient_user.first_name or patient_user.email,
-                        'doctor_name': f'{doctor_user.first_name} {doctor_user.last_name}',
-                        'appointment_date': appointment_date,
-                        'appointment_time': appointment_time,
-                    },
-                    recipient_list=[patient_user.email]
-                )
-
-                booking.reminder_sent = True
-                booking.save(update_fields=['reminder_sent'])
-                logger.info(f"Reminder sent for booking {booking.id} to {patient_user.email}")
 
+def _claim_due_reminders(now, batch_size):
+    """
+    Mark up to batch_size due reminders as sent with one UPDATE and return the claimed bookings.
+    The UPDATE only matches rows still reminder_sent=False, so concurrent runners never get
+    the same booking; the claim token tells this runner which rows it won.
+    """
+    from clinic.models import Booking
+
+    due_ids = list(
+        _reminder_candidates().filter(next_reminder_at__lte=now)
+        .order_by('next_reminder_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not due_ids:
+        return []
+
+    claim = uuid.uuid4()
+    Booking.objects.filter(id__in=due_ids, reminder_sent=False).update(reminder_sent=True, reminder_claim=claim)
+    return list(Booking.objects.filter(reminder_claim=claim).select_related('patient__user', 'doctor__user'))
+
+
+def _reminder_email(booking):
+    patient_user = booking.patient.user
+    doctor_user = booking.doctor.user
+
+    return (
+        'تذكير بموعدك - عيادتك الرقمية',
+        'emails/booking_reminder.html',
+        {
+            'patient_name': patient_user.first_name or patient_user.email,
+            'doctor_name': f'{doctor_user.first_name} {doctor_user.last_name}',
+            'appointment_date': booking.booking_datetime.strftime('%Y-%m-%d'),
+            'appointment_time': booking.booking_datetime.strftime('%I:%M %p'),
+        },
+        [patient_user.email],
+    )
+
+
+def send_booking_reminders():
+    """Send the reminders that are due and return the next upcoming due time (or None)."""
+    from django.conf import settings
+    from django.db import transaction
+    from django.db.models import Min
+    from django.utils import timezone
+    from core.email_service import enqueue_emails
+
+    now = timezone.now()
+    batch_size = getattr(settings, 'REMINDER_BATCH_SIZE', 200)
+
+    while True:
+        try:
+            # Claim and queue in one transaction: if queueing fails the claim is rolled back
+            with transaction.atomic():
+                bookings = _claim_due_reminders(now, batch_size)
+                if not bookings:
+                    break
+                # One INSERT for the whole batch; the email workers send it over their open SMTP connections
+                enqueue_emails([_reminder_email(booking) for booking in bookings])
         except Exception as e:
-            logger.error(f"Error sending reminder for booking {booking.id}: {e}")
+            logger.error(f"Error sending booking reminders: {e}")
+            break
+        logger.info(f"Queued {len(bookings)} booking reminder(s)")
+        if len(bookings) < batch_size:
+            break
+
+    return _reminder_candidates().filter(next_reminder_at__gt=now).aggregate(
+        next_due=Min('next_reminder_at')
+    )['next_due']
 
 
 def _scheduler_loop():
-    """Background loop that runs the reminder check periodically."""
+    """Background loop: send due reminders, then sleep until the next one is due."""
+    from django.db import close_old_connections
+
     # Wait 60 seconds after startup before first check
     time.sleep(60)
-    
+
     while True:
+        _wakeup.clear()
         try:
-            send_booking_reminders()
+            next_due = send_booking_reminders()
+            if next_due is not None:
+                with _due_times_lock:
+                    if next_due not in _due_times:
+                        heapq.heappush(_due_times, next_due)
         except Exception as e:
             logger.error(f"Reminder scheduler error: {e}")
-        
-        time.sleep(INTERVAL_SECONDS)
+        finally:
+            # Don't hold this thread's DB connection open while sleeping
+            close_old_connections()
+
+        _wakeup.wait(_seconds_until_next_due())
 
 
 def start_reminder_scheduler():
     """Start the scheduler as a daemon thread."""
+    global _scheduler_running
+    _scheduler_running = True
     thread = threading.Thread(target=_scheduler_loop, daemon=True)
     thread.start()
-    logger.info("Booking reminder scheduler started (checking every 30 minutes)")
+    logger.info("Booking reminder scheduler started")
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Booking, Rating, ActivityLog
+from .models import Booking, ArchivedBooking, Rating, ActivityLog
 
 class BookingSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
@@ -15,15 +15,34 @@ class BookingSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at', 'status', 'patient', 'is_rated']
 
+class ArchivedBookingSerializer(serializers.ModelSerializer):
+    doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
+    patient_name = serializers.CharField(source='patient.user.get_full_name', read_only=True)
+    patient_email = serializers.EmailField(source='patient.user.email', read_only=True)
+    is_rated = serializers.SerializerMethodField()
+    is_archived = serializers.SerializerMethodField()
+
+    def get_is_rated(self, obj):
+        return hasattr(obj, 'rating')
+
+    def get_is_archived(self, obj):
+        return True
+
+    class Meta:
+        model = ArchivedBooking
+        exclude = ['archived_at']
+
 class RatingSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
     patient_name = serializers.CharField(source='patient.user.get_full_name', read_only=True)
     
     class Meta:
         model = Rating
-        fields = ['id', 'booking', 'doctor', 'patient', 'doctor_name', 'patient_name', 
+        fields = ['id', 'booking', 'archived_booking', 'doctor', 'patient', 'doctor_name', 'patient_name', 
                   'stars', 'comment', 'doctor_response', 'is_public', 'created_at']
-        read_only_fields = ['id', 'created_at', 'patient', 'doctor_name', 'patient_name']
+        read_only_fields = ['id', 'created_at', 'patient', 'doctor_name', 'patient_name', 'archived_booking']
+        # Only null once the booking has been archived
+        extra_kwargs = {'booking': {'required': True, 'allow_null': False}}
 
 class ActivityLogSerializer(serializers.ModelSerializer):
     actor_name = serializers.SerializerMethodField()
@@ -1,3 +1,416 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import User, Doctor, Patient, OutboundEmail
+from .models import Booking, ArchivedBooking, Rating
+from . import reminder_scheduler
+from .archive import archive_bookings
+from .rating_stats import recompute_rating_stats
+from .reminder_scheduler import compute_next_reminder_at, send_booking_reminders, _claim_due_reminders
+
+
+def make_doctor_and_patient(tag):
+    doctor_user = User.objects.create_user(
+        email=f'doctor-{tag}@example.com', password='x', role=User.Role.DOCTOR, first_name='Doc', last_name=tag
+    )
+    doctor = Doctor.objects.create(user=doctor_user, specialty='Cardiology', is_verified=True)
+    patient_user = User.objects.create_user(
+        email=f'patient-{tag}@example.com', password='x', role=User.Role.PATIENT, first_name='Pat', last_name=tag
+    )
+    patient = Patient.objects.create(user=patient_user)
+    return doctor, patient
+
+
+class RatingStatsTests(APITestCase):
+    """Doctor.rating_* aggregates and star histogram follow every rating write (clinic/rating_stats.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, self.patient = make_doctor_and_patient('ratings')
+        self.client.force_authenticate(self.patient.user)
+
+    def make_booking(self):
+        return Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=timezone.now() - timedelta(days=1), status=Booking.Status.COMPLETED
+        )
+
+    def assertStats(self, rating_sum, rating_count, histogram):
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.rating_sum, rating_sum)
+        self.assertEqual(self.doctor.rating_count, rating_count)
+        self.assertAlmostEqual(float(self.doctor.rating_avg), rating_sum / rating_count if rating_count else 0, places=2)
+        self.assertEqual(self.doctor.rating_histogram, {str(stars): histogram.get(stars, 0) for stars in range(1, 6)})
+
+    def rate(self, stars):
+        response = self.client.post('/api/clinic/ratings/', {
+            'booking': str(self.make_booking().id), 'doctor': str(self.doctor.id), 'stars': stars
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def test_create(self):
+        self.rate(5)
+        self.rate(3)
+        self.assertStats(8, 2, {5: 1, 3: 1})
+
+    def test_update_stars(self):
+        rating_id = self.rate(5)
+        self.client.patch(f'/api/clinic/ratings/{rating_id}/', {'stars': 2}, format='json')
+        self.assertStats(2, 1, {2: 1})
+
+    def test_visibility_toggle(self):
+        rating_id = self.rate(4)
+        self.rate(2)
+        self.client.patch(f'/api/clinic/ratings/{rating_id}/', {'is_public': False}, format='json')
+        self.assertStats(2, 1, {2: 1})
+        self.client.patch(f'/api/clinic/ratings/{rating_id}/', {'is_public': True}, format='json')
+        self.assertStats(6, 2, {4: 1, 2: 1})
+
+    def test_delete(self):
+        rating_id = self.rate(4)
+        self.rate(1)
+        response = self.client.delete(f'/api/clinic/ratings/{rating_id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertStats(1, 1, {1: 1})
+        self.assertEqual(recompute_rating_stats(), 0)
+
+    def test_delete_hidden_rating(self):
+        rating_id = self.rate(4)
+        self.client.patch(f'/api/clinic/ratings/{rating_id}/', {'is_public': False}, format='json')
+        self.client.delete(f'/api/clinic/ratings/{rating_id}/')
+        self.assertStats(0, 0, {})
+
+    def test_recompute_fixes_drift(self):
+        self.rate(5)
+        # Written behind the view's back
+        Rating.objects.create(booking=self.make_booking(), doctor=self.doctor, patient=self.patient, stars=1)
+        self.assertEqual(recompute_rating_stats(), 1)
+        self.assertStats(6, 2, {5: 1, 1: 1})
+
+    def test_summary(self):
+        self.rate(5)
+        self.rate(4)
+        response = self.client.get('/api/clinic/ratings/summary/', {'doctor_id': str(self.doctor.id)})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['average'], 4.5)
+        self.assertEqual(response.data['histogram'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+        self.assertNotIn('pending_responses', response.data)
+
+    def test_own_summary_counts_pending_responses(self):
+        self.rate(5)
+        rating_id = self.rate(2)
+        self.client.force_authenticate(self.doctor.user)
+        self.client.post(f'/api/clinic/ratings/{rating_id}/respond/', {'response': 'Thanks'}, format='json')
+
+        response = self.client.get('/api/clinic/ratings/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['pending_responses'], 1)
+        self.assertEqual(self.client.get('/api/clinic/ratings/summary/', {'doctor_id': 'nope'}).status_code, 404)
+
+
+class RatingPaginationTests(APITestCase):
+    """A doctor's public ratings are cursor-paginated, newest first"""
+
+    def setUp(self):
+        self.doctor, self.patient = make_doctor_and_patient('pages')
+        now = timezone.now()
+        self.ratings = []
+        for days_ago in range(5):
+            rating = Rating.objects.create(doctor=self.doctor, patient=self.patient, stars=5 - days_ago % 5)
+            Rating.objects.filter(id=rating.id).update(created_at=now - timedelta(days=days_ago))
+            self.ratings.append(str(rating.id))
+        Rating.objects.create(doctor=self.doctor, patient=self.patient, stars=1, is_public=False)
+
+    def test_pages_follow_next(self):
+        response = self.client.get('/api/clinic/ratings/', {'doctor_id': str(self.doctor.id), 'page_size': 2})
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, self.ratings)
+
+    def test_patient_sees_all_their_ratings_unpaginated(self):
+        self.client.force_authenticate(self.patient.user)
+        response = self.client.get('/api/clinic/ratings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 6)
+
+
+class ComputeNextReminderAtTests(SimpleTestCase):
+    def setUp(self):
+        self.created_at = timezone.now()
+
+    def due(self, hours_ahead):
+        return compute_next_reminder_at(self.created_at, self.created_at + timedelta(hours=hours_ahead))
+
+    def test_booked_days_before_reminds_the_day_before(self):
+        self.assertEqual(self.due(5 * 24), self.created_at + timedelta(hours=5 * 24 - 24))
+
+    def test_booked_a_day_before_reminds_two_hours_before(self):
+        self.assertEqual(self.due(30), self.created_at + timedelta(hours=28))
+
+    def test_booked_hours_before_gets_no_reminder(self):
+        self.assertIsNone(self.due(6))
+        self.assertIsNone(self.due(12))
+
+    def test_reminder_is_not_due_before_the_booking_settles(self):
+        # Booked 60 hours ahead: the day-before window opens at 36h, but not before 48h after booking
+        self.assertEqual(self.due(60), self.created_at + timedelta(hours=48))
+
+
+class ReminderClaimTests(TestCase):
+    def setUp(self):
+        self.doctor, self.patient = make_doctor_and_patient('reminders')
+
+    def make_booking(self, hours_ahead, **fields):
+        return Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=timezone.now() + timedelta(hours=hours_ahead), **fields
+        )
+
+    def test_save_computes_next_reminder_at(self):
+        booking = self.make_booking(5 * 24, status=Booking.Status.CONFIRMED)
+        self.assertEqual(booking.next_reminder_at, compute_next_reminder_at(booking.created_at, booking.booking_datetime))
+
+        booking.booking_datetime = timezone.now() + timedelta(hours=3)
+        booking.save(update_fields=['booking_datetime'])
+        booking.refresh_from_db()
+        self.assertIsNone(booking.next_reminder_at)
+
+    def test_walkin_gets_no_reminder(self):
+        booking = Booking.objects.create(
+            doctor=self.doctor, is_walkin=True, walkin_patient_name='Walk-in',
+            booking_datetime=timezone.now() + timedelta(days=5)
+        )
+        self.assertIsNone(booking.next_reminder_at)
+
+    def test_due_reminders_are_claimed_once(self):
+        due = self.make_booking(5 * 24, status=Booking.Status.CONFIRMED)
+        later = self.make_booking(5 * 24, status=Booking.Status.CONFIRMED)
+        cancelled = self.make_booking(5 * 24, status=Booking.Status.CANCELLED)
+        now = timezone.now()
+        Booking.objects.filter(id__in=[due.id, cancelled.id]).update(next_reminder_at=now - timedelta(minutes=1))
+
+        claimed = _claim_due_reminders(now, batch_size=10)
+        self.assertEqual([booking.id for booking in claimed], [due.id])
+        self.assertTrue(Booking.objects.get(id=due.id).reminder_sent)
+        self.assertFalse(Booking.objects.get(id=later.id).reminder_sent)
+        self.assertEqual(_claim_due_reminders(now, batch_size=10), [])
+
+    def test_claim_respects_batch_size(self):
+        bookings = [self.make_booking(5 * 24, status=Booking.Status.PENDING) for _ in range(3)]
+        now = timezone.now()
+        Booking.objects.filter(id__in=[booking.id for booking in bookings]).update(next_reminder_at=now - timedelta(minutes=1))
+
+        self.assertEqual(len(_claim_due_reminders(now, batch_size=2)), 2)
+        self.assertEqual(len(_claim_due_reminders(now, batch_size=2)), 1)
+
+    def test_heap_is_only_fed_where_the_scheduler_runs(self):
+        with mock.patch.object(reminder_scheduler, '_due_times', []) as due_times:
+            with mock.patch.object(reminder_scheduler, '_scheduler_running', False), self.captureOnCommitCallbacks(execute=True):
+                self.make_booking(5 * 24, status=Booking.Status.CONFIRMED)
+            self.assertEqual(due_times, [])
+
+            with mock.patch.object(reminder_scheduler, '_scheduler_running', True), self.captureOnCommitCallbacks(execute=True):
+                booking = self.make_booking(5 * 24, status=Booking.Status.CONFIRMED)
+            self.assertEqual(due_times, [booking.next_reminder_at])
+
+
+@override_settings(REMINDER_BATCH_SIZE=2)
+class ReminderDispatchTests(TestCase):
+    def setUp(self):
+        self.doctor, self.patient = make_doctor_and_patient('dispatch')
+        self.now = timezone.now()
+
+    def make_booking(self, due_in):
+        booking = Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=self.now + timedelta(days=5), status=Booking.Status.CONFIRMED
+        )
+        Booking.objects.filter(id=booking.id).update(next_reminder_at=self.now + due_in)
+        return booking
+
+    def test_due_reminders_are_queued_in_batches(self):
+        due = [self.make_booking(-timedelta(minutes=minutes)) for minutes in (1, 2, 3)]
+        upcoming = self.make_booking(timedelta(hours=1))
+
+        # Returns when to wake up next
+        self.assertEqual(send_booking_reminders(), Booking.objects.get(id=upcoming.id).next_reminder_at)
+        self.assertEqual(list(OutboundEmail.objects.values_list('recipients', flat=True)), [[self.patient.user.email]] * 3)
+        self.assertEqual(Booking.objects.filter(id__in=[booking.id for booking in due], reminder_sent=True).count(), 3)
+        self.assertFalse(Booking.objects.get(id=upcoming.id).reminder_sent)
+
+    def test_failed_queueing_releases_the_claim(self):
+        booking = self.make_booking(-timedelta(minutes=1))
+        with mock.patch('core.email_service.enqueue_emails', side_effect=RuntimeError('down')), \
+                self.assertLogs('clinic.reminder_scheduler', 'ERROR'):
+            send_booking_reminders()
+        self.assertFalse(Booking.objects.get(id=booking.id).reminder_sent)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class ExpireOldBookingsTests(TestCase):
+    def setUp(self):
+        self.doctor, self.patient = make_doctor_and_patient('expire')
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'expire.json')
+
+    def make_booking(self, days_ago, status):
+        return Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=timezone.now() - timedelta(days=days_ago), status=status
+        )
+
+    def expire(self, *args):
+        out = StringIO()
+        call_command('expire_old_bookings', *args, stdout=out)
+        return out.getvalue()
+
+    def status(self, booking):
+        return Booking.objects.get(id=booking.id).status
+
+    def test_transitions(self):
+        pending = self.make_booking(2, Booking.Status.PENDING)
+        confirmed = self.make_booking(3, Booking.Status.CONFIRMED)
+        in_progress = self.make_booking(4, Booking.Status.IN_PROGRESS)
+        completed = self.make_booking(5, Booking.Status.COMPLETED)
+        upcoming = self.make_booking(-2, Booking.Status.PENDING)
+
+        output = self.expire('--batch-size', '2')
+        self.assertIn('2 batch(es), 3 scanned, 3 updated', output)
+        self.assertEqual(
+            [self.status(booking) for booking in (pending, confirmed, in_progress, completed, upcoming)],
+            [Booking.Status.EXPIRED, Booking.Status.NO_SHOW, Booking.Status.EXPIRED, Booking.Status.COMPLETED, Booking.Status.PENDING]
+        )
+
+    def test_dry_run_changes_nothing(self):
+        pending = self.make_booking(2, Booking.Status.PENDING)
+        output = self.expire('--dry-run')
+        self.assertIn('Dry run: 1 booking(s) would be updated', output)
+        self.assertEqual(self.status(pending), Booking.Status.PENDING)
+
+    def test_resumes_from_the_checkpoint(self):
+        done, remaining = self.make_booking(3, Booking.Status.PENDING), self.make_booking(2, Booking.Status.PENDING)
+        cutoff = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'cutoff': cutoff.isoformat(), 'booking_datetime': done.booking_datetime.isoformat(), 'id': str(done.id)}, f)
+
+        output = self.expire('--checkpoint', self.checkpoint)
+        self.assertIn('Resuming after', output)
+        self.assertEqual((self.status(done), self.status(remaining)), (Booking.Status.PENDING, Booking.Status.EXPIRED))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_from_another_day_is_ignored(self):
+        booking = self.make_booking(3, Booking.Status.PENDING)
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'cutoff': (timezone.now() - timedelta(days=1)).isoformat(),
+                       'booking_datetime': booking.booking_datetime.isoformat(), 'id': str(booking.id)}, f)
+
+        self.assertIn('Ignoring checkpoint', self.expire('--checkpoint', self.checkpoint))
+        self.assertEqual(self.status(booking), Booking.Status.EXPIRED)
+
+
+class ArchiveAndHistoryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor, self.patient = make_doctor_and_patient('archive')
+        self.client.force_authenticate(self.patient.user)
+
+    def make_booking(self, days_ago, status=Booking.Status.COMPLETED, **fields):
+        return Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=timezone.now() - timedelta(days=days_ago), status=status, **fields
+        )
+
+    def test_archive_moves_old_finished_bookings(self):
+        old = self.make_booking(400)
+        old_cancelled = self.make_booking(401, status=Booking.Status.CANCELLED)
+        recent = self.make_booking(10)
+        old_confirmed = self.make_booking(402, status=Booking.Status.CONFIRMED)
+        rating = Rating.objects.create(booking=old, doctor=self.doctor, patient=self.patient, stars=4)
+
+        self.assertEqual(archive_bookings(days=365, batch_size=1), 2)
+        self.assertEqual(set(ArchivedBooking.objects.values_list('id', flat=True)), {old.id, old_cancelled.id})
+        self.assertEqual(set(Booking.objects.values_list('id', flat=True)), {recent.id, old_confirmed.id})
+        rating.refresh_from_db()
+        self.assertIsNone(rating.booking_id)
+        self.assertEqual(rating.archived_booking_id, old.id)
+
+    def test_archive_keeps_rescheduled_from_targets_live(self):
+        original = self.make_booking(500, status=Booking.Status.CANCELLED)
+        rescheduled = self.make_booking(-5, status=Booking.Status.CONFIRMED, rescheduled_from=original)
+
+        self.assertEqual(archive_bookings(days=365), 0)
+        rescheduled.refresh_from_db()
+        self.assertEqual(rescheduled.rescheduled_from_id, original.id)
+
+        # Once the referencing booking is archived, the original follows and the link survives
+        Booking.objects.filter(id=rescheduled.id).update(
+            booking_datetime=timezone.now() - timedelta(days=450), status=Booking.Status.COMPLETED
+        )
+        archive_bookings(days=365)
+        archive_bookings(days=365)
+        self.assertEqual(ArchivedBooking.objects.get(id=rescheduled.id).rescheduled_from_id, original.id)
+        self.assertTrue(ArchivedBooking.objects.filter(id=original.id).exists())
+
+    def test_history_pages_through_both_tables(self):
+        for days_ago in (400, 401, 402, 403):
+            self.make_booking(days_ago)
+        for days_ago in (1, 2, 3):
+            self.make_booking(days_ago)
+        archive_bookings(days=365)
+        expected = list(
+            Booking.objects.order_by('-booking_datetime').values_list('id', flat=True)
+        ) + list(ArchivedBooking.objects.order_by('-booking_datetime').values_list('id', flat=True))
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get('/api/clinic/bookings/history/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [str(booking_id) for booking_id in expected])
+
+    def test_history_cursor_breaks_datetime_ties(self):
+        moment = timezone.now() - timedelta(days=400)
+        for _ in range(3):
+            Booking.objects.create(doctor=self.doctor, patient=self.patient, booking_datetime=moment, status=Booking.Status.COMPLETED)
+        archive_bookings(days=365)
+        Booking.objects.create(doctor=self.doctor, patient=self.patient, booking_datetime=moment, status=Booking.Status.CONFIRMED)
+
+        first = self.client.get('/api/clinic/bookings/history/', {'limit': 2}).data
+        second = self.client.get('/api/clinic/bookings/history/', {'limit': 2, 'cursor': first['next_cursor']}).data
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_history_archived_only(self):
+        self.make_booking(400)
+        self.make_booking(1)
+        archive_bookings(days=365)
+
+        response = self.client.get('/api/clinic/bookings/history/', {'archived': 1})
+        self.assertEqual([row['is_archived'] for row in response.data['results']], [True])
+
+    def test_history_invalid_cursor(self):
+        response = self.client.get('/api/clinic/bookings/history/', {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 400)
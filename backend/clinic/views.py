@@ -1,9 +1,13 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Booking, Rating, ActivityLog
-from .serializers import BookingSerializer, RatingSerializer, ActivityLogSerializer
+from rest_framework.pagination import CursorPagination
+from .models import Booking, ArchivedBooking, Rating, ActivityLog
+from .serializers import BookingSerializer, ArchivedBookingSerializer, RatingSerializer, ActivityLogSerializer
+from .rating_stats import update_rating_stats
 from users.models import User
+from users.directory_cache import invalidate_booking_page
+from django.db import transaction
 from django.db.models import Avg
 
 # Helper for logging
@@ -68,6 +72,58 @@ class BookingViewSet(viewsets.ModelViewSet):
             return base_qs.filter(doctor=user.secretary_profile.doctor)
         return Booking.objects.none()
 
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Booking history across the live and archive tables, newest first.
+        ?limit= (default 50, max 200); pass the returned next_cursor as ?cursor= for the next page.
+        ?archived=1 only reads the archive table.
+        """
+        from django.db.models import Q
+        from django.utils.dateparse import parse_datetime
+
+        user = request.user
+        if user.role == User.Role.DOCTOR:
+            scope = Q(doctor__user=user)
+        elif user.role == User.Role.PATIENT:
+            scope = Q(patient__user=user)
+        elif user.role == User.Role.SECRETARY:
+            scope = Q(doctor=user.secretary_profile.doctor)
+        else:
+            return Response({'results': [], 'next_cursor': None})
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            limit = 50
+
+        # Cursor: "<booking_datetime>|<id>" of the last row of the previous page
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            cursor_datetime, _, cursor_id = cursor.rpartition('|')
+            cursor_datetime = parse_datetime(cursor_datetime)
+            if cursor_datetime is None or not cursor_id:
+                return Response({'error': 'Invalid cursor'}, status=400)
+            scope &= Q(booking_datetime__lt=cursor_datetime) | Q(booking_datetime=cursor_datetime, id__lt=cursor_id)
+
+        related = ('doctor__user', 'patient__user', 'rating')
+        if request.query_params.get('archived') == '1':
+            live = []
+        else:
+            live = Booking.objects.filter(scope).select_related(*related).order_by('-booking_datetime', '-id')[:limit]
+        archived = ArchivedBooking.objects.filter(scope).select_related(*related).order_by('-booking_datetime', '-id')[:limit]
+
+        rows = [(b, BookingSerializer(b).data) for b in live]
+        rows += [(b, ArchivedBookingSerializer(b).data) for b in archived]
+        rows.sort(key=lambda row: (row[0].booking_datetime, str(row[0].id)), reverse=True)
+        rows = rows[:limit]
+
+        last = rows[-1][0] if len(rows) == limit else None
+        return Response({
+            'results': [data for _, data in rows],
+            'next_cursor': f'{last.booking_datetime.isoformat()}|{last.id}' if last else None,
+        })
+
     def perform_create(self, serializer):
         from django.db import transaction
         from rest_framework.exceptions import ValidationError
@@ -205,20 +261,36 @@ class BookingViewSet(viewsets.ModelViewSet):
             )
             
             from notifications.views import create_notification
+            from notifications.messages import message
+            booking_time = main_booking.booking_datetime.strftime("%Y-%m-%d %H:%M")
+            patient_name = f'{user.first_name} {user.last_name}'
+            if len(bookings_created) > 1:
+                doctor_msg = message('new_booking_group_split', patient_name=patient_name, people=number_of_people,
+                                     datetime=booking_time, slots=len(bookings_created))
+            elif number_of_people > 1:
+                doctor_msg = message('new_booking_group', patient_name=patient_name, people=number_of_people, datetime=booking_time)
+            else:
+                doctor_msg = message('new_booking', patient_name=patient_name, datetime=booking_time)
+            
             create_notification(
                 'doctor',
                 doctor,
                 'NEW_BOOKING',
-                f'تم حجز موعد من قبل {user.first_name} {user.last_name}{people_text} بتاريخ {main_booking.booking_datetime.strftime("%Y-%m-%d %H:%M")}{slots_text}',
+                doctor_msg,
                 related_object_id=main_booking.id
             )
             
             # Build confirmation message for patient
+            doctor_name = f'{doctor.user.first_name} {doctor.user.last_name}'
             if len(bookings_created) == 1:
-                patient_msg = f'تم حجز موعدك مع د. {doctor.user.first_name} {doctor.user.last_name} بتاريخ {main_booking.booking_datetime.strftime("%Y-%m-%d %H:%M")}{people_text}'
+                if number_of_people > 1:
+                    patient_msg = message('booking_created_group', doctor_name=doctor_name, datetime=booking_time, people=number_of_people)
+                else:
+                    patient_msg = message('booking_created', doctor_name=doctor_name, datetime=booking_time)
             else:
                 times = [b.booking_datetime.strftime("%H:%M") for b in bookings_created]
-                patient_msg = f'تم حجز {number_of_people} أشخاص مع د. {doctor.user.first_name} على المواعيد: {", ".join(times)}'
+                patient_msg = message('booking_created_split', people=number_of_people,
+                                      doctor_first_name=doctor.user.first_name, times=", ".join(times))
             
             create_notification(
                 'patient',
@@ -288,11 +360,14 @@ class BookingViewSet(viewsets.ModelViewSet):
         # Notify patient (only if not walk-in)
         if booking.patient:
             from notifications.views import create_notification
+            from notifications.messages import message
             create_notification(
                 'patient',
                 booking.patient,
                 'BOOKING_CONFIRMED',
-                f'Your appointment with Dr. {booking.doctor.user.first_name} {booking.doctor.user.last_name} on {booking.booking_datetime.strftime("%Y-%m-%d %H:%M")} has been confirmed!'
+                message('booking_confirmed',
+                        doctor_name=f'{booking.doctor.user.first_name} {booking.doctor.user.last_name}',
+                        datetime=booking.booking_datetime.strftime("%Y-%m-%d %H:%M"))
             )
         
         return Response({'status': 'confirmed'})
@@ -367,11 +442,12 @@ class BookingViewSet(viewsets.ModelViewSet):
         # Notify patient to rate (only if not walk-in)
         if booking.patient:
             from notifications.views import create_notification
+            from notifications.messages import message
             create_notification(
                 'patient',
                 booking.patient,
                 'APPOINTMENT_COMPLETED',
-                f'Your appointment with Dr. {booking.doctor.user.first_name} {booking.doctor.user.last_name} is complete. Please share your experience by leaving a rating!'
+                message('appointment_completed', doctor_name=f'{booking.doctor.user.first_name} {booking.doctor.user.last_name}')
             )
         
         return Response({'status': 'completed'})
@@ -420,16 +496,20 @@ class BookingViewSet(viewsets.ModelViewSet):
         if booking.patient:
             from notifications.views import create_notification
             
+            from notifications.messages import message
+            booking_time = booking.booking_datetime.strftime("%Y-%m-%d %H:%M")
             if custom_message:
-                message = f'Your appointment on {booking.booking_datetime.strftime("%Y-%m-%d %H:%M")} has been cancelled. Message from Dr. {booking.doctor.user.first_name}: "{custom_message}"'
+                patient_msg = message('booking_cancelled_with_message', datetime=booking_time,
+                                      doctor_first_name=booking.doctor.user.first_name, custom_message=custom_message)
             else:
-                message = f'We apologize, but your appointment with Dr. {booking.doctor.user.first_name} {booking.doctor.user.last_name} on {booking.booking_datetime.strftime("%Y-%m-%d %H:%M")} has been cancelled. We sincerely apologize for any inconvenience. Please book a new appointment at your convenience.'
+                patient_msg = message('booking_cancelled', datetime=booking_time,
+                                      doctor_name=f'{booking.doctor.user.first_name} {booking.doctor.user.last_name}')
             
             create_notification(
                 'patient',
                 booking.patient,
                 'BOOKING_CANCELLED',
-                message
+                patient_msg
             )
         
         return Response({'status': 'cancelled'})
@@ -485,11 +565,13 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         # Notify doctor
         from notifications.views import create_notification
+        from notifications.messages import message
         create_notification(
             'doctor',
             booking.doctor,
             'BOOKING_CANCELLED',
-            f"المريض {user.first_name} {user.last_name} قام بإلغاء موعده يوم {booking.booking_datetime.strftime('%Y-%m-%d')} الساعة {booking.booking_datetime.strftime('%H:%M')}"
+            message('patient_cancelled', patient_name=f'{user.first_name} {user.last_name}',
+                    date=booking.booking_datetime.strftime('%Y-%m-%d'), time=booking.booking_datetime.strftime('%H:%M'))
         )
         
         return Response({'status': 'cancelled', 'message': 'تم إلغاء الحجز بنجاح'})
@@ -673,8 +755,17 @@ class BookingViewSet(viewsets.ModelViewSet):
         })
 
 
+class RatingCursorPagination(CursorPagination):
+    # Newest first; rating_doctor_recent_idx serves a doctor's pages
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class RatingViewSet(viewsets.ModelViewSet):
     serializer_class = RatingSerializer
+    pagination_class = RatingCursorPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy', 'respond']:
@@ -684,20 +775,62 @@ class RatingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         doctor_id = self.request.query_params.get('doctor_id')
+        # doctor_name / patient_name
+        ratings = Rating.objects.select_related('doctor__user', 'patient__user')
         
         # Filter by doctor if requested
         if doctor_id:
-            return Rating.objects.filter(doctor_id=doctor_id, is_public=True)
+            return ratings.filter(doctor_id=doctor_id, is_public=True)
         
         # If authenticated patient, return their ratings
         if user.is_authenticated and user.role == User.Role.PATIENT:
-            return Rating.objects.filter(patient=user.patient_profile)
+            return ratings.filter(patient=user.patient_profile)
         
         # If authenticated doctor, return ratings for them
         if user.is_authenticated and user.role == User.Role.DOCTOR:
-            return Rating.objects.filter(doctor=user.doctor_profile)
+            return ratings.filter(doctor=user.doctor_profile)
         
-        return Rating.objects.filter(is_public=True)
+        return ratings.filter(is_public=True)
+
+    def paginate_queryset(self, queryset):
+        # A patient's own ratings (at most one per booking) stay a plain list: the booking
+        # pages check every rated booking / doctor against it
+        user = self.request.user
+        if (not self.request.query_params.get('doctor_id') and user.is_authenticated
+                and user.role == User.Role.PATIENT):
+            return None
+        return super().paginate_queryset(queryset)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Rating summary of a doctor (?doctor_id=, or the doctor's own): average, count and star
+        histogram of the public ratings, read from the denormalized counters on Doctor.
+        """
+        from django.core.exceptions import ValidationError as DjangoValidationError
+        from users.models import Doctor
+
+        doctor_id = request.query_params.get('doctor_id')
+        user = request.user
+        if not doctor_id and user.is_authenticated and user.role == User.Role.DOCTOR:
+            doctor_id = user.doctor_profile.id
+        if not doctor_id:
+            return Response({'error': 'doctor_id is required'}, status=400)
+        try:
+            doctor = Doctor.objects.get(id=doctor_id)
+        except (Doctor.DoesNotExist, DjangoValidationError):
+            return Response({'error': 'Doctor not found'}, status=404)
+
+        data = {
+            'doctor': str(doctor.id),
+            'average': float(doctor.rating_avg),
+            'count': doctor.rating_count,
+            'histogram': doctor.rating_histogram,
+        }
+        if user.is_authenticated and user.role == User.Role.DOCTOR and user.doctor_profile.id == doctor.id:
+            # The doctor's own dashboard: ratings still waiting for a response
+            data['pending_responses'] = Rating.objects.filter(doctor=doctor, doctor_response='').count()
+        return Response(data)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -710,7 +843,22 @@ class RatingViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({"error": "You have already rated this appointment"})
         
-        serializer.save(patient=user.patient_profile)
+        with transaction.atomic():
+            rating = serializer.save(patient=user.patient_profile)
+            update_rating_stats(new=rating)
+
+    def perform_update(self, serializer):
+        # Copy of the rating before the change, for the doctor's rating aggregates
+        old = Rating(doctor_id=serializer.instance.doctor_id, stars=serializer.instance.stars,
+                     is_public=serializer.instance.is_public)
+        with transaction.atomic():
+            rating = serializer.save()
+            update_rating_stats(old=old, new=rating)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            update_rating_stats(old=instance)
+            instance.delete()
 
     def destroy(self, request, *args, **kwargs):
         rating = self.get_object()
@@ -739,14 +887,16 @@ class RatingViewSet(viewsets.ModelViewSet):
         
         rating.doctor_response = response_text
         rating.save()
+        invalidate_booking_page(rating.doctor_id)
         
         # Notify patient
         from notifications.views import create_notification
+        from notifications.messages import message
         create_notification(
             'patient',
             rating.patient,
             'DOCTOR_RESPONSE',
-            f'Dr. {rating.doctor.user.first_name} {rating.doctor.user.last_name} has responded to your rating.'
+            message('doctor_response', doctor_name=f'{rating.doctor.user.first_name} {rating.doctor.user.last_name}')
         )
         
         return Response({'status': 'response added'})
@@ -80,6 +80,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
@@ -146,6 +147,64 @@ CACHES = {
     }
 }
 
+# Notification badge counters (notifications/unread_counts.py). Use a cache shared by all
+# processes (Redis, Memcached or DatabaseCache) in production; with LocMemCache the counters
+# are recomputed from the tables instead of adjusted, and may lag up to 30s in other processes.
+UNREAD_COUNT_CACHE = 'default'
+
+# Live notification stream (SSE). DatabaseBroker reaches clients of every process (web
+# workers and `manage.py runworkers`) by polling a table for new events every
+# NOTIFICATION_BROKER_POLL_SECONDS; InMemoryBroker only fans out within one process.
+NOTIFICATION_BROKER = 'notifications.broker.DatabaseBroker'
+NOTIFICATION_BROKER_POLL_SECONDS = 1
+
+# Notification retention: read notifications older than this many days leave the inbox
+# tables once a day. 'archive' moves them to ArchivedNotification, 'delete' drops them.
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_RETENTION_MODE = 'archive'
+NOTIFICATION_RETENTION_BATCH_SIZE = 1000
+
+# Notification digests: events of these types for the same recipient are merged into the
+# recipient's latest unread notification of that type if it is newer than the window
+NOTIFICATION_COALESCE_TYPES = ['NEW_BOOKING']
+NOTIFICATION_COALESCE_WINDOW_SECONDS = 60
+NOTIFICATION_COALESCE_MAX_EVENTS = 50
+
+# Email outbox (core/email_service.py): requests only enqueue, a bounded pool of workers
+# sends in batches over kept-open SMTP connections, retrying with exponential backoff
+EMAIL_WORKER_COUNT = 2
+EMAIL_BATCH_SIZE = 20
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_SECONDS = 30  # 30s, 1m, 2m, 4m, ... between attempts
+EMAIL_CONNECTION_IDLE_SECONDS = 60  # Close an idle worker's SMTP connection after this long
+SMTP_CONFIG_CACHE_SECONDS = 300  # Other processes see SMTP settings changes after at most this long
+
+# Background jobs (core/background.py): `python manage.py runworkers` runs them in their own
+# process. When True, the web server process started with runserver also runs them (development,
+# single-process deployments); keep it False when serving with several worker processes.
+RUN_BACKGROUND_JOBS = DEBUG
+
+# Doctor search (users/search.py): the in-process index is rebuilt when a doctor's name or
+# specialty changes, and at least this often for changes made by other processes
+DOCTOR_SEARCH_INDEX_TTL = 300
+
+# Doctor directory response cache (users/directory_cache.py), invalidated on doctor/rating writes
+DOCTOR_DIRECTORY_CACHE_SECONDS = 600
+DOCTOR_DIRECTORY_MAX_AGE = 60  # Cache-Control max-age for clients and proxies
+# The booking page shows live slot occupancy: short-lived entries, and clients revalidate every time
+BOOKING_PAGE_CACHE_SECONDS = 60
+BOOKING_PAGE_MAX_AGE = 0
+BOOKING_PAGE_SLOT_DAYS = 7  # Slots included in the booking page; later days come from the slots endpoint
+BOOKING_PAGE_RATINGS = 10  # Public ratings included in the booking page
+
+# Booking archive (clinic/archive.py): finished bookings older than this are moved to
+# ArchivedBooking once a day; history endpoints read both tables
+BOOKING_ARCHIVE_DAYS = 365
+BOOKING_ARCHIVE_BATCH_SIZE = 1000
+
+# Booking reminders (clinic/reminder_scheduler.py) are claimed and queued this many at a time
+REMINDER_BATCH_SIZE = 200
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
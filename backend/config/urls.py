@@ -4,10 +4,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from users.views import RegisterUserView, CurrentUserView, DoctorListView, DoctorDetailView, SecretaryViewSet, UpdateProfileView, DoctorProfileUpdateView, ResolveMapsLinkView, SecretaryDoctorProfileView, AdminDoctorEntryView, AdminStatsView, CustomLoginView, VerifyEmailView, ForgotPasswordView, ResetPasswordView, SMTPSettingsViewSet, ResendVerificationEmailView, ChangeUnverifiedEmailView, CheckVerificationStatusView, AdminPatientListView, ChangePasswordView, SoftDeleteAccountView, RemoveProfilePictureView
+from users.views import RegisterUserView, CurrentUserView, DoctorListView, DoctorFacetsView, DoctorDetailView, DoctorBookingPageView, SecretaryViewSet, UpdateProfileView, DoctorProfileUpdateView, ResolveMapsLinkView, SecretaryDoctorProfileView, AdminDoctorEntryView, AdminStatsView, CustomLoginView, VerifyEmailView, ForgotPasswordView, ResetPasswordView, SMTPSettingsViewSet, ResendVerificationEmailView, ChangeUnverifiedEmailView, CheckVerificationStatusView, AdminPatientListView, ChangePasswordView, SoftDeleteAccountView, RemoveProfilePictureView
 from clinic.views import BookingViewSet, RatingViewSet, ActivityLogViewSet
 from scheduling.views import CheckConflictsView, TimeOffView, PublicReschedulingView, DoctorAvailabilityViewSet, DoctorSlotsView, DaySlotsView, TimeOffDetailView, AuthenticatedRescheduleAcceptView
-from notifications.views import NotificationListView, MarkNotificationReadView, MarkAllReadView
+from notifications.views import NotificationListView, MarkNotificationReadView, MarkAllReadView, UnreadCountView, ArchivedNotificationListView
+from notifications.stream import notification_stream
 from rest_framework_simplejwt.views import TokenRefreshView
 
 router = DefaultRouter()
@@ -41,6 +42,8 @@ urlpatterns = [
 
     # Users
     path('api/doctors/', DoctorListView.as_view(), name='doctor_list'),
+    path('api/doctors/facets/', DoctorFacetsView.as_view(), name='doctor_facets'),
+    path('api/doctors/<uuid:pk>/booking-page/', DoctorBookingPageView.as_view(), name='doctor_booking_page'),
     path('api/doctors/<uuid:pk>/', DoctorDetailView.as_view(), name='doctor_detail'),
     path('api/doctors/<uuid:doctor_id>/slots/', DoctorSlotsView.as_view(), name='doctor_slots'),
     path('api/doctors/profile/', DoctorProfileUpdateView.as_view(), name='doctor_profile_update'),
@@ -71,6 +74,9 @@ urlpatterns = [
     path('api/notifications/', NotificationListView.as_view(), name='notifications'),
     path('api/notifications/<uuid:notification_id>/read/', MarkNotificationReadView.as_view(), name='mark_read'),
     path('api/notifications/mark-all-read/', MarkAllReadView.as_view(), name='mark_all_read'),
+    path('api/notifications/unread-count/', UnreadCountView.as_view(), name='unread_count'),
+    path('api/notifications/stream/', notification_stream, name='notification_stream'),
+    path('api/notifications/archive/', ArchivedNotificationListView.as_view(), name='notification_archive'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,45 @@
+"""
+Background jobs.
+The daemon loops of the project (booking reminders, booking archive, rescheduling offer
+expiry, notification retention, email workers) are started in one place:
+- `python manage.py runworkers` runs them in their own process (production: one such
+  process next to any number of web workers)
+- with RUN_BACKGROUND_JOBS, the web process started by `manage.py runserver` (or another
+  server) also starts them from ClinicConfig.ready, for single-process setups and development
+
+migrate, shell, test and every other management command never start them.
+"""
+import os
+import sys
+import logging
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_JOBS = [
+    'clinic.reminder_scheduler.start_reminder_scheduler',
+    'clinic.archive.start_booking_archive',
+    'scheduling.reschedule_sweeper.start_reschedule_sweeper',
+    'notifications.retention.start_notification_retention',
+    'core.email_service.start_email_workers',
+]
+
+
+def start_background_jobs():
+    for path in BACKGROUND_JOBS:
+        import_string(path)()
+
+
+def should_start_in_process():
+    """Whether this (web server) process should run the background jobs itself"""
+    if not getattr(settings, 'RUN_BACKGROUND_JOBS', False):
+        return False
+    # Under manage.py only runserver serves requests (runworkers starts the jobs itself)
+    if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']:
+        return False
+    # In Django's auto-reloader, the main process spawns a child with RUN_MAIN=true.
+    # We only want to start the jobs in the child process (the actual server);
+    # with --noreload or other servers RUN_MAIN isn't set.
+    run_main = os.environ.get('RUN_MAIN')
+    return run_main == 'true' or run_main is None
@@ -1,27 +1,251 @@
+"""
+Email outbox.
+send_dynamic_email renders the template and stores the message in the OutboundEmail table;
+the request thread never talks to SMTP. A bounded pool of worker threads
+(EMAIL_WORKER_COUNT) sends the queued messages in batches:
+- each worker keeps its SMTP connection open between batches and closes it once idle
+- failed messages are retried with exponential backoff and marked DEAD after EMAIL_MAX_ATTEMPTS
+- messages left in SENDING by a worker that died mid-batch are picked up again after STALE_CLAIM_SECONDS
+
+The active SMTPSettings row is cached in-process (SMTPSettings.save/delete invalidate it; other
+processes pick up changes after SMTP_CONFIG_CACHE_SECONDS) and the email templates are compiled
+once at startup (load_email_templates) instead of being looked up for every email.
+"""
 import threading
-from django.core.mail import EmailMessage, get_connection
-from django.template.loader import render_to_string
+import logging
+import time
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
 from django.conf import settings
-from users.models import SMTPSettings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+from users.models import SMTPSettings, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 5  # Idle workers look for due retries this often
+STALE_CLAIM_SECONDS = 10 * 60
+MAX_RETRY_DELAY_SECONDS = 60 * 60
+
+EMAIL_TEMPLATES = (
+    'emails/verify_email.html',
+    'emails/reset_password.html',
+    'emails/password_changed.html',
+    'emails/booking_reminder.html',
+    'emails/account_deletion_scheduled.html',
+)
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+_templates = {}
+_smtp_config_cache = {'config': None, 'loaded_at': None}
+_smtp_config_lock = threading.Lock()
+
+
+def load_email_templates():
+    """Compile every email template once (called from UsersConfig.ready)"""
+    for template_name in EMAIL_TEMPLATES:
+        _templates[template_name] = get_template(template_name)
+
+
+def render_email(template_name, context):
+    template = _templates.get(template_name)
+    if template is None:
+        # Not in EMAIL_TEMPLATES: compile on first use and keep it
+        template = _templates[template_name] = get_template(template_name)
+    return template.render(context)
+
+
+def get_active_smtp_config():
+    """The active SMTPSettings row (or None), cached for SMTP_CONFIG_CACHE_SECONDS"""
+    ttl = getattr(settings, 'SMTP_CONFIG_CACHE_SECONDS', 300)
+    with _smtp_config_lock:
+        loaded_at = _smtp_config_cache['loaded_at']
+        if loaded_at is None or time.monotonic() - loaded_at > ttl:
+            _smtp_config_cache['config'] = SMTPSettings.objects.filter(is_active=True).first()
+            _smtp_config_cache['loaded_at'] = time.monotonic()
+        return _smtp_config_cache['config']
+
+
+def invalidate_smtp_config():
+    """Drop the cached SMTP config so the next email reloads it"""
+    with _smtp_config_lock:
+        _smtp_config_cache['loaded_at'] = None
+    # Let the workers retry emails that were waiting for an active configuration
+    _wakeup.set()
+
+
+def send_dynamic_email(subject, template_name, context, recipient_list):
+    """
+    Utility function to send HTML emails asynchronously using dynamic DB SMTP settings.
+    Only queues the email; the worker pool sends it.
+    """
+    html_content = render_email(template_name, context)
+    email = OutboundEmail.objects.create(subject=subject, html_content=html_content, recipients=list(recipient_list))
+    _wake_workers()
+    return email
+
+
+def enqueue_emails(emails):
+    """
+    Queue many emails with a single INSERT.
+    emails: iterable of (subject, template_name, context, recipient_list) tuples
+    """
+    queued = OutboundEmail.objects.bulk_create([
+        OutboundEmail(subject=subject, html_content=render_email(template_name, context), recipients=list(recipient_list))
+        for subject, template_name, context, recipient_list in emails
+    ])
+    if queued:
+        _wake_workers()
+    return queued
+
+
+def _wake_workers():
+    # Only once the enqueuing transaction has committed, so workers can see the rows
+    transaction.on_commit(_wakeup.set)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'EMAIL_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS))
+
+
+def _claim_batch(batch_size, outbox=None):
+    """
+    Mark up to batch_size PENDING emails as SENDING and return them.
+    outbox: queryset of the rows to claim from, due or not (default: the due rows of the shared outbox)
+    """
+    now = timezone.now()
+    OutboundEmail.objects.filter(
+        status=OutboundEmail.Status.SENDING,
+        claimed_at__lt=now - timedelta(seconds=STALE_CLAIM_SECONDS)
+    ).update(status=OutboundEmail.Status.PENDING)
+    if outbox is None:
+        outbox = OutboundEmail.objects.filter(next_attempt_at__lte=now)
+
+    with transaction.atomic():
+        batch = list(
+            outbox.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.Status.PENDING)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(id__in=[email.id for email in batch]).update(
+                status=OutboundEmail.Status.SENDING, claimed_at=now
+            )
+    return batch
+
+
+def _mark_sent(email):
+    OutboundEmail.objects.filter(id=email.id).update(
+        status=OutboundEmail.Status.SENT, sent_at=timezone.now(), attempts=email.attempts + 1, last_error=''
+    )
+
+
+def _mark_failed(email, error):
+    attempts = email.attempts + 1
+    if attempts >= getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5):
+        OutboundEmail.objects.filter(id=email.id).update(
+            status=OutboundEmail.Status.DEAD, attempts=attempts, last_error=str(error)
+        )
+        logger.error(f"Giving up on email to {email.recipients} after {attempts} attempts: {error}")
+    else:
+        # Rows parked in the future (bench_email's own rows) stay out of the shared workers' reach
+        OutboundEmail.objects.filter(id=email.id).update(
+            status=OutboundEmail.Status.PENDING, attempts=attempts, last_error=str(error),
+            next_attempt_at=max(email.next_attempt_at, timezone.now() + _retry_delay(attempts))
+        )
+        logger.warning(f"Failed to send email to {email.recipients} (attempt {attempts}): {error}")
 
-class EmailThread(threading.Thread):
-    def __init__(self, subject, html_content, recipient_list, from_email=None):
-        self.subject = subject
-        self.html_content = html_content
-        self.recipient_list = recipient_list
-        self.from_email = from_email
-        threading.Thread.__init__(self)
+
+class EmailWorker(threading.Thread):
+    """
+    Sends the outbox through the active SMTPSettings. smtp_config, outbox and wakeup replace the
+    active configuration, the shared outbox and the shared wakeup event (bench_email runs its own).
+    """
+
+    def __init__(self, index, smtp_config=None, outbox=None, wakeup=None):
+        super().__init__(name=f'email-worker-{index}', daemon=True)
+        self.smtp_config = smtp_config
+        self.outbox = outbox
+        self.wakeup = wakeup or _wakeup
+        self.stopping = threading.Event()
+        self.connection = None
+        self.connection_key = None
+        self.last_used = None
 
     def run(self):
+        while not self.stopping.is_set():
+            # Sleep until something is enqueued (or the poll interval passes, for due retries)
+            self.wakeup.wait(POLL_SECONDS)
+            self.wakeup.clear()
+            if self.stopping.is_set():
+                break
+
+            try:
+                while not self.stopping.is_set() and self.process_batch():
+                    pass
+            except Exception as e:
+                logger.error(f"Email worker error: {e}")
+            finally:
+                close_old_connections()
+
+            self.close_idle_connection()
+        self.close_connection()
+
+    def stop(self):
+        """Finish the current batch, close the connection and exit"""
+        self.stopping.set()
+        self.wakeup.set()
+
+    def process_batch(self):
+        """Send one batch of due emails. Returns False when there was nothing to send."""
+        smtp_config = self.smtp_config or get_active_smtp_config()
+        if not smtp_config:
+            # Keep the emails queued until an admin activates an SMTP configuration
+            return False
+
+        batch = _claim_batch(getattr(settings, 'EMAIL_BATCH_SIZE', 20), self.outbox)
+        if not batch:
+            return False
+
+        for email in batch:
+            try:
+                self.send(email, smtp_config)
+                _mark_sent(email)
+            except Exception as e:
+                self.close_connection()
+                _mark_failed(email, e)
+        return True
+
+    def send(self, email, smtp_config):
+        msg = EmailMessage(
+            subject=email.subject,
+            body=email.html_content,
+            from_email=email.from_email or smtp_config.email_host_user,
+            to=email.recipients,
+        )
+        msg.content_subtype = "html"  # Main content is text/html
         try:
-            # 1. Fetch active SMTP settings from DB
-            smtp_config = SMTPSettings.objects.filter(is_active=True).first()
-            
-            if not smtp_config:
-                print("Error: No active SMTP configuration found in the database. Emails will not be sent.")
-                return False
-
-            # 2. Create dynamic connection
+            msg.connection = self.get_connection(smtp_config)
+            msg.send()
+        except SMTPServerDisconnected:
+            # The server dropped the kept-open connection: reconnect once
+            self.close_connection()
+            msg.connection = self.get_connection(smtp_config)
+            msg.send()
+        self.last_used = timezone.now()
+
+    def get_connection(self, smtp_config):
+        key = (smtp_config.host, smtp_config.port, smtp_config.email_host_user,
+               smtp_config.email_host_password, smtp_config.use_tls)
+        if self.connection is not None and key != self.connection_key:
+            self.close_connection()
+        if self.connection is None:
             connection = get_connection(
                 backend='django.core.mail.backends.smtp.EmailBackend',
                 host=smtp_config.host,
@@ -31,28 +255,32 @@ class EmailThread(threading.Thread):
                 use_tls=smtp_config.use_tls,
                 fail_silently=False,
             )
+            connection.open()
+            self.connection, self.connection_key = connection, key
+        return self.connection
 
-            # 3. Create and send email
-            from_email = self.from_email or smtp_config.email_host_user
-            msg = EmailMessage(
-                subject=self.subject,
-                body=self.html_content,
-                from_email=from_email,
-                to=self.recipient_list,
-                connection=connection,
-            )
-            msg.content_subtype = "html"  # Main content is text/html
-            msg.send()
-            print(f"Email successfully sent to {self.recipient_list}")
-            return True
+    def close_connection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
 
-        except Exception as e:
-            print(f"Failed to send email to {self.recipient_list}. Error: {str(e)}")
-            return False
+    def close_idle_connection(self):
+        idle_seconds = getattr(settings, 'EMAIL_CONNECTION_IDLE_SECONDS', 60)
+        if self.connection is not None and self.last_used and \
+                (timezone.now() - self.last_used).total_seconds() > idle_seconds:
+            self.close_connection()
 
-def send_dynamic_email(subject, template_name, context, recipient_list):
-    """
-    Utility function to send HTML emails asynchronously using dynamic DB SMTP settings.
-    """
-    html_content = render_to_string(template_name, context)
-    EmailThread(subject, html_content, recipient_list).start()
+
+def start_email_workers():
+    """Start the email worker pool (daemon threads). Safe to call more than once."""
+    with _workers_lock:
+        if _workers:
+            return
+        for index in range(getattr(settings, 'EMAIL_WORKER_COUNT', 2)):
+            worker = EmailWorker(index)
+            worker.start()
+            _workers.append(worker)
+    logger.info(f"Email worker pool started ({len(_workers)} workers)")
@@ -0,0 +1,131 @@
+"""
+Minimal in-process SMTP server that accepts and counts messages without delivering them.
+Used by `python manage.py bench_email` as a local stand-in for the real SMTP server.
+
+Speaks just enough SMTP for Django's EmailBackend: EHLO/HELO, AUTH PLAIN/LOGIN
+(any credentials), MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+"""
+import socketserver
+import threading
+from collections import Counter
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def read_line(self):
+        return self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connection_opened()
+        try:
+            self.serve_session(sink)
+        finally:
+            sink.connection_closed()
+
+    def serve_session(self, sink):
+        recipients = []
+        self.reply('220 smtp-sink ESMTP')
+
+        while True:
+            line = self.read_line()
+            if not line:
+                # Client went away without QUIT
+                break
+            verb = line.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b'250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'AUTH':
+                parts = line.split()
+                mechanism = parts[1].upper() if len(parts) > 1 else ''
+                if mechanism == 'LOGIN':
+                    if len(parts) < 3:
+                        self.reply('334 VXNlcm5hbWU6')  # "Username:"
+                        self.read_line()
+                    self.reply('334 UGFzc3dvcmQ6')  # "Password:"
+                    self.read_line()
+                elif mechanism == 'PLAIN' and len(parts) < 3:
+                    self.reply('334 ')
+                    self.read_line()
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = line.split(':', 1)[1].strip() if ':' in line else ''
+                recipients.append(address.split('>')[0].lstrip('<'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                sink.message_received(recipients, size)
+                recipients = []
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Usage:
+        sink = SMTPSink().start()   # port 0 picks a free port, see sink.port
+        ...
+        sink.stop()
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = _ThreadingSMTPServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._lock = threading.Lock()
+        self.host, self.port = self._server.server_address[:2]
+        self.connections = 0
+        self.open_connections = 0  # Each open connection is served by its own thread
+        self.messages = 0
+        self.bytes = 0
+        self.recipients = Counter()
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections += 1
+            self.open_connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.open_connections -= 1
+
+    def message_received(self, recipients, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+            self.recipients.update(recipients)
@@ -0,0 +1,192 @@
+"""
+Fan-out of new notifications to connected SSE clients (see notifications/stream.py).
+
+Channels:
+- doctor:<doctor_id>   -> the doctor and their secretaries with 'receive_notifications'
+- patient:<patient_id> -> the patient
+- admin                -> all admins
+
+The broker is chosen with settings.NOTIFICATION_BROKER:
+- InMemoryBroker only reaches clients connected to the same process, so it only suits a
+  single process that also runs the background jobs
+- DatabaseBroker goes through the NotificationEvent table, so notifications created by
+  `manage.py runworkers` or another web worker reach every connected client
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'notifications.broker.InMemoryBroker'
+
+
+class BaseBroker:
+    def subscribe(self, channels):
+        """Return a Subscription receiving events published on any of the channels"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, channel, event):
+        """Deliver event (a JSON-serializable dict) to the channel's subscribers. Safe to call from any thread."""
+        raise NotImplementedError
+
+
+class Subscription:
+    QUEUE_SIZE = 100  # Events beyond this are dropped for slow clients
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Called from the publishing thread; hand the event over to the subscriber's loop
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout=None):
+        """Next event, or None if nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker(BaseBroker):
+    """In-process fan-out: channel -> set of subscriptions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Subscriber's event loop is already closed
+                self.unsubscribe(subscription)
+
+
+class DatabaseBroker(InMemoryBroker):
+    """
+    Cross-process fan-out: publish() inserts a NotificationEvent row, and in each process with
+    connected clients one thread polls for new rows and hands them to the local subscriptions.
+    Events are only needed for a few seconds; rows older than KEEP_SECONDS are purged.
+    """
+    KEEP_SECONDS = 10 * 60
+
+    def __init__(self):
+        super().__init__()
+        self.poll_seconds = getattr(settings, 'NOTIFICATION_BROKER_POLL_SECONDS', 1)
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._last_purge = 0
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        with self._poller_lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, daemon=True)
+                self._poller.start()
+        return subscription
+
+    def publish(self, channel, event):
+        from .models import NotificationEvent
+
+        try:
+            NotificationEvent.objects.create(channel=channel, payload=event)
+        except Exception as e:
+            # Runs after the notification committed; clients still get it on their next fetch
+            logger.error(f"Notification broker publish error: {e}")
+            return
+        if time.monotonic() - self._last_purge > self.KEEP_SECONDS:
+            self._last_purge = time.monotonic()
+            self.purge()
+
+    def purge(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import NotificationEvent
+
+        NotificationEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=self.KEEP_SECONDS)).delete()
+
+    def poll(self, last_id):
+        """Deliver the events stored after last_id to the local subscriptions; returns the new last id"""
+        from .models import NotificationEvent
+
+        events = NotificationEvent.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'channel', 'payload')
+        for event_id, channel, payload in events[:1000]:
+            super().publish(channel, payload)
+            last_id = event_id
+        return last_id
+
+    def _poll_loop(self):
+        from django.db import close_old_connections
+        from django.db.models import Max
+        from .models import NotificationEvent
+
+        last_id = None
+        while True:
+            try:
+                with self._lock:
+                    has_subscribers = bool(self._subscribers)
+                if not has_subscribers:
+                    last_id = None  # Don't replay what was published while nobody listened
+                elif last_id is None:
+                    last_id = NotificationEvent.objects.aggregate(last=Max('id'))['last'] or 0
+                else:
+                    last_id = self.poll(last_id)
+            except Exception as e:
+                logger.error(f"Notification broker poll error: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(self.poll_seconds)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'NOTIFICATION_BROKER', DEFAULT_BROKER)
+                _broker = import_string(broker_path)()
+    return _broker
@@ -0,0 +1,26 @@
+"""
+Management command to move old read notifications out of the inbox tables.
+The in-process retention job already does this daily; this command can also be run from cron.
+
+Usage: python manage.py compact_notifications [--days 90] [--mode archive|delete] [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from notifications.retention import compact_notifications
+
+class Command(BaseCommand):
+    help = 'Archives (or deletes) read notifications older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retention period in days (default: NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--mode', choices=['archive', 'delete'], default=None, help='Default: NOTIFICATION_RETENTION_MODE')
+        parser.add_argument('--batch-size', type=int, default=None, help='Notifications moved per transaction')
+
+    def handle(self, *args, **options):
+        moved = compact_notifications(days=options['days'], mode=options['mode'], batch_size=options['batch_size'])
+        total = sum(moved.values())
+
+        if total > 0:
+            details = ', '.join(f'{count} {kind}' for kind, count in moved.items() if count)
+            self.stdout.write(self.style.SUCCESS(f'Compacted {total} notification(s) ({details})'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No notifications past the retention period'))
@@ -0,0 +1,158 @@
+"""
+Notification message templates.
+
+Notifications are stored as a template key plus a small params dict and rendered in the
+reader's locale when they are read (see BaseNotification.template_key / params).
+Rendered texts are cached per (key, params, locale).
+
+Usage:
+    create_notification('patient', patient, 'BOOKING_CONFIRMED',
+                        message('booking_confirmed', doctor_name=..., datetime=...))
+"""
+import json
+from collections import namedtuple
+from functools import lru_cache
+
+DEFAULT_LOCALE = 'ar'
+LOCALES = ('ar', 'en')
+
+MESSAGES = {
+    # ── Doctor ──
+    'new_booking': {
+        'ar': 'تم حجز موعد من قبل {patient_name} بتاريخ {datetime}',
+        'en': 'New booking by {patient_name} on {datetime}',
+    },
+    'new_booking_group': {
+        'ar': 'تم حجز موعد من قبل {patient_name} ({people} أشخاص) بتاريخ {datetime}',
+        'en': 'New booking by {patient_name} ({people} people) on {datetime}',
+    },
+    'new_booking_group_split': {
+        'ar': 'تم حجز موعد من قبل {patient_name} ({people} أشخاص) بتاريخ {datetime} (تم توزيعهم على {slots} مواعيد)',
+        'en': 'New booking by {patient_name} ({people} people) on {datetime} (spread over {slots} slots)',
+    },
+    'new_booking_digest': {
+        'ar': 'تم حجز {count} مواعيد جديدة، آخرها من قبل {patient_name} بتاريخ {datetime}',
+        'en': '{count} new bookings, the latest by {patient_name} on {datetime}',
+    },
+    'patient_cancelled': {
+        'ar': 'المريض {patient_name} قام بإلغاء موعده يوم {date} الساعة {time}',
+        'en': 'Patient {patient_name} cancelled their appointment on {date} at {time}',
+    },
+
+    # ── Patient ──
+    'booking_created': {
+        'ar': 'تم حجز موعدك مع د. {doctor_name} بتاريخ {datetime}',
+        'en': 'Your appointment with Dr. {doctor_name} on {datetime} has been booked',
+    },
+    'booking_created_group': {
+        'ar': 'تم حجز موعدك مع د. {doctor_name} بتاريخ {datetime} ({people} أشخاص)',
+        'en': 'Your appointment with Dr. {doctor_name} on {datetime} has been booked ({people} people)',
+    },
+    'booking_created_split': {
+        'ar': 'تم حجز {people} أشخاص مع د. {doctor_first_name} على المواعيد: {times}',
+        'en': '{people} people booked with Dr. {doctor_first_name} at: {times}',
+    },
+    'booking_confirmed': {
+        'ar': 'تم تأكيد موعدك مع د. {doctor_name} بتاريخ {datetime}!',
+        'en': 'Your appointment with Dr. {doctor_name} on {datetime} has been confirmed!',
+    },
+    'appointment_completed': {
+        'ar': 'اكتمل موعدك مع د. {doctor_name}. شاركنا تجربتك بتقييم الطبيب!',
+        'en': 'Your appointment with Dr. {doctor_name} is complete. Please share your experience by leaving a rating!',
+    },
+    'booking_cancelled': {
+        'ar': 'نعتذر، تم إلغاء موعدك مع د. {doctor_name} بتاريخ {datetime}. نعتذر عن أي إزعاج، يمكنك حجز موعد جديد في الوقت المناسب لك.',
+        'en': 'We apologize, but your appointment with Dr. {doctor_name} on {datetime} has been cancelled. We sincerely apologize for any inconvenience. Please book a new appointment at your convenience.',
+    },
+    'booking_cancelled_with_message': {
+        'ar': 'تم إلغاء موعدك بتاريخ {datetime}. رسالة من د. {doctor_first_name}: "{custom_message}"',
+        'en': 'Your appointment on {datetime} has been cancelled. Message from Dr. {doctor_first_name}: "{custom_message}"',
+    },
+    'doctor_response': {
+        'ar': 'قام د. {doctor_name} بالرد على تقييمك.',
+        'en': 'Dr. {doctor_name} has responded to your rating.',
+    },
+    'reschedule_offer': {
+        'ar': 'عذراً، تم إلغاء موعدك بتاريخ {datetime} بسبب ظرف طارئ للطبيب. لديك {hours} ساعة لاختيار موعد بديل. المواعيد المقترحة: {slots}',
+        'en': 'Sorry, your appointment on {datetime} was cancelled due to an emergency. You have {hours} hours to choose another slot. Suggested dates: {slots}',
+    },
+    'reschedule_offer_days': {
+        'ar': 'عذراً، تم إلغاء موعدك بتاريخ {datetime} بسبب ظرف طارئ للطبيب. لديك {days} يوم و {hours} ساعة لاختيار موعد بديل. المواعيد المقترحة: {slots}',
+        'en': 'Sorry, your appointment on {datetime} was cancelled due to an emergency. You have {days} days and {hours} hours to choose another slot. Suggested dates: {slots}',
+    },
+    'reschedule_expired': {
+        'ar': 'انتهت صلاحية المواعيد البديلة لموعدك الملغى مع د. {doctor_name}. يرجى حجز موعد جديد.',
+        'en': 'The alternative slots for your cancelled appointment with Dr. {doctor_name} have expired. Please book a new appointment.',
+    },
+    'reschedule_accepted': {
+        'ar': 'تم تحويل حجزك بنجاح! موعدك الجديد: {date} الساعة {time} مع د. {doctor_name}',
+        'en': 'Your booking was moved successfully! New appointment: {date} at {time} with Dr. {doctor_name}',
+    },
+
+    # ── Digests (coalesced notifications, see render_notification) ──
+    'digest': {
+        'ar': '{count} إشعارات جديدة',
+        'en': '{count} new notifications',
+    },
+
+    # ── Admin ──
+    'new_doctor': {
+        'ar': 'تسجيل طبيب جديد: د. {doctor_name}',
+        'en': 'New Doctor Registration: Dr. {doctor_name}',
+    },
+    'document_reupload': {
+        'ar': 'إعادة رفع مستند: د. {doctor_name} رفع وثيقة ترخيص جديدة.',
+        'en': 'Document Re-upload: Dr. {doctor_name} uploaded a new license document.',
+    },
+}
+
+# What callers pass to create_notification instead of a pre-rendered string
+Message = namedtuple('Message', ['key', 'params'])
+
+
+def message(key, **params):
+    if key not in MESSAGES:
+        raise KeyError(f"Unknown notification template: {key}")
+    return Message(key, params)
+
+
+def get_locale(request):
+    """Locale from ?lang=, else the Accept-Language header, else DEFAULT_LOCALE"""
+    if request is None:
+        return DEFAULT_LOCALE
+    lang = request.GET.get('lang') or request.META.get('HTTP_ACCEPT_LANGUAGE', '')
+    lang = lang.split(',')[0].split('-')[0].strip().lower()
+    return lang if lang in LOCALES else DEFAULT_LOCALE
+
+
+@lru_cache(maxsize=4096)
+def _render(key, params_json, locale):
+    templates = MESSAGES.get(key)
+    if templates is None:
+        return ''
+    template = templates.get(locale) or templates[DEFAULT_LOCALE]
+    try:
+        return template.format(**json.loads(params_json))
+    except (KeyError, IndexError):
+        return template
+
+
+def render(key, params, locale=DEFAULT_LOCALE):
+    return _render(key, json.dumps(params or {}, sort_keys=True, ensure_ascii=False), locale)
+
+
+def render_notification(notification, locale=DEFAULT_LOCALE):
+    """
+    Text of a stored notification; rows from before template keys keep their stored message.
+    Digests (event_count > 1) use '<notification type>_digest' with the latest event's params,
+    or the generic 'digest' template.
+    """
+    event_count = getattr(notification, 'event_count', 1)
+    if event_count > 1:
+        digest_key = f'{notification.notification_type.lower()}_digest'
+        if digest_key not in MESSAGES:
+            digest_key = 'digest'
+        return render(digest_key, {**(notification.params or {}), 'count': event_count}, locale)
+    if notification.template_key:
+        return render(notification.template_key, notification.params, locale)
+    return notification.message
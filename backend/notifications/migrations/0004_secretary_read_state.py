@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_secretary_read_state(apps, schema_editor):
+    """
+    Convert the per-secretary notification copies into read state on the doctor's notifications.
+    Copies older than the secretary's oldest unread copy become the read watermark; read copies
+    newer than that are matched to the doctor notification they were forwarded from.
+    """
+    Secretary = apps.get_model('users', 'Secretary')
+    SecretaryNotification = apps.get_model('notifications', 'SecretaryNotification')
+    SecretaryNotificationRead = apps.get_model('notifications', 'SecretaryNotificationRead')
+    SecretaryInboxState = apps.get_model('notifications', 'SecretaryInboxState')
+    DoctorNotification = apps.get_model('notifications', 'DoctorNotification')
+
+    now = timezone.now()
+    for secretary in Secretary.objects.all().iterator():
+        copies = SecretaryNotification.objects.filter(recipient=secretary)
+        oldest_unread = copies.filter(is_read=False).order_by('created_at').first()
+        watermark = oldest_unread.created_at if oldest_unread else now
+        SecretaryInboxState.objects.create(secretary=secretary, read_all_before=watermark)
+
+        for copy in copies.filter(is_read=True, created_at__gte=watermark).iterator():
+            original = DoctorNotification.objects.filter(
+                recipient_id=secretary.doctor_id,
+                notification_type=copy.notification_type,
+                message=copy.message,
+                created_at__range=(copy.created_at - timedelta(seconds=5), copy.created_at + timedelta(seconds=5))
+            ).first()
+            if original:
+                SecretaryNotificationRead.objects.get_or_create(secretary=secretary, notification=original)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_adminnotification'),
+        ('users', '0020_alter_doctor_booking_visibility_weeks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecretaryInboxState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_all_before', models.DateTimeField(default=django.utils.timezone.now)),
+                ('secretary', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_state', to='users.secretary')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SecretaryNotificationRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='secretary_reads', to='notifications.doctornotification')),
+                ('secretary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_reads', to='users.secretary')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='secretarynotificationread',
+            constraint=models.UniqueConstraint(fields=('secretary', 'notification'), name='unique_secretary_notification_read'),
+        ),
+        migrations.RunPython(copy_secretary_read_state, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='SecretaryNotification',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_secretary_read_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminnotification',
+            index=models.Index(fields=['is_read', 'created_at'], name='admin_notif_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctornotification',
+            index=models.Index(fields=['recipient', 'created_at'], name='doctor_notif_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctornotification',
+            index=models.Index(fields=['recipient', 'is_read', 'created_at'], name='doctor_notif_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientnotification',
+            index=models.Index(fields=['recipient', 'created_at'], name='patient_notif_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientnotification',
+            index=models.Index(fields=['recipient', 'is_read', 'created_at'], name='patient_notif_inbox_idx'),
+        ),
+    ]
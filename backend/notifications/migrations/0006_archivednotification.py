@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('recipient_type', models.CharField(choices=[('doctor', 'Doctor'), ('patient', 'Patient'), ('admin', 'Admin')], max_length=10)),
+                ('recipient_id', models.UUIDField(blank=True, null=True)),
+                ('notification_type', models.CharField(max_length=50)),
+                ('message', models.TextField()),
+                ('related_object_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient_type', 'recipient_id', 'created_at'], name='archived_notif_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_notification_digests'),
+        ('users', '0027_admin_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctornotification',
+            index=models.Index(fields=['is_read', 'created_at'], name='doctor_notif_retention_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientnotification',
+            index=models.Index(fields=['is_read', 'created_at'], name='patient_notif_retention_idx'),
+        ),
+    ]
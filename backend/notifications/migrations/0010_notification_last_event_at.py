@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_notification_retention_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminnotification',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctornotification',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='patientnotification',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,15 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from users.models import Doctor, Patient, Secretary
 
 class BaseNotification(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    message = models.TextField()
+    # Text is rendered at read time from template_key + params (see notifications/messages.py);
+    # message only holds the pre-rendered text of older rows
+    template_key = models.CharField(max_length=50, blank=True, default='')
+    params = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True, default='')
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -12,6 +17,13 @@ class BaseNotification(models.Model):
     # Generic link to related object (e.g. Booking ID)
     related_object_id = models.CharField(max_length=100, null=True, blank=True)
     
+    # Digests: bursts of same-type events are coalesced into one row (see coalesce_notifications);
+    # related_object_id then points at the latest event and related_object_ids lists all of them.
+    # created_at stays the first event's time; last_event_at is the latest merge (NULL = single event)
+    event_count = models.PositiveIntegerField(default=1)
+    related_object_ids = models.JSONField(default=list, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         abstract = True
         ordering = ['-created_at']
@@ -20,14 +32,88 @@ class DoctorNotification(BaseNotification):
     recipient = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=50) # e.g. NEW_BOOKING
 
+    class Meta(BaseNotification.Meta):
+        indexes = [
+            # Inbox pages (newest first), with and without the unread filter
+            models.Index(fields=['recipient', 'created_at'], name='doctor_notif_feed_idx'),
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='doctor_notif_inbox_idx'),
+            # Retention sweep: read notifications past the retention period (notifications/retention.py)
+            models.Index(fields=['is_read', 'created_at'], name='doctor_notif_retention_idx'),
+        ]
+
 class PatientNotification(BaseNotification):
     recipient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=50) # e.g. RESCHEDULE_REQ
 
-class SecretaryNotification(BaseNotification):
-    recipient = models.ForeignKey(Secretary, on_delete=models.CASCADE, related_name='notifications')
-    notification_type = models.CharField(max_length=50)
+    class Meta(BaseNotification.Meta):
+        indexes = [
+            models.Index(fields=['recipient', 'created_at'], name='patient_notif_feed_idx'),
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='patient_notif_inbox_idx'),
+            models.Index(fields=['is_read', 'created_at'], name='patient_notif_retention_idx'),
+        ]
+
+# Secretaries don't get their own copies: a secretary with 'receive_notifications'
+# reads the doctor's notifications directly and only their read state is stored per secretary.
+class SecretaryNotificationRead(models.Model):
+    secretary = models.ForeignKey(Secretary, on_delete=models.CASCADE, related_name='notification_reads')
+    notification = models.ForeignKey(DoctorNotification, on_delete=models.CASCADE, related_name='secretary_reads')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['secretary', 'notification'], name='unique_secretary_notification_read'),
+        ]
+
+class SecretaryInboxState(models.Model):
+    # Read watermark: doctor notifications created before this are read for the secretary
+    # ("mark all as read" moves it forward instead of inserting a row per notification)
+    secretary = models.OneToOneField(Secretary, on_delete=models.CASCADE, related_name='inbox_state')
+    read_all_before = models.DateTimeField(default=timezone.now)
+
+class NotificationEvent(models.Model):
+    """New notification waiting to be pushed to SSE clients by DatabaseBroker (see notifications/broker.py)"""
+    id = models.BigAutoField(primary_key=True)
+    channel = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
 class AdminNotification(BaseNotification):
     # Admins don't have a specific recipient profile, we can alert all users with `role='ADMIN'`
     notification_type = models.CharField(max_length=50)
+
+    class Meta(BaseNotification.Meta):
+        indexes = [
+            # Also serves the retention sweep
+            models.Index(fields=['is_read', 'created_at'], name='admin_notif_inbox_idx'),
+        ]
+
+class ArchivedNotification(models.Model):
+    """
+    Compact cold storage for read notifications moved out of the inbox tables by the
+    retention job (see notifications/retention.py). Keeps the original id and timestamps.
+    """
+    class RecipientType(models.TextChoices):
+        DOCTOR = "doctor", "Doctor"
+        PATIENT = "patient", "Patient"
+        ADMIN = "admin", "Admin"
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    recipient_type = models.CharField(max_length=10, choices=RecipientType.choices)
+    recipient_id = models.UUIDField(null=True, blank=True)  # Doctor / Patient id, empty for admin
+    notification_type = models.CharField(max_length=50)
+    template_key = models.CharField(max_length=50, blank=True, default='')
+    params = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True, default='')
+    related_object_id = models.CharField(max_length=100, null=True, blank=True)
+    event_count = models.PositiveIntegerField(default=1)
+    related_object_ids = models.JSONField(default=list, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient_type', 'recipient_id', 'created_at'], name='archived_notif_lookup_idx'),
+        ]
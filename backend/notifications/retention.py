@@ -0,0 +1,141 @@
+"""
+Notification retention.
+Read notifications older than NOTIFICATION_RETENTION_DAYS are moved out of the inbox
+tables in bounded batches, so inbox queries and "mark all as read" UPDATEs only touch
+recent rows:
+- mode 'archive' copies them into ArchivedNotification, then deletes them
+- mode 'delete' only deletes them
+
+Doctor notifications are also the inbox of the doctor's secretaries (see secretary_feed), so
+they are only moved once every secretary with 'receive_notifications' has read them too:
+whose latest event is before the secretary's read_all_before watermark, or with a read mark of theirs.
+(A secretary without an inbox state yet will see everything older as read.)
+
+A background thread runs this once a day; `python manage.py compact_notifications`
+runs it on demand.
+"""
+import threading
+import time
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_SECONDS = 24 * 60 * 60  # Once a day
+
+
+def compact_notifications(days=None, mode=None, batch_size=None):
+    """
+    Archive (or delete) old read notifications.
+    Returns {recipient_type: number of notifications moved}.
+    """
+    from django.conf import settings
+    from django.db import transaction
+    from django.utils import timezone
+    from .models import DoctorNotification, PatientNotification, AdminNotification, ArchivedNotification
+
+    days = days if days is not None else getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    mode = mode or getattr(settings, 'NOTIFICATION_RETENTION_MODE', 'archive')
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_RETENTION_BATCH_SIZE', 1000)
+    if mode not in ('archive', 'delete'):
+        raise ValueError(f"Unknown notification retention mode: {mode}")
+
+    cutoff = timezone.now() - timedelta(days=days)
+    tables = [
+        (ArchivedNotification.RecipientType.DOCTOR, DoctorNotification),
+        (ArchivedNotification.RecipientType.PATIENT, PatientNotification),
+        (ArchivedNotification.RecipientType.ADMIN, AdminNotification),
+    ]
+
+    moved = {}
+    for recipient_type, model in tables:
+        expired = model.objects.filter(is_read=True, created_at__lt=cutoff)
+        if model is DoctorNotification:
+            expired = expired.exclude(_unread_by_a_secretary())
+        total = 0
+        while True:
+            with transaction.atomic():
+                batch = list(expired.order_by('created_at')[:batch_size])
+                if not batch:
+                    break
+
+                if mode == 'archive':
+                    ArchivedNotification.objects.bulk_create([
+                        ArchivedNotification(
+                            id=n.id,
+                            recipient_type=recipient_type,
+                            recipient_id=getattr(n, 'recipient_id', None),
+                            notification_type=n.notification_type,
+                            template_key=n.template_key,
+                            params=n.params,
+                            message=n.message,
+                            related_object_id=n.related_object_id,
+                            event_count=n.event_count,
+                            related_object_ids=n.related_object_ids,
+                            last_event_at=n.last_event_at,
+                            created_at=n.created_at,
+                            read_at=n.read_at,
+                        )
+                        for n in batch
+                    ], ignore_conflicts=True)
+
+                # Also removes the secretaries' read marks of archived doctor notifications
+                model.objects.filter(id__in=[n.id for n in batch]).delete()
+                total += len(batch)
+
+            if len(batch) < batch_size:
+                break
+        moved[recipient_type] = total
+
+    return moved
+
+
+def _unread_by_a_secretary():
+    """Condition on DoctorNotification: some secretary receiving the doctor's notifications hasn't read it"""
+    from django.db.models import Exists, OuterRef, Q
+    from users.models import Secretary
+    from .models import SecretaryNotificationRead
+
+    # permissions is a JSON list; the secretaries table is small
+    receiving = [
+        secretary.id for secretary in Secretary.objects.only('id', 'permissions')
+        if 'receive_notifications' in (secretary.permissions or [])
+    ]
+    if not receiving:
+        return Q(pk__in=[])
+    unread = Secretary.objects.filter(
+        Q(inbox_state__read_all_before__lte=OuterRef('created_at'))
+        | Q(inbox_state__read_all_before__lte=OuterRef('last_event_at')),
+        id__in=receiving,
+        doctor_id=OuterRef('recipient_id'),
+    ).exclude(
+        Exists(SecretaryNotificationRead.objects.filter(secretary=OuterRef('pk'), notification=OuterRef(OuterRef('pk'))))
+    )
+    return Exists(unread)
+
+
+def _retention_loop():
+    """Background loop that compacts the notification tables once a day."""
+    from django.db import close_old_connections
+
+    # Wait 5 minutes after startup before the first run
+    time.sleep(5 * 60)
+
+    while True:
+        try:
+            moved = compact_notifications()
+            if any(moved.values()):
+                logger.info(f"Compacted notifications: {moved}")
+        except Exception as e:
+            logger.error(f"Notification retention error: {e}")
+        finally:
+            close_old_connections()
+
+        time.sleep(INTERVAL_SECONDS)
+
+
+def start_notification_retention():
+    """Start the retention job as a daemon thread."""
+    thread = threading.Thread(target=_retention_loop, daemon=True)
+    thread.start()
+    logger.info("Notification retention job started (running daily)")
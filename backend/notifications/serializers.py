@@ -1,52 +1,116 @@
+import uuid
 from rest_framework import serializers
-from .models import DoctorNotification, PatientNotification, SecretaryNotification
+from .models import DoctorNotification, PatientNotification
+from .messages import DEFAULT_LOCALE, render_notification
 from clinic.models import Booking
 
-class DoctorNotificationSerializer(serializers.ModelSerializer):
+DOCTOR_BOOKING_TYPES = ['NEW_BOOKING', 'BOOKING_CREATED']
+PATIENT_BOOKING_TYPES = ['NEW_BOOKING', 'BOOKING_CREATED', 'BOOKING_CONFIRMED', 'BOOKING_CANCELLED']
+
+def _valid_uuids(values):
+    ids = set()
+    for value in values:
+        try:
+            ids.add(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return ids
+
+def related_objects_context(notifications):
+    """
+    Fetch the bookings and rescheduling requests referenced by a page of notifications
+    in two queries, keyed by related_object_id, for use as serializer context.
+    """
+    from scheduling.models import ReschedulingRequest
+
+    booking_ids = _valid_uuids(
+        n.related_object_id for n in notifications
+        if n.related_object_id and n.notification_type in PATIENT_BOOKING_TYPES
+    )
+    reschedule_ids = _valid_uuids(
+        n.related_object_id for n in notifications
+        if n.related_object_id and n.notification_type == 'RESCHEDULE_OFFER'
+    )
+
+    bookings = Booking.objects.filter(id__in=booking_ids).only('id', 'status') if booking_ids else []
+    reschedule_requests = ReschedulingRequest.objects.filter(id__in=reschedule_ids).select_related(
+        'original_booking', 'doctor__user'
+    ) if reschedule_ids else []
+
+    return {
+        'related_bookings': {str(b.id): b for b in bookings},
+        'reschedule_requests': {str(r.id): r for r in reschedule_requests},
+    }
+
+class RenderedMessageMixin(serializers.Serializer):
+    """Renders template-keyed notifications in context['locale']"""
+    message = serializers.SerializerMethodField()
+
+    def get_message(self, obj):
+        return render_notification(obj, self.context.get('locale', DEFAULT_LOCALE))
+
+class RelatedObjectsMixin:
+    """Look up related objects from the prefetched context, falling back to a query per row"""
+
+    def _related_booking(self, obj):
+        prefetched = self.context.get('related_bookings')
+        if prefetched is not None:
+            return prefetched.get(obj.related_object_id)
+        try:
+            return Booking.objects.get(id=obj.related_object_id)
+        except Booking.DoesNotExist:
+            return None
+
+    def _reschedule_request(self, obj):
+        from scheduling.models import ReschedulingRequest
+        prefetched = self.context.get('reschedule_requests')
+        if prefetched is not None:
+            return prefetched.get(obj.related_object_id)
+        try:
+            return ReschedulingRequest.objects.select_related('original_booking', 'doctor__user').get(id=obj.related_object_id)
+        except ReschedulingRequest.DoesNotExist:
+            return None
+
+class DoctorNotificationSerializer(RenderedMessageMixin, RelatedObjectsMixin, serializers.ModelSerializer):
     # Returns the current booking status if this notification is for a booking
     related_booking_status = serializers.SerializerMethodField()
     
     class Meta:
         model = DoctorNotification
-        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'related_booking_status']
+        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'event_count', 'related_object_ids', 'last_event_at', 'related_booking_status']
         read_only_fields = ['id', 'created_at']
     
     def get_related_booking_status(self, obj):
         """Get the current status of the related booking if applicable"""
-        if obj.notification_type in ['NEW_BOOKING', 'BOOKING_CREATED'] and obj.related_object_id:
-            try:
-                booking = Booking.objects.get(id=obj.related_object_id)
-                return booking.status
-            except Booking.DoesNotExist:
-                return None
+        if obj.notification_type in DOCTOR_BOOKING_TYPES and obj.related_object_id:
+            booking = self._related_booking(obj)
+            return booking.status if booking else None
         return None
 
-class PatientNotificationSerializer(serializers.ModelSerializer):
+class PatientNotificationSerializer(RenderedMessageMixin, RelatedObjectsMixin, serializers.ModelSerializer):
     related_booking_status = serializers.SerializerMethodField()
     reschedule_data = serializers.SerializerMethodField()
     
     class Meta:
         model = PatientNotification
-        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'related_booking_status', 'reschedule_data']
+        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'event_count', 'related_object_ids', 'last_event_at', 'related_booking_status', 'reschedule_data']
         read_only_fields = ['id', 'created_at']
     
     def get_related_booking_status(self, obj):
-        if obj.notification_type in ['NEW_BOOKING', 'BOOKING_CREATED', 'BOOKING_CONFIRMED', 'BOOKING_CANCELLED'] and obj.related_object_id:
-            try:
-                booking = Booking.objects.get(id=obj.related_object_id)
-                return booking.status
-            except Booking.DoesNotExist:
-                return None
+        if obj.notification_type in PATIENT_BOOKING_TYPES and obj.related_object_id:
+            booking = self._related_booking(obj)
+            return booking.status if booking else None
         return None
     
     def get_reschedule_data(self, obj):
         """Get reschedule request data for RESCHEDULE_OFFER notifications"""
         if obj.notification_type == 'RESCHEDULE_OFFER' and obj.related_object_id:
             try:
-                from scheduling.models import ReschedulingRequest
                 from django.utils import timezone
                 
-                reschedule_req = ReschedulingRequest.objects.get(id=obj.related_object_id)
+                reschedule_req = self._reschedule_request(obj)
+                if reschedule_req is None:
+                    return None
                 
                 # Get original booking info
                 original_booking_info = None
@@ -70,27 +134,27 @@ class PatientNotificationSerializer(serializers.ModelSerializer):
                 return None
         return None
 
-class SecretaryNotificationSerializer(serializers.ModelSerializer):
-    related_booking_status = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = SecretaryNotification
-        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'related_booking_status']
-        read_only_fields = ['id', 'created_at']
-    
-    def get_related_booking_status(self, obj):
-        if obj.notification_type in ['NEW_BOOKING', 'BOOKING_CREATED'] and obj.related_object_id:
-            try:
-                booking = Booking.objects.get(id=obj.related_object_id)
-                return booking.status
-            except Booking.DoesNotExist:
-                return None
-        return None
+class SecretaryNotificationSerializer(DoctorNotificationSerializer):
+    """Doctor notifications as seen by a secretary, with the secretary's own read state (see secretary_feed)"""
+    is_read = serializers.BooleanField(source='secretary_is_read', read_only=True)
+    read_at = serializers.DateTimeField(source='secretary_read_at', read_only=True)
 
-class AdminNotificationSerializer(serializers.ModelSerializer):
+class AdminNotificationSerializer(RenderedMessageMixin, serializers.ModelSerializer):
     class Meta:
         from .models import AdminNotification
         model = AdminNotification
-        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id']
+        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'event_count', 'related_object_ids', 'last_event_at']
         read_only_fields = ['id', 'created_at']
 
+class ArchivedNotificationSerializer(RenderedMessageMixin, serializers.ModelSerializer):
+    # Only read notifications are archived
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        from .models import ArchivedNotification
+        model = ArchivedNotification
+        fields = ['id', 'message', 'notification_type', 'is_read', 'read_at', 'created_at', 'related_object_id', 'event_count', 'related_object_ids', 'last_event_at', 'archived_at']
+        read_only_fields = fields
+
+    def get_is_read(self, obj):
+        return True
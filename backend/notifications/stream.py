@@ -0,0 +1,85 @@
+"""
+Server-Sent Events stream of new notifications.
+
+Served through ASGI (config/asgi.py), e.g.:
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000
+
+EventSource cannot send an Authorization header, so the access token is passed
+as ?token=<access token>, and the message locale as ?lang=. Each new notification
+is pushed as an event named 'notification'; comment lines keep the connection
+alive between events.
+"""
+import json
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from users.models import User
+from .broker import get_broker
+from .messages import get_locale, render_notification
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+
+
+def _authenticate(raw_token):
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _channels_for(user):
+    """The broker channels whose notifications this user sees"""
+    if user.role == User.Role.DOCTOR and hasattr(user, 'doctor_profile'):
+        return [f'doctor:{user.doctor_profile.id}']
+    if user.role == User.Role.PATIENT and hasattr(user, 'patient_profile'):
+        return [f'patient:{user.patient_profile.id}']
+    if user.role == User.Role.SECRETARY and hasattr(user, 'secretary_profile'):
+        secretary = user.secretary_profile
+        if 'receive_notifications' in (secretary.permissions or []):
+            return [f'doctor:{secretary.doctor_id}']
+        return []
+    if user.role == User.Role.ADMIN:
+        return ['admin']
+    return []
+
+
+async def _event_stream(channels, locale):
+    subscription = get_broker().subscribe(channels)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                event = {**event, 'message': render_notification(SimpleNamespace(**event), locale)}
+                yield f'event: notification\ndata: {json.dumps(event)}\n\n'
+    finally:
+        # Runs when the client disconnects and the server cancels the stream
+        subscription.close()
+
+
+async def notification_stream(request):
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would be buffered forever and tie up a worker
+        return JsonResponse({'error': 'The notification stream requires an ASGI server'}, status=503)
+
+    user = await sync_to_async(_authenticate)(request.GET.get('token', ''))
+    if user is None:
+        return JsonResponse({'error': 'Invalid or expired token'}, status=401)
+
+    channels = await sync_to_async(_channels_for)(user)
+    if not channels:
+        return JsonResponse({'error': 'No notification stream for this user'}, status=403)
+
+    response = StreamingHttpResponse(_event_stream(channels, get_locale(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
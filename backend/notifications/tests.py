@@ -0,0 +1,456 @@
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from clinic.models import Booking
+from scheduling.models import ReschedulingRequest
+from users.models import User, Doctor, Patient, Secretary
+from .broker import DatabaseBroker
+from .messages import message, render
+from .models import ArchivedNotification, DoctorNotification, PatientNotification, SecretaryInboxState, SecretaryNotificationRead
+from .retention import compact_notifications
+from .unread_counts import _cache_key
+from .views import create_notification, create_notifications_bulk, secretary_feed
+
+
+def make_doctor_and_secretaries(tag):
+    doctor_user = User.objects.create_user(
+        email=f'doctor-{tag}@example.com', password='x', role=User.Role.DOCTOR, first_name='Doc', last_name=tag
+    )
+    doctor = Doctor.objects.create(user=doctor_user, specialty='Cardiology', is_verified=True)
+    secretaries = []
+    for name, permissions in (('inbox', ['receive_notifications', 'manage_bookings']), ('desk', ['manage_bookings'])):
+        user = User.objects.create_user(
+            email=f'{name}-{tag}@example.com', password='x', role=User.Role.SECRETARY, first_name=name, last_name=tag
+        )
+        secretaries.append(Secretary.objects.create(user=user, doctor=doctor, permissions=permissions))
+    return doctor, secretaries
+
+
+def new_booking(doctor, patient_name='Pat'):
+    create_notification(
+        'doctor', doctor, 'NEW_BOOKING',
+        message('new_booking', patient_name=patient_name, datetime='2026-01-01 10:00'), uuid.uuid4()
+    )
+
+
+class SecretaryInboxTests(APITestCase):
+    """Secretaries read the doctor's notifications with their own read state (fan-out on read)"""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, (self.secretary, self.desk) = make_doctor_and_secretaries('inbox')
+        self.client.force_authenticate(self.secretary.user)
+
+    def committed(self):
+        # Unread counters are adjusted once the transaction commits
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    def feed(self):
+        return {row['id']: row['is_read'] for row in self.client.get('/api/notifications/').data['results']}
+
+    def test_history_before_the_first_visit_counts_as_read(self):
+        new_booking(self.doctor)
+        self.assertEqual(list(self.feed().values()), [True])
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_read_state_is_separate_from_the_doctor(self):
+        self.feed()
+        with self.committed():
+            new_booking(self.doctor)
+        notification = DoctorNotification.objects.get()
+        self.assertEqual(self.feed(), {str(notification.id): False})
+        self.assertEqual(self.unread_count(), 1)
+
+        with self.committed():
+            self.client.post(f'/api/notifications/{notification.id}/read/')
+        self.assertEqual(self.feed(), {str(notification.id): True})
+        self.assertEqual(self.unread_count(), 0)
+        notification.refresh_from_db()
+        self.assertFalse(notification.is_read)
+
+        # The doctor reading it doesn't change anything for the secretary either way
+        DoctorNotification.objects.update(is_read=True)
+        SecretaryNotificationRead.objects.all().delete()
+        self.assertEqual(self.feed(), {str(notification.id): False})
+
+    def test_mark_all_read_moves_the_watermark(self):
+        self.feed()
+        with self.committed():
+            for name in 'AB':
+                create_notification('doctor', self.doctor, 'BOOKING_CANCELLED', message('patient_cancelled', patient_name=name, date='d', time='t'))
+        first = DoctorNotification.objects.order_by('created_at').first()
+        with self.committed():
+            self.client.post(f'/api/notifications/{first.id}/read/')
+        self.assertEqual(self.unread_count(), 1)
+
+        with self.committed():
+            self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(set(self.feed().values()), {True})
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(SecretaryNotificationRead.objects.exists())
+
+    def test_without_permission_the_inbox_is_empty(self):
+        new_booking(self.doctor)
+        self.assertFalse(secretary_feed(self.desk).exists())
+        self.client.force_authenticate(self.desk.user)
+        self.assertEqual(self.feed(), {})
+        self.assertEqual(self.unread_count(), 0)
+
+
+class InboxPagingTests(APITestCase):
+    """The inbox pages on (created_at, id), newest first"""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, _ = make_doctor_and_secretaries('paging')
+        self.client.force_authenticate(self.doctor.user)
+
+    def cancel(self, name):
+        create_notification('doctor', self.doctor, 'BOOKING_CANCELLED', message('patient_cancelled', patient_name=name, date='d', time='t'))
+
+    def pages(self, **params):
+        pages, url = [], '/api/notifications/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url, params = response.data['next'], {}
+        return pages
+
+    def test_pages_cover_the_inbox_once_in_order(self):
+        for name in 'ABCDE':
+            self.cancel(name)
+        # Bulk-created notifications share created_at: the id breaks the tie
+        latest = DoctorNotification.objects.order_by('-created_at').first()
+        DoctorNotification.objects.exclude(id=latest.id).update(created_at=timezone.now() - timedelta(minutes=1))
+
+        pages = self.pages(page_size=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        expected = DoctorNotification.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(sum(pages, []), [str(notification_id) for notification_id in expected])
+
+    def test_unread_only(self):
+        for name in 'ABC':
+            self.cancel(name)
+        read = DoctorNotification.objects.order_by('created_at').first()
+        DoctorNotification.objects.filter(id=read.id).update(is_read=True)
+
+        ids = sum(self.pages(page_size=1, unread_only='true'), [])
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(str(read.id), ids)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/notifications/', {'cursor': 'nope'}).status_code, 404)
+
+
+class UnreadCountTests(APITestCase):
+    """Unread counters change after commit and match the tables (notifications/unread_counts.py)"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='patient-unread@example.com', password='x', role=User.Role.PATIENT)
+        self.patient = Patient.objects.create(user=user)
+        self.client.force_authenticate(user)
+
+    def notify(self):
+        create_notification('patient', self.patient, 'BOOKING_CONFIRMED', message('booking_confirmed', doctor_name='Doc', datetime='2026-01-01 10:00'))
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    def cached_count(self):
+        return caches['default'].get(_cache_key('patient', self.patient.id))
+
+    def assertCountMatchesTable(self, expected):
+        self.assertEqual(self.unread_count(), expected)
+        self.assertEqual(PatientNotification.objects.filter(recipient=self.patient, is_read=False).count(), expected)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()
+    }})
+    def test_shared_cache_counter_is_adjusted(self):
+        self.assertCountMatchesTable(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notify()
+            self.notify()
+            # Nothing changes before commit
+            self.assertEqual(self.cached_count(), 0)
+        self.assertEqual(self.cached_count(), 2)
+        self.assertCountMatchesTable(2)
+
+        notification = PatientNotification.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notifications/{notification.id}/read/')
+        self.assertEqual(self.cached_count(), 1)
+        self.assertCountMatchesTable(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/notifications/mark-all-read/')
+        self.assertCountMatchesTable(0)
+
+    def test_rollback_leaves_the_counter_alone(self):
+        self.assertCountMatchesTable(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.notify()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.cached_count(), 0)
+        self.assertCountMatchesTable(0)
+
+    def test_local_cache_counter_is_dropped(self):
+        self.assertCountMatchesTable(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notify()
+        # LocMemCache is per process: recomputed on the next read instead of incremented
+        self.assertIsNone(self.cached_count())
+        self.assertCountMatchesTable(1)
+
+
+class StubSubscription:
+    def __init__(self, channels):
+        self.channels = channels
+        self.events = []
+
+    def deliver(self, event):
+        self.events.append(event)
+
+
+class DatabaseBrokerTests(TestCase):
+    """Events published in one process reach the subscribers of another through NotificationEvent"""
+
+    def test_poll_delivers_other_processes_events(self):
+        publisher, listener = DatabaseBroker(), DatabaseBroker()
+        subscription = StubSubscription(['doctor:1'])
+        # Registered without starting the poller thread; the test polls by hand
+        listener._subscribers['doctor:1'] = {subscription}
+
+        publisher.publish('doctor:1', {'id': 'a'})
+        publisher.publish('doctor:2', {'id': 'b'})
+        last_id = listener.poll(0)
+        self.assertEqual(subscription.events, [{'id': 'a'}])
+
+        publisher.publish('doctor:1', {'id': 'c'})
+        self.assertEqual(listener.poll(last_id), last_id + 1)
+        self.assertEqual(subscription.events, [{'id': 'a'}, {'id': 'c'}])
+
+
+class RelatedObjectsPrefetchTests(APITestCase):
+    """A page of notifications fetches its bookings and reschedule offers in one query each"""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, _ = make_doctor_and_secretaries('prefetch')
+        user = User.objects.create_user(email='patient-prefetch@example.com', password='x', role=User.Role.PATIENT)
+        self.patient = Patient.objects.create(user=user)
+        self.client.force_authenticate(user)
+
+    def add_notifications(self, count):
+        for _ in range(count):
+            booking = Booking.objects.create(
+                doctor=self.doctor, patient=self.patient,
+                booking_datetime=timezone.now() + timedelta(days=2), status=Booking.Status.CONFIRMED
+            )
+            create_notification('patient', self.patient, 'BOOKING_CONFIRMED',
+                                message('booking_confirmed', doctor_name='Doc', datetime='2026-01-01 10:00'), booking.id)
+            offer = ReschedulingRequest.objects.create(
+                token=uuid.uuid4().hex, original_booking=booking, doctor=self.doctor, patient=self.patient,
+                suggested_slots=[], expires_at=timezone.now() + timedelta(days=1)
+            )
+            create_notification('patient', self.patient, 'RESCHEDULE_OFFER',
+                                message('reschedule_offer', datetime='2026-01-01 10:00', hours=24, slots='-'), offer.id)
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.add_notifications(1)
+        few, _ = self.list_queries()
+        self.add_notifications(5)
+        many, results = self.list_queries()
+        self.assertEqual(few, many)
+
+        self.assertEqual(len(results), 12)
+        by_type = {}
+        for row in results:
+            by_type.setdefault(row['notification_type'], []).append(row)
+        self.assertEqual({row['related_booking_status'] for row in by_type['BOOKING_CONFIRMED']}, {Booking.Status.CONFIRMED})
+        self.assertEqual({row['reschedule_data']['status'] for row in by_type['RESCHEDULE_OFFER']}, {'PENDING'})
+        self.assertEqual(by_type['RESCHEDULE_OFFER'][0]['reschedule_data']['doctor_name'], 'Doc prefetch')
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.doctor, (self.secretary, _) = make_doctor_and_secretaries('retention')
+        self.old = timezone.now() - timedelta(days=200)
+
+    def make_notification(self, **fields):
+        notification = DoctorNotification.objects.create(recipient=self.doctor, message='x', **fields)
+        DoctorNotification.objects.filter(id=notification.id).update(created_at=self.old)
+        return notification
+
+    def test_keeps_rows_a_secretary_has_not_read(self):
+        marked = self.make_notification(is_read=True)
+        unread_by_secretary = self.make_notification(is_read=True)
+        unread_by_doctor = self.make_notification(is_read=False)
+        SecretaryInboxState.objects.create(secretary=self.secretary, read_all_before=self.old - timedelta(days=1))
+        SecretaryNotificationRead.objects.create(secretary=self.secretary, notification=marked)
+
+        compact_notifications(days=90, mode='archive', batch_size=1)
+        self.assertEqual(
+            set(DoctorNotification.objects.values_list('id', flat=True)), {unread_by_secretary.id, unread_by_doctor.id}
+        )
+
+        SecretaryInboxState.objects.filter(secretary=self.secretary).update(read_all_before=timezone.now())
+        compact_notifications(days=90, mode='delete')
+        self.assertEqual(list(DoctorNotification.objects.values_list('id', flat=True)), [unread_by_doctor.id])
+
+    def test_merged_digest_waits_for_the_secretary(self):
+        digest = self.make_notification(is_read=True, event_count=2, last_event_at=timezone.now())
+        SecretaryInboxState.objects.create(secretary=self.secretary, read_all_before=timezone.now() - timedelta(days=1))
+
+        compact_notifications(days=90)
+        self.assertTrue(DoctorNotification.objects.filter(id=digest.id).exists())
+
+    def test_archive_mode_keeps_a_copy(self):
+        notification = self.make_notification(is_read=True, template_key='new_booking', params={'patient_name': 'A', 'datetime': 'x'})
+        recent = DoctorNotification.objects.create(recipient=self.doctor, message='x', is_read=True)
+        SecretaryInboxState.objects.create(secretary=self.secretary, read_all_before=timezone.now())
+
+        self.assertEqual(compact_notifications(days=90, mode='archive')['doctor'], 1)
+        self.assertEqual(list(DoctorNotification.objects.values_list('id', flat=True)), [recent.id])
+        archived = ArchivedNotification.objects.get()
+        self.assertEqual((archived.id, archived.recipient_id, archived.params), (notification.id, self.doctor.id, notification.params))
+
+
+class TemplateKeyedMessageTests(APITestCase):
+    """Notifications store a template key and params and are rendered in the reader's locale"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='patient-locale@example.com', password='x', role=User.Role.PATIENT)
+        self.patient = Patient.objects.create(user=user)
+        self.client.force_authenticate(user)
+
+    def messages(self, **extra):
+        return [row['message'] for row in self.client.get('/api/notifications/', **extra).data['results']]
+
+    def test_rendered_in_the_readers_locale(self):
+        create_notification('patient', self.patient, 'BOOKING_CONFIRMED',
+                            message('booking_confirmed', doctor_name='Ali', datetime='2026-01-01 10:00'))
+        stored = PatientNotification.objects.get()
+        self.assertEqual((stored.template_key, stored.params), ('booking_confirmed', {'doctor_name': 'Ali', 'datetime': '2026-01-01 10:00'}))
+
+        [arabic] = self.messages()
+        self.assertIn('Ali', arabic)
+        self.assertEqual(self.messages(data={'lang': 'en'}), [render('booking_confirmed', stored.params, 'en')])
+        self.assertEqual(self.messages(HTTP_ACCEPT_LANGUAGE='en-US,en;q=0.9'), self.messages(data={'lang': 'en'}))
+        self.assertNotEqual(arabic, self.messages(data={'lang': 'en'})[0])
+
+    def test_rows_without_a_template_key_keep_their_text(self):
+        PatientNotification.objects.create(recipient=self.patient, notification_type='SYSTEM', message='Legacy text')
+        self.assertEqual(self.messages(data={'lang': 'en'}), ['Legacy text'])
+
+    def test_missing_params_fall_back_to_the_template(self):
+        self.assertIn('{doctor_name}', render('booking_confirmed', {}, 'en'))
+
+    def test_unknown_key(self):
+        with self.assertRaises(KeyError):
+            message('no_such_template')
+
+
+@override_settings(
+    NOTIFICATION_COALESCE_TYPES=['NEW_BOOKING'],
+    NOTIFICATION_COALESCE_WINDOW_SECONDS=60,
+    NOTIFICATION_COALESCE_MAX_EVENTS=3,
+)
+class CoalesceNotificationsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor, (self.secretary, _) = make_doctor_and_secretaries('coalesce')
+
+    def notifications(self):
+        return list(DoctorNotification.objects.filter(recipient=self.doctor).order_by('created_at'))
+
+    def test_burst_is_merged_into_one_digest(self):
+        new_booking(self.doctor, 'A')
+        first = self.notifications()[0]
+        new_booking(self.doctor, 'B')
+
+        [digest] = self.notifications()
+        self.assertEqual(digest.id, first.id)
+        self.assertEqual(digest.event_count, 2)
+        self.assertEqual(len(digest.related_object_ids), 2)
+        self.assertEqual(digest.params['patient_name'], 'B')
+        # Merging keeps the digest's place in the inbox order
+        self.assertEqual(digest.created_at, first.created_at)
+        self.assertGreater(digest.last_event_at, first.created_at)
+
+    def test_single_event_is_a_plain_notification(self):
+        new_booking(self.doctor)
+        [notification] = self.notifications()
+        self.assertEqual(notification.event_count, 1)
+        self.assertIsNone(notification.last_event_at)
+
+    def test_events_of_one_call_become_one_digest(self):
+        create_notifications_bulk('doctor', [
+            (self.doctor, 'NEW_BOOKING', message('new_booking', patient_name=name, datetime='x'), uuid.uuid4())
+            for name in ('A', 'B')
+        ])
+        [digest] = self.notifications()
+        self.assertEqual(digest.event_count, 2)
+
+    def test_other_types_are_not_merged(self):
+        new_booking(self.doctor)
+        create_notification('doctor', self.doctor, 'BOOKING_CANCELLED', message('patient_cancelled', patient_name='A', date='d', time='t'))
+        create_notification('doctor', self.doctor, 'BOOKING_CANCELLED', message('patient_cancelled', patient_name='B', date='d', time='t'))
+        self.assertEqual(len(self.notifications()), 3)
+
+    def test_read_digest_is_not_merged_into(self):
+        new_booking(self.doctor)
+        DoctorNotification.objects.update(is_read=True)
+        new_booking(self.doctor)
+        self.assertEqual(len(self.notifications()), 2)
+
+    def test_window_follows_the_latest_event(self):
+        new_booking(self.doctor, 'A')
+        new_booking(self.doctor, 'B')
+        # Opened long ago, but the last event is recent: still merged into
+        DoctorNotification.objects.update(created_at=timezone.now() - timedelta(minutes=10))
+        new_booking(self.doctor, 'C')
+        self.assertEqual([n.event_count for n in self.notifications()], [3])
+
+        DoctorNotification.objects.update(last_event_at=timezone.now() - timedelta(minutes=5))
+        DoctorNotification.objects.update(event_count=1)
+        new_booking(self.doctor, 'D')
+        self.assertEqual([n.event_count for n in self.notifications()], [1, 1])
+
+    def test_full_digest_starts_a_new_one(self):
+        for name in 'ABCD':
+            new_booking(self.doctor, name)
+        self.assertEqual([n.event_count for n in self.notifications()], [3, 1])
+
+    def test_merge_is_unread_again_for_secretaries(self):
+        new_booking(self.doctor, 'A')
+        [digest] = self.notifications()
+        SecretaryInboxState.objects.create(secretary=self.secretary, read_all_before=timezone.now())
+        self.assertTrue(secretary_feed(self.secretary).get(id=digest.id).secretary_is_read)
+
+        new_booking(self.doctor, 'B')
+        self.assertFalse(secretary_feed(self.secretary).get(id=digest.id).secretary_is_read)
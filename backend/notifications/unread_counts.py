@@ -0,0 +1,96 @@
+"""
+Unread notification counters for the notification badge.
+
+One counter per recipient is kept in the cache settings.UNREAD_COUNT_CACHE:
+- create_notification bumps the recipient's counter (and the counters of
+  secretaries that read the doctor's notifications)
+- marking notifications as read decrements / resets it
+- a missing counter is recomputed from the tables, and every counter expires
+  after UNREAD_COUNT_TTL so drift is reconciled periodically
+
+Changes are applied once the surrounding transaction commits, so a rollback leaves the
+counters alone. The cache must be shared by every process that creates notifications
+(web workers and `manage.py runworkers`): Redis, Memcached or DatabaseCache. With a
+per-process LocMemCache the counters are only dropped on change, never adjusted, and
+expire after LOCAL_UNREAD_COUNT_TTL, which bounds how long another process shows a stale badge.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+UNREAD_COUNT_TTL = 10 * 60  # Reconcile against the tables every 10 minutes
+LOCAL_UNREAD_COUNT_TTL = 30
+
+
+def _cache():
+    return caches[getattr(settings, 'UNREAD_COUNT_CACHE', 'default')]
+
+
+def _is_local(cache):
+    return isinstance(cache, LocMemCache)
+
+
+def _cache_key(kind, recipient_id):
+    return f'notifications_unread:{kind}:{recipient_id}'
+
+
+def _count_from_tables(kind, recipient):
+    from .models import DoctorNotification, PatientNotification, AdminNotification
+
+    if kind == 'doctor':
+        return DoctorNotification.objects.filter(recipient=recipient, is_read=False).count()
+    if kind == 'patient':
+        return PatientNotification.objects.filter(recipient=recipient, is_read=False).count()
+    if kind == 'secretary':
+        from .views import secretary_feed
+        return secretary_feed(recipient).filter(secretary_is_read=False).count()
+    return AdminNotification.objects.filter(is_read=False).count()
+
+
+def get_unread_count(kind, recipient=None):
+    """
+    kind: 'doctor', 'patient', 'secretary' or 'admin'
+    recipient: the Doctor, Patient or Secretary instance (None for admin)
+    """
+    cache = _cache()
+    key = _cache_key(kind, recipient.id if recipient else 'all')
+    count = cache.get(key)
+    if count is None:
+        count = _count_from_tables(kind, recipient)
+        cache.set(key, count, LOCAL_UNREAD_COUNT_TTL if _is_local(cache) else UNREAD_COUNT_TTL)
+    return count
+
+
+def adjust_unread_count(kind, recipient_id, delta):
+    """Add delta to a cached counter after commit. Missing counters are left to be recomputed on the next read."""
+    key = _cache_key(kind, recipient_id or 'all')
+
+    def adjust():
+        cache = _cache()
+        if _is_local(cache):
+            cache.delete(key)
+            return
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+
+    transaction.on_commit(adjust)
+
+
+def reset_unread_count(kind, recipient_id=None):
+    key = _cache_key(kind, recipient_id or 'all')
+
+    def reset():
+        cache = _cache()
+        cache.set(key, 0, LOCAL_UNREAD_COUNT_TTL if _is_local(cache) else UNREAD_COUNT_TTL)
+
+    transaction.on_commit(reset)
+
+
+def forget_unread_count(kind, recipient_id=None):
+    """Drop a counter whose change can't be derived cheaply; it is recomputed on the next read"""
+    key = _cache_key(kind, recipient_id or 'all')
+    transaction.on_commit(lambda: _cache().delete(key))
@@ -1,35 +1,172 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import BooleanField, Case, DateTimeField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from .models import DoctorNotification, PatientNotification, SecretaryNotification
-from .serializers import DoctorNotificationSerializer, PatientNotificationSerializer, SecretaryNotificationSerializer
+from django.utils.dateparse import parse_datetime
+from .broker import get_broker
+from .models import DoctorNotification, PatientNotification, SecretaryNotificationRead, SecretaryInboxState, ArchivedNotification
+from .serializers import (
+    DoctorNotificationSerializer, PatientNotificationSerializer, SecretaryNotificationSerializer,
+    AdminNotificationSerializer, ArchivedNotificationSerializer, related_objects_context
+)
+from .messages import Message, get_locale
+from .unread_counts import get_unread_count, adjust_unread_count, reset_unread_count, forget_unread_count
 from users.models import User
+from collections import Counter
+from datetime import timedelta
+
+def secretary_feed(secretary):
+    """
+    The doctor's notifications as seen by one of their secretaries (fan-out on read).
+    Annotates secretary_is_read / secretary_read_at from the secretary's read watermark
+    (compared with the latest event of digests) and per-notification read marks.
+    Empty without the 'receive_notifications' permission.
+    """
+    if 'receive_notifications' not in (secretary.permissions or []):
+        # Same annotations, so callers can filter on them
+        return DoctorNotification.objects.none().annotate(
+            secretary_is_read=Value(True, output_field=BooleanField()),
+            secretary_read_at=Value(None, output_field=DateTimeField())
+        )
+    
+    state, _ = SecretaryInboxState.objects.get_or_create(secretary=secretary)
+    read_marks = SecretaryNotificationRead.objects.filter(secretary=secretary, notification=OuterRef('pk'))
+    return DoctorNotification.objects.filter(recipient_id=secretary.doctor_id).alias(
+        latest_event_at=Coalesce('last_event_at', 'created_at')
+    ).annotate(
+        marked_read_at=Subquery(read_marks.values('read_at')[:1])
+    ).annotate(
+        secretary_is_read=Case(
+            When(latest_event_at__lt=state.read_all_before, then=Value(True)),
+            When(marked_read_at__isnull=False, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        ),
+        secretary_read_at=Case(
+            When(marked_read_at__isnull=False, then='marked_read_at'),
+            When(latest_event_at__lt=state.read_all_before, then=Value(state.read_all_before)),
+            default=None
+        )
+    )
+
+class NotificationCursorPagination(BasePagination):
+    """
+    Newest first, keyed on (created_at, id): ?cursor= is "<created_at>|<id>" of the last row of
+    the previous page (taken from the `next` link), so deep pages don't need OFFSET scans and
+    rows sharing a created_at (bulk-created notifications) are neither skipped nor repeated.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page_size = min(max(int(request.query_params.get(self.page_size_query_param, self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            page_size = self.page_size
+
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            cursor_created_at, _, cursor_id = cursor.rpartition('|')
+            cursor_created_at = parse_datetime(cursor_created_at)
+            if cursor_created_at is None or not cursor_id:
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(
+                Q(created_at__lt=cursor_created_at) | Q(created_at=cursor_created_at, id__lt=cursor_id)
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(self.request.build_absolute_uri(), 'cursor', f'{last.created_at.isoformat()}|{last.id}')
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
 
 class NotificationListView(APIView):
+    """
+    Paginated inbox for the current user.
+    Query params: cursor, page_size, unread_only=true
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         user = request.user
+        unread_only = request.query_params.get('unread_only', '').lower() in ('1', 'true', 'yes')
         
         if user.role == User.Role.DOCTOR and hasattr(user, 'doctor_profile'):
             notifications = DoctorNotification.objects.filter(recipient=user.doctor_profile)
-            serializer = DoctorNotificationSerializer(notifications, many=True)
+            if unread_only:
+                notifications = notifications.filter(is_read=False)
+            serializer_class = DoctorNotificationSerializer
         elif user.role == User.Role.PATIENT and hasattr(user, 'patient_profile'):
             notifications = PatientNotification.objects.filter(recipient=user.patient_profile)
-            serializer = PatientNotificationSerializer(notifications, many=True)
+            if unread_only:
+                notifications = notifications.filter(is_read=False)
+            serializer_class = PatientNotificationSerializer
         elif user.role == User.Role.SECRETARY and hasattr(user, 'secretary_profile'):
-            notifications = SecretaryNotification.objects.filter(recipient=user.secretary_profile)
-            serializer = SecretaryNotificationSerializer(notifications, many=True)
+            notifications = secretary_feed(user.secretary_profile)
+            if unread_only:
+                notifications = notifications.filter(secretary_is_read=False)
+            serializer_class = SecretaryNotificationSerializer
         elif user.role == User.Role.ADMIN:
             from .models import AdminNotification
-            from .serializers import AdminNotificationSerializer
             notifications = AdminNotification.objects.all()
-            serializer = AdminNotificationSerializer(notifications, many=True)
+            if unread_only:
+                notifications = notifications.filter(is_read=False)
+            serializer_class = AdminNotificationSerializer
         else:
-            return Response([])
+            notifications = DoctorNotification.objects.none()
+            serializer_class = DoctorNotificationSerializer
         
-        return Response(serializer.data)
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(notifications, request, view=self)
+        context = related_objects_context(page) if serializer_class is not AdminNotificationSerializer else {}
+        context['locale'] = get_locale(request)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+class ArchivedNotificationListView(APIView):
+    """
+    Notifications moved out of the inbox by the retention job (see notifications/retention.py).
+    Query params: cursor, page_size
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        archived = ArchivedNotification.objects.none()
+        
+        if user.role == User.Role.DOCTOR and hasattr(user, 'doctor_profile'):
+            archived = ArchivedNotification.objects.filter(recipient_type='doctor', recipient_id=user.doctor_profile.id)
+        elif user.role == User.Role.PATIENT and hasattr(user, 'patient_profile'):
+            archived = ArchivedNotification.objects.filter(recipient_type='patient', recipient_id=user.patient_profile.id)
+        elif user.role == User.Role.SECRETARY and hasattr(user, 'secretary_profile'):
+            secretary = user.secretary_profile
+            if 'receive_notifications' in (secretary.permissions or []):
+                archived = ArchivedNotification.objects.filter(recipient_type='doctor', recipient_id=secretary.doctor_id)
+        elif user.role == User.Role.ADMIN:
+            archived = ArchivedNotification.objects.filter(recipient_type='admin')
+        
+        paginator = NotificationCursorPagination()
+        page = paginator.paginate_queryset(archived, request, view=self)
+        serializer = ArchivedNotificationSerializer(page, many=True, context={'locale': get_locale(request)})
+        return paginator.get_paginated_response(serializer.data)
 
 class MarkNotificationReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -43,16 +180,24 @@ class MarkNotificationReadView(APIView):
             elif user.role == User.Role.PATIENT:
                 notification = PatientNotification.objects.get(id=notification_id, recipient=user.patient_profile)
             elif user.role == User.Role.SECRETARY:
-                notification = SecretaryNotification.objects.get(id=notification_id, recipient=user.secretary_profile)
+                secretary = user.secretary_profile
+                notification = secretary_feed(secretary).get(id=notification_id)
+                _, created = SecretaryNotificationRead.objects.get_or_create(secretary=secretary, notification=notification)
+                if created and not notification.secretary_is_read:
+                    adjust_unread_count('secretary', secretary.id, -1)
+                return Response({'status': 'marked as read'})
             elif user.role == User.Role.ADMIN:
                 from .models import AdminNotification
                 notification = AdminNotification.objects.get(id=notification_id)
             else:
                 return Response({'error': 'Invalid user role'}, status=400)
             
+            was_unread = not notification.is_read
             notification.is_read = True
             notification.read_at = timezone.now()
             notification.save()
+            if was_unread:
+                adjust_unread_count(user.role.lower(), getattr(notification, 'recipient_id', None), -1)
             return Response({'status': 'marked as read'})
         except Exception as e:
             return Response({'error': str(e)}, status=404)
@@ -67,62 +212,223 @@ class MarkAllReadView(APIView):
             DoctorNotification.objects.filter(recipient=user.doctor_profile, is_read=False).update(
                 is_read=True, read_at=timezone.now()
             )
+            reset_unread_count('doctor', user.doctor_profile.id)
         elif user.role == User.Role.PATIENT and hasattr(user, 'patient_profile'):
             PatientNotification.objects.filter(recipient=user.patient_profile, is_read=False).update(
                 is_read=True, read_at=timezone.now()
             )
+            reset_unread_count('patient', user.patient_profile.id)
         elif user.role == User.Role.SECRETARY and hasattr(user, 'secretary_profile'):
-            SecretaryNotification.objects.filter(recipient=user.secretary_profile, is_read=False).update(
-                is_read=True, read_at=timezone.now()
+            # Move the watermark forward; read marks older than it are now redundant
+            now = timezone.now()
+            SecretaryInboxState.objects.update_or_create(
+                secretary=user.secretary_profile, defaults={'read_all_before': now}
             )
+            SecretaryNotificationRead.objects.filter(
+                secretary=user.secretary_profile, notification__created_at__lt=now
+            ).delete()
+            reset_unread_count('secretary', user.secretary_profile.id)
         elif user.role == User.Role.ADMIN:
             from .models import AdminNotification
             AdminNotification.objects.filter(is_read=False).update(
                 is_read=True, read_at=timezone.now()
             )
+            reset_unread_count('admin')
         
         return Response({'status': 'all marked as read'})
 
+class UnreadCountView(APIView):
+    """Unread badge count for the current user, served from the cached counters"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        
+        if user.role == User.Role.DOCTOR and hasattr(user, 'doctor_profile'):
+            count = get_unread_count('doctor', user.doctor_profile)
+        elif user.role == User.Role.PATIENT and hasattr(user, 'patient_profile'):
+            count = get_unread_count('patient', user.patient_profile)
+        elif user.role == User.Role.SECRETARY and hasattr(user, 'secretary_profile'):
+            count = get_unread_count('secretary', user.secretary_profile)
+        elif user.role == User.Role.ADMIN:
+            count = get_unread_count('admin')
+        else:
+            count = 0
+        
+        return Response({'unread_count': count})
+
+NOTIFICATION_MODELS = {
+    'doctor': DoctorNotification,
+    'patient': PatientNotification,
+}
+
 # Helper function to create notifications
 def create_notification(recipient_type, recipient, notification_type, message, related_object_id=None):
     """
     Create a notification for a user.
-    recipient_type: 'doctor', 'patient', or 'secretary'
-    recipient: The Doctor, Patient, or Secretary instance
+    recipient_type: 'doctor' or 'patient' (secretaries read their doctor's notifications)
+    recipient: The Doctor or Patient instance
     notification_type: Type of notification (e.g., 'NEW_BOOKING', 'BOOKING_CONFIRMED')
-    message: The notification message
+    message: notifications.messages.message(<template key>, **params), rendered in the reader's locale
     related_object_id: Optional ID of related object (e.g. Booking ID)
     """
-    if recipient_type == 'doctor':
-        DoctorNotification.objects.create(
+    create_notifications_bulk(recipient_type, [(recipient, notification_type, message, related_object_id)])
+
+def create_notifications_bulk(recipient_type, items):
+    """
+    Create many notifications of the same recipient type with a single INSERT.
+    items: iterable of (recipient, notification_type, message, related_object_id) tuples,
+    where message is a notifications.messages.Message (or plain text)
+    Bursts of coalescible types are folded into digests first (see coalesce_notifications).
+    """
+    model = NOTIFICATION_MODELS.get(recipient_type)
+    if model is None:
+        return []
+
+    items, merged, new_digests = coalesce_notifications(model, list(items))
+    notifications = [
+        model(
             recipient=recipient,
             notification_type=notification_type,
-            message=message,
-            related_object_id=str(related_object_id) if related_object_id else None
+            related_object_id=str(related_object_id) if related_object_id else None,
+            **_message_fields(message)
         )
-        # Forward to authorized secretaries
+        for recipient, notification_type, message, related_object_id in items
+    ]
+    if notifications:
+        model.objects.bulk_create(notifications)
+    notifications += new_digests
+    if not notifications and not merged:
+        return []
+
+    # Bump the badge counters of the recipients (and of secretaries reading the doctor's stream).
+    # Merged digests were already unread for the recipient; for secretaries they may have become unread again.
+    new_by_recipient = Counter(n.recipient_id for n in notifications)
+    for recipient_id, new_count in new_by_recipient.items():
+        adjust_unread_count(recipient_type, recipient_id, new_count)
+    if recipient_type == 'doctor':
         from users.models import Secretary
-        secretaries = Secretary.objects.filter(doctor=recipient)
-        for sec in secretaries:
-            permissions = sec.permissions or []
-            if 'receive_notifications' in permissions:
-                SecretaryNotification.objects.create(
-                    recipient=sec,
-                    notification_type=notification_type,
-                    message=message,
-                    related_object_id=str(related_object_id) if related_object_id else None
-                )
-    elif recipient_type == 'patient':
-        PatientNotification.objects.create(
-            recipient=recipient,
-            notification_type=notification_type,
-            message=message,
-            related_object_id=str(related_object_id) if related_object_id else None
-        )
-    elif recipient_type == 'secretary':
-        SecretaryNotification.objects.create(
-            recipient=recipient,
-            notification_type=notification_type,
-            message=message,
-            related_object_id=str(related_object_id) if related_object_id else None
-        )
+        merged_doctor_ids = {n.recipient_id for n in merged}
+        secretaries = Secretary.objects.filter(
+            doctor_id__in=set(new_by_recipient) | merged_doctor_ids
+        ).values_list('id', 'doctor_id', 'permissions')
+        for secretary_id, doctor_id, permissions in secretaries:
+            if 'receive_notifications' not in (permissions or []):
+                continue
+            if doctor_id in merged_doctor_ids:
+                forget_unread_count('secretary', secretary_id)
+            else:
+                adjust_unread_count('secretary', secretary_id, new_by_recipient[doctor_id])
+
+    notifications += merged
+    transaction.on_commit(lambda: publish_notifications(recipient_type, notifications))
+    return notifications
+
+def coalesce_notifications(model, items):
+    """
+    Digest coalescing for bursts (settings.NOTIFICATION_COALESCE_TYPES / _WINDOW_SECONDS / _MAX_EVENTS).
+    An event of a coalescible type is merged into the recipient's latest unread notification of that
+    type whose last event is within the window; several such events for one recipient in the same call
+    become a single digest row. Merging sets last_event_at and leaves created_at alone, so the digest keeps
+    its place in the (created_at, id) ordering the inbox cursor pages through; secretaries' read marks
+    on it are dropped, and the watermark is compared with last_event_at (see secretary_feed), so it is
+    unread again for them.
+    Returns (items to insert as usual, digests updated in place, new digest rows).
+    """
+    types = set(getattr(settings, 'NOTIFICATION_COALESCE_TYPES', []))
+    window = getattr(settings, 'NOTIFICATION_COALESCE_WINDOW_SECONDS', 0)
+    max_events = getattr(settings, 'NOTIFICATION_COALESCE_MAX_EVENTS', 50)
+    if not types or window <= 0:
+        return items, [], []
+
+    remaining = []
+    groups = {}  # (recipient id, notification type) -> (recipient, [(message, related_object_id), ...])
+    for recipient, notification_type, message, related_object_id in items:
+        if notification_type in types:
+            groups.setdefault((recipient.pk, notification_type), (recipient, []))[1].append((message, related_object_id))
+        else:
+            remaining.append((recipient, notification_type, message, related_object_id))
+
+    now = timezone.now()
+    merged, new_digests = [], []
+    for (recipient_id, notification_type), (recipient, events) in groups.items():
+        with transaction.atomic():
+            digest = model.objects.select_for_update().alias(
+                latest_event_at=Coalesce('last_event_at', 'created_at')
+            ).filter(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                is_read=False,
+                latest_event_at__gte=now - timedelta(seconds=window),
+                event_count__lt=max_events
+            ).order_by('-created_at').first()
+
+            if digest is None:
+                if len(events) == 1:
+                    message, related_object_id = events[0]
+                    remaining.append((recipient, notification_type, message, related_object_id))
+                    continue
+                digest = model(recipient=recipient, notification_type=notification_type, event_count=0)
+            elif not digest.related_object_ids and digest.related_object_id:
+                digest.related_object_ids = [digest.related_object_id]
+
+            for message, related_object_id in events:
+                # The digest shows the latest event's text and links to its object
+                digest.template_key, digest.params, digest.message = '', {}, ''
+                for field, value in _message_fields(message).items():
+                    setattr(digest, field, value)
+                if related_object_id:
+                    digest.related_object_id = str(related_object_id)
+                    digest.related_object_ids.append(str(related_object_id))
+                digest.event_count += 1
+            digest.last_event_at = now
+
+            if digest._state.adding:
+                digest.save()
+                new_digests.append(digest)
+            else:
+                digest.save(update_fields=[
+                    'template_key', 'params', 'message', 'related_object_id',
+                    'related_object_ids', 'event_count', 'last_event_at'
+                ])
+                if model is DoctorNotification:
+                    SecretaryNotificationRead.objects.filter(notification=digest).delete()
+                merged.append(digest)
+
+    return remaining, merged, new_digests
+
+def _message_fields(message):
+    if isinstance(message, Message):
+        return {'template_key': message.key, 'params': message.params}
+    return {'message': message}
+
+def publish_notifications(channel_prefix, notifications):
+    """Push new notifications to connected SSE clients (see notifications/stream.py)"""
+    broker = get_broker()
+    for notification in notifications:
+        channel = channel_prefix if channel_prefix == 'admin' else f'{channel_prefix}:{notification.recipient_id}'
+        broker.publish(channel, {
+            'id': str(notification.id),
+            'notification_type': notification.notification_type,
+            'template_key': notification.template_key,
+            'params': notification.params,
+            'message': notification.message,
+            'related_object_id': notification.related_object_id,
+            'event_count': notification.event_count,
+            'related_object_ids': notification.related_object_ids,
+            'last_event_at': notification.last_event_at.isoformat() if notification.last_event_at else None,
+            'is_read': False,
+            'created_at': notification.created_at.isoformat(),
+        })
+
+def create_admin_notification(notification_type, message, related_object_id=None):
+    """Create a notification shown to all admins"""
+    from .models import AdminNotification
+    notification = AdminNotification.objects.create(
+        notification_type=notification_type,
+        related_object_id=str(related_object_id) if related_object_id else None,
+        **_message_fields(message)
+    )
+    adjust_unread_count('admin', None, 1)
+    transaction.on_commit(lambda: publish_notifications('admin', [notification]))
+    return notification
@@ -0,0 +1,22 @@
+"""
+Management command to expire rescheduling offers whose deadline has passed.
+The in-process sweeper already does this every minute; this command can also be run from cron.
+
+Usage: python manage.py expire_reschedule_offers [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+from scheduling.services import RescheduleExpiryService
+
+class Command(BaseCommand):
+    help = 'Expires stale rescheduling offers and releases their reserved bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Requests expired per transaction')
+
+    def handle(self, *args, **options):
+        expired = RescheduleExpiryService.expire_stale_requests(batch_size=options['batch_size'])
+
+        if expired > 0:
+            self.stdout.write(self.style.SUCCESS(f'Expired {expired} rescheduling request(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No stale rescheduling requests'))
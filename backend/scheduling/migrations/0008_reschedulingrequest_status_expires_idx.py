@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0007_remove_timeoff_suggestion_expiry_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reschedulingrequest',
+            index=models.Index(fields=['status', 'expires_at'], name='resched_status_expires_idx'),
+        ),
+    ]
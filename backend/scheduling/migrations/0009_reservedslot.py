@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:37
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def copy_reserved_bookings(apps, schema_editor):
+    """Move the JSON list of reserved booking IDs into ReservedSlot rows."""
+    ReschedulingRequest = apps.get_model('scheduling', 'ReschedulingRequest')
+    ReservedSlot = apps.get_model('scheduling', 'ReservedSlot')
+    Booking = apps.get_model('clinic', 'Booking')
+
+    for req in ReschedulingRequest.objects.exclude(reserved_bookings=[]).iterator():
+        bookings = Booking.objects.filter(id__in=req.reserved_bookings or [], reserved_slot__isnull=True)
+        ReservedSlot.objects.bulk_create([
+            ReservedSlot(rescheduling_request=req, booking=booking, slot_datetime=booking.booking_datetime)
+            for booking in bookings
+        ])
+
+
+def restore_reserved_bookings(apps, schema_editor):
+    ReschedulingRequest = apps.get_model('scheduling', 'ReschedulingRequest')
+    ReservedSlot = apps.get_model('scheduling', 'ReservedSlot')
+
+    for req in ReschedulingRequest.objects.all().iterator():
+        booking_ids = ReservedSlot.objects.filter(rescheduling_request=req).values_list('booking_id', flat=True)
+        req.reserved_bookings = [str(booking_id) for booking_id in booking_ids]
+        req.save(update_fields=['reserved_bookings'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0012_booking_reminder_sent'),
+        ('scheduling', '0008_reschedulingrequest_status_expires_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservedSlot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot_datetime', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserved_slot', to='clinic.booking')),
+                ('rescheduling_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reserved_slots', to='scheduling.reschedulingrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rescheduling_request', 'slot_datetime'], name='reserved_slot_request_idx')],
+            },
+        ),
+        migrations.RunPython(copy_reserved_bookings, restore_reserved_bookings),
+        migrations.RemoveField(
+            model_name='reschedulingrequest',
+            name='reserved_bookings',
+        ),
+    ]
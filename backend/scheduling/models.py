@@ -3,6 +3,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import Doctor, Patient
 from clinic.models import Booking
+from users.directory_cache import invalidate_booking_page
 
 class DoctorAvailability(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -29,6 +30,15 @@ class DoctorAvailability(models.Model):
     class Meta:
         ordering = ['day_of_week', 'start_time']
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Slots on the doctor's booking page
+        invalidate_booking_page(self.doctor_id)
+
+    def delete(self, *args, **kwargs):
+        invalidate_booking_page(self.doctor_id)
+        return super().delete(*args, **kwargs)
+
 class TimeOff(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='time_off_requests')
@@ -68,6 +78,15 @@ class TimeOff(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Blocked dates and slots on the doctor's booking page
+        invalidate_booking_page(self.doctor_id)
+
+    def delete(self, *args, **kwargs):
+        invalidate_booking_page(self.doctor_id)
+        return super().delete(*args, **kwargs)
+
 class ReschedulingRequest(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     token = models.CharField(max_length=255, unique=True) # Secure token for URL
@@ -82,8 +101,7 @@ class ReschedulingRequest(models.Model):
     # Suggested Slots (JSON List of ISO timestamps)
     suggested_slots = models.JSONField(default=list) 
     
-    # Reserved booking IDs for suggested slots (JSON list of UUIDs)
-    reserved_bookings = models.JSONField(default=list, blank=True)
+    # Reserved bookings for the suggested slots live in ReservedSlot (related_name='reserved_slots')
     
     class Status(models.TextChoices):
         PENDING = 'PENDING', 'Pending'
@@ -95,3 +113,22 @@ class ReschedulingRequest(models.Model):
     expires_at = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Used by the expiry sweeper: PENDING offers whose expires_at has passed
+            models.Index(fields=['status', 'expires_at'], name='resched_status_expires_idx'),
+        ]
+
+class ReservedSlot(models.Model):
+    """A PENDING booking held for the patient while a rescheduling offer is open."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    rescheduling_request = models.ForeignKey(ReschedulingRequest, on_delete=models.CASCADE, related_name='reserved_slots')
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='reserved_slot')
+    slot_datetime = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Slot lookup when the patient accepts an offer
+            models.Index(fields=['rescheduling_request', 'slot_datetime'], name='reserved_slot_request_idx'),
+        ]
@@ -0,0 +1,43 @@
+"""
+Rescheduling Offer Expiry Sweeper
+Runs as a background thread within the Django process.
+Every minute, expires PENDING rescheduling requests whose deadline has passed:
+- Marks the requests EXPIRED
+- Cancels their reserved PENDING bookings so the slots count as free again
+- Notifies the patients in one batch
+"""
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_SECONDS = 60  # Sweep every minute
+
+
+def _sweeper_loop():
+    """Background loop that runs the expiry sweep periodically."""
+    from django.db import close_old_connections
+    from scheduling.services import RescheduleExpiryService
+
+    # Wait 60 seconds after startup before first sweep
+    time.sleep(60)
+
+    while True:
+        try:
+            expired = RescheduleExpiryService.expire_stale_requests()
+            if expired:
+                logger.info(f"Expired {expired} rescheduling request(s)")
+        except Exception as e:
+            logger.error(f"Reschedule expiry sweeper error: {e}")
+        finally:
+            close_old_connections()
+
+        time.sleep(INTERVAL_SECONDS)
+
+
+def start_reschedule_sweeper():
+    """Start the sweeper as a daemon thread."""
+    thread = threading.Thread(target=_sweeper_loop, daemon=True)
+    thread.start()
+    logger.info("Rescheduling offer expiry sweeper started (sweeping every minute)")
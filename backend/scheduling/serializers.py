@@ -26,9 +26,14 @@ class ReschedulingRequestSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
     patient_name = serializers.CharField(source='patient.user.get_full_name', read_only=True)
     original_booking_details = BookingSerializer(source='original_booking', read_only=True)
+    reserved_bookings = serializers.SerializerMethodField()
     
     class Meta:
         model = ReschedulingRequest
         fields = ['id', 'token', 'doctor_name', 'patient_name', 'suggested_slots', 
                   'reserved_bookings', 'status', 'expires_at', 'original_booking_details']
+    
+    def get_reserved_bookings(self, obj):
+        # .all() so prefetch_related('reserved_slots') serves a list of requests with one query
+        return [str(slot.booking_id) for slot in obj.reserved_slots.all()]
 
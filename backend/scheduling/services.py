@@ -1,10 +1,21 @@
 import datetime
+import logging
 from django.db.models import Q
 from dateutil.relativedelta import relativedelta
 from clinic.models import Booking
 from scheduling.models import DoctorAvailability
+from users.directory_cache import invalidate_booking_page
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+def parse_slot_datetime(slot_iso):
+    """Parses a suggested slot ISO string into an aware datetime (naive slots are in local time)."""
+    slot_dt = datetime.datetime.fromisoformat(slot_iso.replace('Z', '+00:00'))
+    if timezone.is_naive(slot_dt):
+        slot_dt = timezone.make_aware(slot_dt)
+    return slot_dt
+
 class ConflictService:
     @staticmethod
     def check_conflicts(doctor, start_date, end_date):
@@ -29,7 +40,7 @@ class ConflictService:
         Reserves slots as PENDING bookings for each patient.
         Expiry is calculated dynamically as a fraction of time until the earliest suggested slot.
         """
-        from scheduling.models import ReschedulingRequest
+        from scheduling.models import ReschedulingRequest, ReservedSlot
         import secrets
         
         # Filter by time range if specified
@@ -93,19 +104,20 @@ class ConflictService:
                 expires_at = now + datetime.timedelta(days=1)
             
             # Reserve slots as PENDING bookings
-            reserved_booking_ids = []
+            reserved = []
             for slot_iso in suggested_slots:
                 try:
+                    slot_dt = parse_slot_datetime(slot_iso)
                     reserved_booking = Booking.objects.create(
                         doctor=time_off_request.doctor,
                         patient=booking.patient,
-                        booking_datetime=slot_iso,
+                        booking_datetime=slot_dt,
                         status=Booking.Status.PENDING,
-                        notes="حجز محجوز كبديل - Reserved alternative slot"
+                        patient_notes="حجز محجوز كبديل - Reserved alternative slot"
                     )
-                    reserved_booking_ids.append(str(reserved_booking.id))
+                    reserved.append((slot_dt, reserved_booking))
                 except Exception as e:
-                    print(f"Failed to reserve slot {slot_iso}: {e}")
+                    logger.error(f"Failed to reserve slot {slot_iso}: {e}")
             
             # Create ReschedulingRequest
             token = secrets.token_urlsafe(32)
@@ -116,37 +128,37 @@ class ConflictService:
                 doctor=time_off_request.doctor,
                 patient=booking.patient,
                 suggested_slots=suggested_slots,
-                reserved_bookings=reserved_booking_ids,
                 expires_at=expires_at
             )
+            ReservedSlot.objects.bulk_create([
+                ReservedSlot(rescheduling_request=reschedule_req, booking=reserved_booking, slot_datetime=slot_dt)
+                for slot_dt, reserved_booking in reserved
+            ])
             
             # Send Notification
             try:
                 from notifications.views import create_notification
+                from notifications.messages import message
                 
                 # Calculate human-readable expiry time
                 expiry_hours = max(1, int(expiry_seconds / 3600))
+                slots_text = ", ".join([s[:10] for s in suggested_slots[:3]])  # Show dates only
+                booking_time = booking.booking_datetime.strftime("%Y-%m-%d %H:%M")
                 if expiry_hours >= 24:
-                    expiry_text = f"{expiry_hours // 24} يوم و {expiry_hours % 24} ساعة"
+                    offer_msg = message('reschedule_offer_days', datetime=booking_time, days=expiry_hours // 24,
+                                        hours=expiry_hours % 24, slots=slots_text)
                 else:
-                    expiry_text = f"{expiry_hours} ساعة"
-                
-                slots_text = ", ".join([s[:10] for s in suggested_slots[:3]])  # Show dates only
-                message = (
-                    f'عذراً، تم إلغاء موعدك بتاريخ {booking.booking_datetime.strftime("%Y-%m-%d %H:%M")} '
-                    f'بسبب ظرف طارئ للطبيب. لديك {expiry_text} لاختيار موعد بديل. '
-                    f'المواعيد المقترحة: {slots_text}'
-                )
+                    offer_msg = message('reschedule_offer', datetime=booking_time, hours=expiry_hours, slots=slots_text)
                 
                 create_notification(
                     'patient',
                     booking.patient,
                     'RESCHEDULE_OFFER',
-                    message,
+                    offer_msg,
                     related_object_id=reschedule_req.id
                 )
             except Exception as e:
-                print(f"Failed to send notification: {e}")
+                logger.error(f"Failed to send notification: {e}")
             
             results["rescheduling_count"] += 1
         
@@ -261,3 +273,169 @@ class SmartSlotEngine:
             days_searched += 1
             
         return suggested_slots
+
+
+class DoctorSlotService:
+    @staticmethod
+    def get_slots(doctor, days):
+        """
+        The doctor's bookable slots for the next `days` days (today included) and the dates
+        blocked for digital booking. Loads the availabilities, the time offs and the booked
+        people per slot with one query each, whatever the number of days.
+        Returns (slots, blocked_dates).
+        """
+        from django.db.models import Sum
+        from scheduling.models import TimeOff
+
+        now = timezone.now()
+        today = now.date()
+        last_date = today + datetime.timedelta(days=days - 1)
+        # Determine effective cutoff time: either the defined cutoff or at least the current time
+        cutoff_time = now + datetime.timedelta(hours=doctor.booking_cutoff_hours)
+        effective_cutoff = cutoff_time if doctor.is_booking_cutoff_active else now
+
+        availabilities_by_day = {}
+        for avail in DoctorAvailability.objects.filter(doctor=doctor, is_available=True):
+            availabilities_by_day.setdefault(avail.day_of_week, []).append(avail)
+
+        # Time offs overlapping the window (excluding CANCELLED); id order, as .first() used to pick
+        time_offs = list(
+            TimeOff.objects.filter(doctor=doctor, start_date__lte=last_date, end_date__gte=today)
+            .exclude(status='CANCELLED').order_by('id')
+        )
+
+        # Count TOTAL PEOPLE per slot, not just bookings - only CANCELLED frees the slot
+        window_start = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+        window_end = timezone.make_aware(datetime.datetime.combine(last_date + datetime.timedelta(days=1), datetime.time.min))
+        booked_people = dict(
+            Booking.objects.filter(doctor=doctor, booking_datetime__gte=window_start, booking_datetime__lt=window_end)
+            .exclude(status='CANCELLED').order_by()
+            .values_list('booking_datetime').annotate(total_people=Sum('number_of_people'))
+        )
+
+        slots = []
+        blocked_dates = []
+        for day_offset in range(days):
+            check_date = today + datetime.timedelta(days=day_offset)
+            # Convert python weekday (0=Mon) to our format (0=Sun)
+            day_of_week = (check_date.weekday() + 1) % 7
+
+            day_offs = [off for off in time_offs if off.start_date <= check_date <= off.end_date]
+            full_off = next((off for off in day_offs if off.start_time is None and off.end_time is None), None)
+            if full_off:
+                if full_off.type == 'DIGITAL_UNAVAILABLE':
+                    blocked_dates.append(check_date.isoformat())
+                continue
+            partial_offs = [off for off in day_offs if off.start_time is not None or off.end_time is not None]
+
+            for avail in availabilities_by_day.get(day_of_week, []):
+                # Generate time slots
+                current_time = datetime.datetime.combine(check_date, avail.start_time)
+                end_time = datetime.datetime.combine(check_date, avail.end_time)
+                step = datetime.timedelta(minutes=avail.slot_duration)
+
+                while current_time + step <= end_time:
+                    slot_datetime = timezone.make_aware(current_time)
+                    is_off_slot = any(off.start_time <= current_time.time() <= off.end_time for off in partial_offs)
+
+                    if slot_datetime >= effective_cutoff and not is_off_slot:
+                        existing_people = booked_people.get(slot_datetime, 0)
+                        available_spots = max(0, avail.max_patients_per_slot - existing_people)
+
+                        # Return ALL slots, including full ones (for display purposes)
+                        slots.append({
+                            'datetime': slot_datetime.isoformat(),
+                            'available_spots': available_spots,
+                            'max_spots': avail.max_patients_per_slot,
+                            'booked_people': existing_people,
+                            'is_full': available_spots <= 0
+                        })
+
+                    current_time += step
+
+        return slots, blocked_dates
+
+
+class RescheduleExpiryService:
+    EXPIRED_REASON = 'انتهت صلاحية المواعيد البديلة'
+
+    @staticmethod
+    def release_reserved_bookings(requests, reason=EXPIRED_REASON):
+        """
+        Cancels the still-PENDING reserved bookings of the given rescheduling requests
+        with a single UPDATE. Returns the number of bookings released.
+        """
+        from scheduling.models import ReservedSlot
+
+        reserved_booking_ids = ReservedSlot.objects.filter(
+            rescheduling_request__in=[req.id for req in requests]
+        ).values('booking_id')
+        for doctor_id in {req.doctor_id for req in requests}:
+            invalidate_booking_page(doctor_id)
+        return Booking.objects.filter(
+            id__in=reserved_booking_ids,
+            status=Booking.Status.PENDING
+        ).update(
+            status=Booking.Status.CANCELLED,
+            cancellation_reason=reason,
+            next_reminder_at=None
+        )
+
+    @staticmethod
+    def notify_expired(requests):
+        """Sends the expiry notification for each request to its patient in one batch."""
+        try:
+            from notifications.views import create_notifications_bulk
+            from notifications.messages import message
+            create_notifications_bulk('patient', [
+                (
+                    req.patient,
+                    'RESCHEDULE_EXPIRED',
+                    message('reschedule_expired', doctor_name=f'{req.doctor.user.first_name} {req.doctor.user.last_name}'),
+                    req.id
+                )
+                for req in requests
+            ])
+        except Exception as e:
+            logger.error(f"Failed to send expiry notifications: {e}")
+
+    @staticmethod
+    def expire_stale_requests(batch_size=500):
+        """
+        Sweeps PENDING rescheduling requests whose expires_at has passed.
+        Each batch marks the requests EXPIRED, releases their reserved bookings
+        with one UPDATE and sends the expiry notifications in bulk.
+        Uses the (status, expires_at) index. Returns the number of requests expired.
+        """
+        from django.db import transaction
+        from scheduling.models import ReschedulingRequest
+
+        now = timezone.now()
+        total_expired = 0
+
+        while True:
+            with transaction.atomic():
+                expired_ids = list(
+                    ReschedulingRequest.objects.select_for_update().filter(
+                        status=ReschedulingRequest.Status.PENDING,
+                        expires_at__lt=now
+                    ).order_by('expires_at').values_list('id', flat=True)[:batch_size]
+                )
+                if not expired_ids:
+                    break
+
+                ReschedulingRequest.objects.filter(id__in=expired_ids).update(
+                    status=ReschedulingRequest.Status.EXPIRED
+                )
+                expired = list(
+                    ReschedulingRequest.objects.filter(id__in=expired_ids)
+                    .select_related('doctor__user', 'patient')
+                )
+                RescheduleExpiryService.release_reserved_bookings(expired)
+                RescheduleExpiryService.notify_expired(expired)
+
+            total_expired += len(expired_ids)
+            if len(expired_ids) < batch_size:
+                break
+
+        return total_expired
@@ -0,0 +1,179 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clinic.models import Booking
+from notifications.models import PatientNotification
+from users.models import User, Doctor, Patient
+from .models import ReschedulingRequest, ReservedSlot
+from .services import RescheduleExpiryService
+
+
+def make_doctor_and_patient(tag):
+    doctor_user = User.objects.create_user(
+        email=f'doctor-{tag}@example.com', password='x', role=User.Role.DOCTOR, first_name='Doc', last_name=tag
+    )
+    doctor = Doctor.objects.create(user=doctor_user, specialty='Cardiology', is_verified=True)
+    patient_user = User.objects.create_user(
+        email=f'patient-{tag}@example.com', password='x', role=User.Role.PATIENT, first_name='Pat', last_name=tag
+    )
+    patient = Patient.objects.create(user=patient_user)
+    return doctor, patient
+
+
+class RescheduleTestCase(TestCase):
+    """A cancelled booking and rescheduling offers holding two reserved slots each"""
+
+    def setUp(self):
+        cache.clear()
+        self.doctor, self.patient = make_doctor_and_patient('reschedule')
+        self.original = Booking.objects.create(
+            doctor=self.doctor, patient=self.patient,
+            booking_datetime=timezone.now() + timedelta(days=1), status=Booking.Status.CANCELLED
+        )
+        self.slots = [(timezone.now() + timedelta(days=3 + i)).replace(microsecond=0) for i in range(2)]
+
+    def make_request(self, expires_in=timedelta(days=1)):
+        request = ReschedulingRequest.objects.create(
+            token=uuid.uuid4().hex, original_booking=self.original, doctor=self.doctor, patient=self.patient,
+            suggested_slots=[slot.isoformat() for slot in self.slots], expires_at=timezone.now() + expires_in
+        )
+        bookings = []
+        for slot in self.slots:
+            booking = Booking.objects.create(
+                doctor=self.doctor, patient=self.patient, booking_datetime=slot, status=Booking.Status.PENDING
+            )
+            ReservedSlot.objects.create(rescheduling_request=request, booking=booking, slot_datetime=slot)
+            bookings.append(booking)
+        return request, bookings
+
+    def statuses(self, bookings):
+        return [Booking.objects.get(id=booking.id).status for booking in bookings]
+
+
+class RescheduleExpirySweepTests(RescheduleTestCase):
+    def test_expired_offers_are_swept(self):
+        expired, expired_bookings = self.make_request(expires_in=-timedelta(minutes=1))
+        open_request, open_bookings = self.make_request()
+
+        self.assertEqual(RescheduleExpiryService.expire_stale_requests(batch_size=1), 1)
+        expired.refresh_from_db()
+        open_request.refresh_from_db()
+        self.assertEqual(expired.status, ReschedulingRequest.Status.EXPIRED)
+        self.assertEqual(open_request.status, ReschedulingRequest.Status.PENDING)
+        self.assertEqual(self.statuses(expired_bookings), [Booking.Status.CANCELLED] * 2)
+        self.assertEqual(self.statuses(open_bookings), [Booking.Status.PENDING] * 2)
+        self.assertEqual(
+            list(PatientNotification.objects.values_list('notification_type', flat=True)), ['RESCHEDULE_EXPIRED']
+        )
+
+    def test_sweep_runs_in_batches(self):
+        for _ in range(3):
+            self.make_request(expires_in=-timedelta(minutes=1))
+        self.assertEqual(RescheduleExpiryService.expire_stale_requests(batch_size=2), 3)
+        self.assertEqual(RescheduleExpiryService.expire_stale_requests(), 0)
+
+    def test_handled_offers_are_left_alone(self):
+        accepted, bookings = self.make_request(expires_in=-timedelta(minutes=1))
+        ReschedulingRequest.objects.filter(id=accepted.id).update(status=ReschedulingRequest.Status.ACCEPTED)
+        Booking.objects.filter(id=bookings[0].id).update(status=Booking.Status.CONFIRMED)
+
+        self.assertEqual(RescheduleExpiryService.expire_stale_requests(), 0)
+        self.assertEqual(self.statuses(bookings), [Booking.Status.CONFIRMED, Booking.Status.PENDING])
+
+
+class RescheduleAcceptTests(RescheduleTestCase):
+    """Accept (POST) and reject (DELETE) claim the offer with a status-filtered UPDATE"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient.user)
+
+    def accept(self, request, slot=0):
+        return self.client.post(
+            f'/api/scheduling/reschedule-requests/{request.id}/accept/',
+            {'selected_slot': self.slots[slot].isoformat()}, format='json'
+        )
+
+    def reject(self, request):
+        return self.client.delete(f'/api/scheduling/reschedule-requests/{request.id}/accept/')
+
+    def stale_read(self, request):
+        """Make the view read `request` as it is now, whatever happens to the row afterwards"""
+        stale = ReschedulingRequest.objects.get(id=request.id)
+        return mock.patch.object(ReschedulingRequest.objects, 'get', return_value=stale)
+
+    def test_accept_confirms_the_selected_slot(self):
+        request, bookings = self.make_request()
+        response = self.accept(request, slot=1)
+        self.assertEqual(response.status_code, 200, response.data)
+
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.ACCEPTED)
+        self.assertEqual(request.new_booking_id, bookings[1].id)
+        self.assertEqual(self.statuses(bookings), [Booking.Status.CANCELLED, Booking.Status.CONFIRMED])
+        self.original.refresh_from_db()
+        self.assertEqual(self.original.rescheduled_from_id, bookings[1].id)
+
+    def test_second_answer_is_refused(self):
+        request, bookings = self.make_request()
+        self.assertEqual(self.accept(request).status_code, 200)
+        self.assertEqual(self.accept(request, slot=1).status_code, 400)
+        self.assertEqual(self.reject(request).status_code, 400)
+        self.assertEqual(self.statuses(bookings), [Booking.Status.CONFIRMED, Booking.Status.CANCELLED])
+
+    def test_reject_racing_an_accept(self):
+        request, bookings = self.make_request()
+        with self.stale_read(request):
+            self.assertEqual(self.accept(request).status_code, 200)
+            response = self.reject(request)
+        self.assertEqual(response.status_code, 400)
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.ACCEPTED)
+        self.assertEqual(self.statuses(bookings)[0], Booking.Status.CONFIRMED)
+
+    def test_accept_racing_a_reject(self):
+        request, bookings = self.make_request()
+        with self.stale_read(request):
+            self.assertEqual(self.reject(request).status_code, 200)
+            response = self.accept(request)
+        self.assertEqual(response.status_code, 400)
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.REJECTED)
+        self.assertEqual(self.statuses(bookings), [Booking.Status.CANCELLED] * 2)
+
+    def test_expiry_racing_an_accept(self):
+        request, bookings = self.make_request()
+        # Read while still pending, and by the time of the expiry check already expired
+        stale = ReschedulingRequest.objects.get(id=request.id)
+        stale.expires_at = timezone.now() - timedelta(minutes=1)
+        self.assertEqual(self.accept(request).status_code, 200)
+
+        with mock.patch.object(ReschedulingRequest.objects, 'get', return_value=stale):
+            response = self.accept(request)
+        self.assertEqual(response.data['error'], 'Already handled')
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.ACCEPTED)
+        self.assertEqual(self.statuses(bookings)[0], Booking.Status.CONFIRMED)
+
+    def test_expired_offer_is_released(self):
+        request, bookings = self.make_request(expires_in=-timedelta(minutes=1))
+        response = self.accept(request)
+        self.assertEqual(response.data['error'], 'Expired')
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.EXPIRED)
+        self.assertEqual(self.statuses(bookings), [Booking.Status.CANCELLED] * 2)
+
+    def test_released_reservation_undoes_the_claim(self):
+        request, bookings = self.make_request()
+        Booking.objects.filter(id=bookings[0].id).update(status=Booking.Status.CANCELLED)
+        self.assertEqual(self.accept(request).status_code, 409)
+        request.refresh_from_db()
+        self.assertEqual(request.status, ReschedulingRequest.Status.PENDING)
+        self.assertEqual(self.statuses(bookings)[1], Booking.Status.PENDING)
@@ -3,12 +3,16 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import TimeOff, ReschedulingRequest, DoctorAvailability
 from .serializers import TimeOffSerializer, ReschedulingRequestSerializer, DoctorAvailabilitySerializer
-from .services import ConflictService, SmartSlotEngine
+from .services import ConflictService, SmartSlotEngine, DoctorSlotService, RescheduleExpiryService, parse_slot_datetime
 from users.models import User, Doctor
+from users.directory_cache import invalidate_booking_page
 from clinic.models import Booking
 from django.utils import timezone
 from datetime import datetime, timedelta
 import uuid
+import logging
+
+logger = logging.getLogger(__name__)
 
 class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
     serializer_class = DoctorAvailabilitySerializer
@@ -35,6 +39,7 @@ class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
         
         # Clear existing and create new
         DoctorAvailability.objects.filter(doctor=doctor).delete()
+        invalidate_booking_page(doctor.id)
         
         for avail in availabilities:
             DoctorAvailability.objects.create(
@@ -66,96 +71,9 @@ class DoctorSlotsView(views.APIView):
                  'message': 'Doctor is not accepting digital bookings'
              })
         
-        # Booking Visibility Limit
-        weeks_visible = doctor.booking_visibility_weeks
-        days_visible = weeks_visible * 7
-        
-        # Get next X days
-        today = timezone.now().date()
-        cutoff_time = timezone.now() + timedelta(hours=doctor.booking_cutoff_hours)
-        
-        slots = []
-        blocked_dates = []
-        
-        availabilities = DoctorAvailability.objects.filter(doctor=doctor, is_available=True)
-        
-        for day_offset in range(0, days_visible + 1):  # usage of dynamic visibility - starting from 0 (today)
-            check_date = today + timedelta(days=day_offset)
-            day_of_week = check_date.weekday()
-            # Convert python weekday (0=Mon) to our format (0=Sun)
-            day_of_week = (day_of_week + 1) % 7
-            
-            # Find availability for this day
-            day_avails = availabilities.filter(day_of_week=day_of_week)
-            
-            # Check for Full Day TimeOff (excluding CANCELLED)
-            full_off = TimeOff.objects.filter(
-                doctor=doctor,
-                start_date__lte=check_date,
-                end_date__gte=check_date,
-                start_time__isnull=True,
-                end_time__isnull=True
-            ).exclude(status='CANCELLED').first()
-            
-            if full_off:
-                if full_off.type == 'DIGITAL_UNAVAILABLE':
-                    blocked_dates.append(check_date.isoformat())
-                continue
-
-            # Get partial time offs (excluding CANCELLED)
-            partial_offs = TimeOff.objects.filter(
-                doctor=doctor,
-                start_date__lte=check_date,
-                end_date__gte=check_date
-            ).exclude(start_time__isnull=True, end_time__isnull=True).exclude(status='CANCELLED')
-            
-            for avail in day_avails:
-                # Generate time slots
-                current_time = datetime.combine(check_date, avail.start_time)
-                end_time = datetime.combine(check_date, avail.end_time)
-                
-                while current_time + timedelta(minutes=avail.slot_duration) <= end_time:
-                    slot_datetime = timezone.make_aware(current_time)
-                    
-                    # Determine effective cutoff time: either the defined cutoff or at least the current time
-                    effective_cutoff = cutoff_time if doctor.is_booking_cutoff_active else timezone.now()
-                    if slot_datetime < effective_cutoff:
-                        current_time += timedelta(minutes=avail.slot_duration)
-                        continue
-                    
-                    # Check partial time off
-                    is_off_slot = False
-                    for off in partial_offs:
-                        if off.start_time <= current_time.time() <= off.end_time:
-                            is_off_slot = True
-                            break
-                    
-                    if is_off_slot:
-                         current_time += timedelta(minutes=avail.slot_duration)
-                         continue
-
-                    # Check existing bookings for this slot - count TOTAL PEOPLE not just bookings
-                    # Only CANCELLED frees the slot
-                    from django.db.models import Sum
-                    existing_people_result = Booking.objects.filter(
-                        doctor=doctor,
-                        booking_datetime=slot_datetime
-                    ).exclude(status='CANCELLED').aggregate(total_people=Sum('number_of_people'))
-                    existing_people = existing_people_result['total_people'] or 0
-                    
-                    available_spots = max(0, avail.max_patients_per_slot - existing_people)
-                    is_full = available_spots <= 0
-                    
-                    # Return ALL slots, including full ones (for display purposes)
-                    slots.append({
-                        'datetime': slot_datetime.isoformat(),
-                        'available_spots': available_spots,
-                        'max_spots': avail.max_patients_per_slot,
-                        'booked_people': existing_people,
-                        'is_full': is_full
-                    })
-                    
-                    current_time += timedelta(minutes=avail.slot_duration)
+        # Booking Visibility Limit - starting from 0 (today)
+        days_visible = doctor.booking_visibility_weeks * 7
+        slots, blocked_dates = DoctorSlotService.get_slots(doctor, days_visible + 1)
         
         return Response({
             'doctor_id': str(doctor_id),
@@ -260,7 +178,9 @@ class PublicReschedulingView(views.APIView):
     
     def get(self, request, token):
         try:
-            req = ReschedulingRequest.objects.get(token=token)
+            req = ReschedulingRequest.objects.select_related(
+                'doctor__user', 'patient__user', 'original_booking'
+            ).prefetch_related('reserved_slots').get(token=token)
             if req.expires_at < timezone.now():
                 return Response({"error": "Token expired"}, status=400)
                 
@@ -323,13 +243,20 @@ class AuthenticatedRescheduleAcceptView(views.APIView):
                     "status": req.status
                 }, status=400)
             
+            from django.db import transaction
+            
             # Check expiry
             if req.expires_at < timezone.now():
-                req.status = ReschedulingRequest.Status.EXPIRED
-                req.save()
-                # Cancel all reserved bookings on expiry
-                self._cancel_reserved_bookings(req)
-                self._send_expiry_notification(req)
+                with transaction.atomic():
+                    # Only expire a request still pending: a concurrent accept may have claimed it
+                    expired = ReschedulingRequest.objects.filter(
+                        id=req.id, status=ReschedulingRequest.Status.PENDING
+                    ).update(status=ReschedulingRequest.Status.EXPIRED)
+                    if not expired:
+                        return Response({"error": "Already handled", "error_ar": "تم التعامل مع هذا الطلب مسبقاً"}, status=400)
+                    # Cancel all reserved bookings on expiry
+                    RescheduleExpiryService.release_reserved_bookings([req])
+                RescheduleExpiryService.notify_expired([req])
                 return Response({"error": "Expired", "error_ar": "انتهت صلاحية العرض"}, status=400)
             
             selected_slot = request.data.get('selected_slot')
@@ -340,70 +267,80 @@ class AuthenticatedRescheduleAcceptView(views.APIView):
             if selected_slot not in req.suggested_slots:
                 return Response({"error": "Invalid slot", "error_ar": "موعد غير صالح"}, status=400)
             
-            from django.db import transaction
+            slot_dt = parse_slot_datetime(selected_slot)
             
             with transaction.atomic():
-                # Find the reserved booking for the selected slot and CONFIRM it
-                selected_booking = None
-                for booking_id_str in req.reserved_bookings:
-                    try:
-                        reserved_booking = Booking.objects.get(id=booking_id_str)
-                        if reserved_booking.booking_datetime.isoformat() == selected_slot or str(reserved_booking.booking_datetime) == selected_slot:
-                            reserved_booking.status = Booking.Status.CONFIRMED
-                            reserved_booking.notes = ''
-                            reserved_booking.save()
-                            selected_booking = reserved_booking
-                        else:
-                            # Cancel the other reserved bookings
-                            reserved_booking.status = Booking.Status.CANCELLED
-                            reserved_booking.cancellation_reason = 'تم اختيار موعد بديل آخر'
-                            reserved_booking.save()
-                    except Booking.DoesNotExist:
-                        pass
+                # Claim the request: of two concurrent accepts only one gets past this UPDATE
+                claimed = ReschedulingRequest.objects.filter(
+                    id=req.id, status=ReschedulingRequest.Status.PENDING
+                ).update(status=ReschedulingRequest.Status.ACCEPTED)
+                if not claimed:
+                    return Response({"error": "Already handled", "error_ar": "تم التعامل مع هذا الطلب مسبقاً"}, status=400)
+                
+                # Find the reserved booking for the selected slot (indexed join on the request)
+                selected_booking_id = req.reserved_slots.filter(
+                    slot_datetime=slot_dt
+                ).values_list('booking_id', flat=True).first()
+                
+                # CONFIRM the selected reservation and cancel the others: two set-based UPDATEs
+                if selected_booking_id:
+                    confirmed = Booking.objects.filter(id=selected_booking_id, status=Booking.Status.PENDING).update(
+                        status=Booking.Status.CONFIRMED,
+                        patient_notes=''
+                    )
+                    if not confirmed:
+                        # The reservation was released meanwhile (offer expired): undo the claim
+                        transaction.set_rollback(True)
+                        return Response({"error": "Slot no longer reserved", "error_ar": "لم يعد هذا الموعد محجوزاً"}, status=409)
+                other_reservations = Booking.objects.filter(
+                    id__in=req.reserved_slots.values('booking_id'),
+                    status=Booking.Status.PENDING
+                )
+                if selected_booking_id:
+                    other_reservations = other_reservations.exclude(id=selected_booking_id)
+                other_reservations.update(
+                    status=Booking.Status.CANCELLED,
+                    cancellation_reason='تم اختيار موعد بديل آخر',
+                    next_reminder_at=None
+                )
+                invalidate_booking_page(req.doctor_id)
                 
                 # If no reserved booking found for the slot, create a new one
-                if not selected_booking:
-                    selected_booking = Booking.objects.create(
+                if not selected_booking_id:
+                    selected_booking_id = Booking.objects.create(
                         doctor=req.doctor,
                         patient=req.patient,
-                        booking_datetime=selected_slot,
+                        booking_datetime=slot_dt,
                         status=Booking.Status.CONFIRMED,
-                    )
-            
-            # Update reschedule request
-            req.status = ReschedulingRequest.Status.ACCEPTED
-            req.new_booking = selected_booking
-            req.save()
+                    ).id
+                ReschedulingRequest.objects.filter(id=req.id).update(new_booking_id=selected_booking_id)
             
             # Link original booking
-            if req.original_booking:
-                req.original_booking.rescheduled_from = selected_booking
-                req.original_booking.save()
+            if req.original_booking_id:
+                Booking.objects.filter(id=req.original_booking_id).update(rescheduled_from_id=selected_booking_id)
             
             # Send confirmation notification
             try:
                 from notifications.views import create_notification
+                from notifications.messages import message
                 from datetime import datetime
                 
                 slot_dt = datetime.fromisoformat(selected_slot.replace('Z', '+00:00'))
-                formatted_date = slot_dt.strftime('%Y-%m-%d')
-                formatted_time = slot_dt.strftime('%H:%M')
-                
-                message_ar = f'تم تحويل حجزك بنجاح! موعدك الجديد: {formatted_date} الساعة {formatted_time} مع د. {req.doctor.user.first_name} {req.doctor.user.last_name}'
                 
                 create_notification(
                     'patient',
                     req.patient,
                     'BOOKING_CONFIRMED',
-                    message_ar,
-                    related_object_id=selected_booking.id
+                    message('reschedule_accepted', date=slot_dt.strftime('%Y-%m-%d'), time=slot_dt.strftime('%H:%M'),
+                            doctor_name=f'{req.doctor.user.first_name} {req.doctor.user.last_name}'),
+                    related_object_id=selected_booking_id
                 )
-            except Exception as e:
-                print(f"Failed to send confirmation notification: {e}")
+            except Exception:
+                logger.exception("Failed to send confirmation notification")
             
             return Response({
                 "status": "success",
-                "new_booking_id": str(selected_booking.id),
+                "new_booking_id": str(selected_booking_id),
                 "message": "تم تحويل حجزك بنجاح",
                 "new_datetime": selected_slot
             })
@@ -420,46 +357,23 @@ class AuthenticatedRescheduleAcceptView(views.APIView):
             if not hasattr(request.user, 'patient_profile') or req.patient != request.user.patient_profile:
                 return Response({"error": "Unauthorized"}, status=403)
             
-            if req.status != ReschedulingRequest.Status.PENDING:
-                return Response({"error": "Already handled"}, status=400)
-            
-            req.status = ReschedulingRequest.Status.REJECTED
-            req.save()
+            from django.db import transaction
             
-            # Cancel all reserved bookings
-            self._cancel_reserved_bookings(req)
+            with transaction.atomic():
+                # Only reject a request still pending: a concurrent accept may have claimed it
+                rejected = ReschedulingRequest.objects.filter(
+                    id=req.id, status=ReschedulingRequest.Status.PENDING
+                ).update(status=ReschedulingRequest.Status.REJECTED)
+                if not rejected:
+                    return Response({"error": "Already handled"}, status=400)
+                
+                # Cancel all reserved bookings
+                RescheduleExpiryService.release_reserved_bookings([req])
             
             return Response({"status": "rejected"})
             
         except ReschedulingRequest.DoesNotExist:
             return Response({"error": "Not found"}, status=404)
-    
-    def _cancel_reserved_bookings(self, req):
-        """Cancel all reserved PENDING bookings for a rescheduling request"""
-        for booking_id_str in req.reserved_bookings:
-            try:
-                reserved_booking = Booking.objects.get(id=booking_id_str)
-                if reserved_booking.status == Booking.Status.PENDING:
-                    reserved_booking.status = Booking.Status.CANCELLED
-                    reserved_booking.cancellation_reason = 'انتهت صلاحية المواعيد البديلة'
-                    reserved_booking.save()
-            except Booking.DoesNotExist:
-                pass
-    
-    def _send_expiry_notification(self, req):
-        """Send expiry notification to patient"""
-        try:
-            from notifications.views import create_notification
-            message = f'انتهت صلاحية المواعيد البديلة لموعدك الملغى مع د. {req.doctor.user.first_name} {req.doctor.user.last_name}. يرجى حجز موعد جديد.'
-            create_notification(
-                'patient',
-                req.patient,
-                'RESCHEDULE_EXPIRED',
-                message,
-                related_object_id=req.id
-            )
-        except Exception as e:
-            print(f"Failed to send expiry notification: {e}")
 
 
 class DaySlotsView(views.APIView):
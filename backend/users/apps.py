@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from core.email_service import load_email_templates
+        load_email_templates()
+        from . import signals  # noqa: F401  (admin statistics receivers)
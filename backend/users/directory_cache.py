@@ -0,0 +1,101 @@
+"""
+Doctor directory response cache.
+
+DoctorListView, DoctorFacetsView and DoctorDetailView responses are cached per normalized query string
+(parameters sorted, so ?a=1&b=2 and ?b=2&a=1 share an entry). Keys include a directory version;
+anything that changes what the directory shows bumps the version, so stale entries are
+simply never read again and expire on their own:
+- Doctor.save (profile edits, verification) and User.save of a doctor (name, picture, ban, deletion)
+- rating writes (clinic/rating_stats.py)
+
+Responses carry an ETag and Cache-Control, and a matching If-None-Match gets a 304.
+
+The booking page (DoctorBookingPageView) also shows slot occupancy, time off and ratings, so
+its entries additionally carry a per-doctor version, bumped on booking, availability, time off
+and rating changes (invalidate_booking_page), and expire after BOOKING_PAGE_CACHE_SECONDS.
+"""
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_CACHE_KEY = 'doctor_directory_version'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Also after the key was evicted: a fresh timestamp never matches an older entry
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _booking_page_version_key(doctor_id):
+    return f'doctor_booking_page_version:{doctor_id}'
+
+
+def _directory_version():
+    return _version(VERSION_CACHE_KEY)
+
+
+def booking_page_version(doctor_id):
+    return _version(_booking_page_version_key(doctor_id))
+
+
+def invalidate_doctor_directory():
+    """Bump the directory version (called on commit after a directory-visible change)"""
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def invalidate_booking_page(doctor_id):
+    """Bump the doctor's booking page version (on commit when inside a transaction)"""
+    transaction.on_commit(lambda: cache.set(_booking_page_version_key(doctor_id), time.time_ns(), None))
+
+
+def _etag_matches(etag, if_none_match):
+    """Whether the If-None-Match header lists etag (weak comparison: W/ prefixes are ignored)"""
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+    return etag.strip('"') in tags or '*' in tags
+
+
+class DirectoryCacheMixin:
+    """For the read-only doctor directory views: serve GETs from the versioned response cache"""
+    directory_cache_name = None
+    directory_cache_timeout_setting = 'DOCTOR_DIRECTORY_CACHE_SECONDS'
+    directory_max_age_setting = 'DOCTOR_DIRECTORY_MAX_AGE'
+
+    def get_cache_version(self):
+        return _directory_version()
+
+    def get(self, request, *args, **kwargs):
+        query = sorted(request.query_params.lists())
+        raw_key = json.dumps([request.get_host(), kwargs, query], sort_keys=True, default=str)
+        cache_key = (
+            f'doctor_directory:{self.get_cache_version()}:{self.directory_cache_name}:'
+            f'{hashlib.md5(raw_key.encode()).hexdigest()}'
+        )
+
+        cached = cache.get(cache_key)
+        if cached is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            body = json.dumps(response.data, sort_keys=True, default=str)
+            cached = (response.data, quote_etag(hashlib.md5(body.encode()).hexdigest()))
+            cache.set(cache_key, cached, getattr(settings, self.directory_cache_timeout_setting, 600))
+
+        data, etag = cached
+        if _etag_matches(etag, request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=getattr(settings, self.directory_max_age_setting, 60))
+        return response
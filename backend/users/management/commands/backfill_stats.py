@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the admin dashboard statistics (DailyStats rows and the
+StatCounter totals) from the patient, doctor and booking tables, fixing any drift.
+With --days only the last N days of DailyStats are rewritten.
+
+Usage: python manage.py backfill_stats [--days N]
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from users.stats import rebuild_stats
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily statistics and counters of the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Only rebuild the last N days (default: all)')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is not None and days <= 0:
+            raise CommandError('--days must be positive')
+        since = timezone.localdate() - timedelta(days=days - 1) if days else None
+
+        written = rebuild_stats(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the statistics of {written} day(s) and the counters'))
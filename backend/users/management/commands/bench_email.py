@@ -0,0 +1,134 @@
+"""
+Email pipeline throughput benchmark.
+Starts a local in-process SMTP sink (core/smtp_sink.py) and a pool of EmailWorkers configured
+with the sink directly, queues emails rendered from the real templates in users/templates/emails/
+and reports throughput, SMTP connections, threads and memory. Fails if any message did not arrive.
+
+The SMTPSettings table is never touched, so real emails keep going out through the active
+configuration. The benchmark's outbox rows are parked in the future, out of reach of the shared
+workers (which only claim due rows), and deleted afterwards.
+
+Usage: python manage.py bench_email [--count 500] [--rate 0] [--timeout 120]
+"""
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.email_service import POLL_SECONDS, EmailWorker, render_email
+from core.smtp_sink import SMTPSink
+from users.models import SMTPSettings, OutboundEmail
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DOMAIN = 'bench.invalid'
+PARKED_AT = datetime(9999, 1, 1, tzinfo=dt_timezone.utc)  # Never due for the shared workers
+
+# (template, subject, context) for every email template
+TEMPLATES = [
+    ('emails/verify_email.html', 'تأكيد البريد الإلكتروني - عيادتك الرقمية',
+     {'name': 'Bench', 'verification_url': 'http://localhost:5173/verify-email?token=bench'}),
+    ('emails/reset_password.html', 'استعادة كلمة المرور - عيادتك الرقمية',
+     {'name': 'Bench', 'reset_url': 'http://localhost:5173/reset-password?token=bench'}),
+    ('emails/password_changed.html', 'تم تغيير كلمة المرور - عيادتك الرقمية', {'name': 'Bench'}),
+    ('emails/booking_reminder.html', 'تذكير بموعدك - عيادتك الرقمية',
+     {'patient_name': 'Bench', 'doctor_name': 'Doc Bench', 'appointment_date': '2026-01-01', 'appointment_time': '10:00 AM'}),
+    ('emails/account_deletion_scheduled.html', 'تم جدولة حذف حسابك - عيادتك الرقمية', {'name': 'Bench'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the email outbox against a local SMTP sink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Number of emails to send')
+        parser.add_argument('--rate', type=float, default=0, help='Emails enqueued per second (0 = as fast as possible)')
+        parser.add_argument('--timeout', type=int, default=120, help='Seconds to wait for delivery')
+
+    def handle(self, *args, **options):
+        count, rate = options['count'], options['rate']
+        run_id = uuid.uuid4().hex[:8]
+        sender = f'bench-{run_id}@{BENCH_DOMAIN}'
+        recipients = [f'{run_id}-{i}@{BENCH_DOMAIN}' for i in range(count)]
+        bench_emails = OutboundEmail.objects.filter(from_email=sender)
+
+        sink = SMTPSink().start()
+        # Unsaved: handed to the benchmark's own workers, never activated
+        sink_config = SMTPSettings(
+            host=sink.host, port=sink.port, email_host_user=sender, email_host_password='bench', use_tls=False
+        )
+        wakeup = threading.Event()
+        workers = [
+            EmailWorker(f'bench-{index}', smtp_config=sink_config, outbox=bench_emails, wakeup=wakeup)
+            for index in range(getattr(settings, 'EMAIL_WORKER_COUNT', 2))
+        ]
+        for worker in workers:
+            worker.start()
+
+        peak_threads = [0]
+        sampling = threading.Event()
+
+        def sample_threads():
+            # Pipeline threads only: leave out the sink's per-connection threads and this sampler
+            while not sampling.is_set():
+                peak_threads[0] = max(peak_threads[0], threading.active_count() - sink.open_connections - 1)
+                time.sleep(0.02)
+
+        sampler = threading.Thread(target=sample_threads, daemon=True)
+        tracemalloc.start()
+        try:
+            sampler.start()
+            started = time.perf_counter()
+            for i, recipient in enumerate(recipients):
+                if rate > 0:
+                    delay = started + i / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                template_name, subject, context = TEMPLATES[i % len(TEMPLATES)]
+                # What send_dynamic_email does, into the benchmark's own rows
+                OutboundEmail.objects.create(
+                    subject=subject, html_content=render_email(template_name, context), recipients=[recipient],
+                    from_email=sender, next_attempt_at=PARKED_AT
+                )
+                wakeup.set()
+            enqueued = time.perf_counter()
+
+            deadline = enqueued + options['timeout']
+            while sink.messages < count and time.perf_counter() < deadline:
+                time.sleep(0.05)
+            finished = time.perf_counter()
+        finally:
+            sampling.set()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            for worker in workers:
+                worker.stop()
+            for worker in workers:
+                worker.join(timeout=POLL_SECONDS * 2)
+            sink.stop()
+            statuses = {status: bench_emails.filter(status=status).count() for status in OutboundEmail.Status.values}
+            bench_emails.delete()
+
+        missing = [r for r in recipients if sink.recipients[r] == 0]
+        duplicated = [r for r in recipients if sink.recipients[r] > 1]
+
+        elapsed = finished - started
+        self.stdout.write(f'Emails:             {count} ({len(TEMPLATES)} templates, rate {"unlimited" if rate <= 0 else f"{rate:g}/s"})')
+        self.stdout.write(f'Enqueue time:       {enqueued - started:.2f}s ({count / max(enqueued - started, 1e-9):.0f} emails/s)')
+        self.stdout.write(f'Delivered:          {sink.messages} in {elapsed:.2f}s ({sink.messages / max(elapsed, 1e-9):.1f} emails/s)')
+        self.stdout.write(f'SMTP connections:   {sink.connections}')
+        self.stdout.write(f'Peak threads:       {peak_threads[0]}')
+        self.stdout.write(f'Peak traced memory: {peak_memory / 1024 / 1024:.1f} MiB')
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux
+            self.stdout.write(f'Max RSS:            {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB')
+        self.stdout.write(f'Outbox statuses:    {statuses}')
+
+        if missing or duplicated:
+            raise CommandError(f'{len(missing)} email(s) never arrived, {len(duplicated)} arrived more than once')
+        self.stdout.write(self.style.SUCCESS(f'All {count} emails arrived exactly once'))
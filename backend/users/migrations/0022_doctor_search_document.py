@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+from users.search import normalize
+
+
+def fill_search_documents(apps, schema_editor):
+    Doctor = apps.get_model('users', 'Doctor')
+    doctors = []
+    for doctor in Doctor.objects.select_related('user').only('id', 'specialty', 'user__first_name', 'user__last_name').iterator(chunk_size=1000):
+        doctor.search_document = normalize(f'{doctor.user.first_name} {doctor.user.last_name} {doctor.specialty}')
+        doctors.append(doctor)
+    Doctor.objects.bulk_update(doctors, ['search_document'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
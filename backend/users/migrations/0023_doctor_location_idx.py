@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_doctor_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['latitude', 'longitude'], name='doctor_location_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:02
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_rating_stats(apps, schema_editor):
+    Doctor = apps.get_model('users', 'Doctor')
+    public = Q(ratings__is_public=True)
+    doctors = Doctor.objects.annotate(
+        total=Sum('ratings__stars', filter=public, default=0), count=Count('ratings', filter=public)
+    ).filter(count__gt=0)
+    for doctor in doctors.iterator():
+        Doctor.objects.filter(id=doctor.id).update(
+            rating_sum=doctor.total, rating_count=doctor.count,
+            rating_avg=(Decimal(doctor.total) / doctor.count).quantize(Decimal('0.01')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0023_doctor_location_idx'),
+        ('clinic', '0015_archivedbooking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['rating_avg', 'rating_count'], name='doctor_rating_idx'),
+        ),
+        migrations.RunPython(fill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_doctor_rating_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['is_verified', 'specialty', 'gender', 'consultation_price', 'rating_avg'], name='doctor_facet_idx'),
+        ),
+    ]
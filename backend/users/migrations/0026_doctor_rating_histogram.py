@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:08
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_rating_histogram(apps, schema_editor):
+    Doctor = apps.get_model('users', 'Doctor')
+    Rating = apps.get_model('clinic', 'Rating')
+    counts = (
+        Rating.objects.filter(is_public=True).order_by()
+        .values_list('doctor_id', 'stars').annotate(count=Count('id'))
+    )
+    for doctor_id, stars, count in counts.iterator():
+        Doctor.objects.filter(id=doctor_id).update(**{f'rating_{stars}_count': count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0025_doctor_facet_idx'),
+        ('clinic', '0016_rating_doctor_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_histogram, migrations.RunPython.noop),
+    ]
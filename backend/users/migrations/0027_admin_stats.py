@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:10
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_admin_stats(apps, schema_editor):
+    DailyStats = apps.get_model('users', 'DailyStats')
+    StatCounter = apps.get_model('users', 'StatCounter')
+    Patient = apps.get_model('users', 'Patient')
+    Doctor = apps.get_model('users', 'Doctor')
+    Booking = apps.get_model('clinic', 'Booking')
+    ArchivedBooking = apps.get_model('clinic', 'ArchivedBooking')
+
+    days = {}
+    for field, model, date_field in (
+        ('patients_registered', Patient, 'user__date_joined'),
+        ('doctors_registered', Doctor, 'user__date_joined'),
+        ('bookings_created', Booking, 'created_at'),
+        ('bookings_created', ArchivedBooking, 'created_at'),
+    ):
+        per_day = model.objects.annotate(day=TruncDate(date_field)).order_by().values('day').annotate(count=Count('id'))
+        for row in per_day:
+            counts = days.setdefault(row['day'], {})
+            counts[field] = counts.get(field, 0) + row['count']
+    DailyStats.objects.bulk_create([DailyStats(date=day, **counts) for day, counts in days.items()])
+
+    StatCounter.objects.create(name='patients', value=Patient.objects.count())
+    StatCounter.objects.create(name='bookings', value=Booking.objects.count() + ArchivedBooking.objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0026_doctor_rating_histogram'),
+        ('clinic', '0016_rating_doctor_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('patients_registered', models.PositiveIntegerField(default=0)),
+                ('doctors_registered', models.PositiveIntegerField(default=0)),
+                ('bookings_created', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_admin_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -18,6 +19,9 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('role', 'ADMIN')
         return self.create_user(email, password, **extra_fields)
 
+# User fields shown in the doctor directory (see users/directory_cache.py)
+DIRECTORY_USER_FIELDS = {'first_name', 'last_name', 'email', 'profile_picture', 'is_banned', 'is_deleted'}
+
 # 1. Custom User Model (Replaces default auth_user)
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -45,6 +49,21 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [] # Email is handled by USERNAME_FIELD
 
+    def save(self, *args, **kwargs):
+        super(User, self).save(*args, **kwargs)
+        if self.role != User.Role.DOCTOR:
+            return
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or DIRECTORY_USER_FIELDS & set(update_fields):
+            from .directory_cache import invalidate_doctor_directory
+            transaction.on_commit(invalidate_doctor_directory)
+        if update_fields is None or {'first_name', 'last_name'} & set(update_fields):
+            # The doctor's search document includes the name
+            doctor = Doctor.objects.filter(user=self).only('id', 'specialty', 'search_document').first()
+            if doctor:
+                doctor.user = self
+                doctor.update_search_document()
+
     def __str__(self):
         return self.email
 
@@ -110,7 +129,62 @@ class Doctor(models.Model):
     
     # Auto-Approve Settings
     auto_approve_bookings = models.BooleanField(default=False, help_text="Automatically approve incoming bookings")
-    
+
+    # Normalized name + specialty for search (see users/search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+
+    # Public rating aggregates, maintained by clinic/rating_stats.py
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    # Star histogram: public ratings per star value
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter of ?near= searches
+            models.Index(fields=['latitude', 'longitude'], name='doctor_location_idx'),
+            # ?ordering=-rating_avg
+            models.Index(fields=['rating_avg', 'rating_count'], name='doctor_rating_idx'),
+            # Directory facet filters and the facet counts aggregation (users/search.py)
+            models.Index(fields=['is_verified', 'specialty', 'gender', 'consultation_price', 'rating_avg'], name='doctor_facet_idx'),
+        ]
+
+    @property
+    def rating_histogram(self):
+        """{'1': count, ..., '5': count} of the public ratings"""
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
+
+    def save(self, *args, **kwargs):
+        from .search import doctor_search_document, bump_search_index
+
+        document = doctor_search_document(self.user, self.specialty)
+        changed = document != self.search_document
+        update_fields = kwargs.get('update_fields')
+        if changed:
+            self.search_document = document
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super(Doctor, self).save(*args, **kwargs)
+        if changed:
+            transaction.on_commit(bump_search_index)
+        from .directory_cache import invalidate_doctor_directory
+        transaction.on_commit(invalidate_doctor_directory)
+
+    def update_search_document(self):
+        """Refresh search_document after the user's name changed"""
+        from .search import doctor_search_document, bump_search_index
+
+        document = doctor_search_document(self.user, self.specialty)
+        if document != self.search_document:
+            self.search_document = document
+            Doctor.objects.filter(id=self.id).update(search_document=document)
+            transaction.on_commit(bump_search_index)
+
     @property
     def max_patients_per_session(self):
         """Calculate max patients based on session duration and time per patient"""
@@ -162,6 +236,18 @@ class SMTPSettings(models.Model):
             # Deactivate all other SMTP settings
             SMTPSettings.objects.filter(is_active=True).update(is_active=False)
         super(SMTPSettings, self).save(*args, **kwargs)
+        self._invalidate_email_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super(SMTPSettings, self).delete(*args, **kwargs)
+        self._invalidate_email_cache()
+        return result
+
+    def _invalidate_email_cache(self):
+        # The email workers cache the active config (core/email_service.py)
+        from django.db import transaction
+        from core.email_service import invalidate_smtp_config
+        transaction.on_commit(invalidate_smtp_config)
 
     def __str__(self):
         return f"SMTP Config: {self.email_host_user} ({'Active' if self.is_active else 'Inactive'})"
@@ -196,3 +282,51 @@ class PasswordResetToken(models.Model):
 
     def __str__(self):
         return f"Reset Token for {self.user.email}"
+
+# 7. Email Outbox (sent by the worker pool in core/email_service.py)
+class OutboundEmail(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        SENDING = "SENDING", "Sending"
+        SENT = "SENT", "Sent"
+        DEAD = "DEAD", "Dead"  # Gave up after EMAIL_MAX_ATTEMPTS
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField()
+    recipients = models.JSONField(default=list)
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim due PENDING rows oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+# 8. Admin Statistics (maintained by users/stats.py)
+class DailyStats(models.Model):
+    date = models.DateField(primary_key=True)
+    patients_registered = models.PositiveIntegerField(default=0)
+    doctors_registered = models.PositiveIntegerField(default=0)
+    bookings_created = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.date}"
+
+class StatCounter(models.Model):
+    # Running totals of large tables, e.g. 'patients', 'bookings'
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
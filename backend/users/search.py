@@ -0,0 +1,318 @@
+"""
+Doctor search.
+
+Doctor.search_document holds the doctor's name and specialty, normalized once when the
+profile is saved: lower-cased, Arabic diacritics and tatweel removed and letter variants
+folded (أ/إ/آ → ا, ة → ه, ى → ي, ؤ → و, ئ → ي). Search queries get the same normalization.
+
+Searches are answered from an in-process inverted index (token → doctor ids, with the tokens
+kept sorted so a prefix lookup is a binary search), not from icontains over a join, so search
+latency doesn't grow with the number of doctors. Every query term must prefix-match a token of
+the doctor's document; exact token matches rank above prefix matches.
+
+The index is rebuilt when a search document changes (Doctor.save / User.save bump a version
+in the cache) and at least every DOCTOR_SEARCH_INDEX_TTL seconds, for processes that
+don't share that cache.
+
+Facets (?specialty=&gender=&price_range=&min_rating=, see DoctorFacetFilter) filter on
+columns of the doctor_facet_idx index; DoctorFacetsView counts every facet value with one
+grouped aggregation.
+
+Geo search (?near=lat,lng&radius_km=) narrows the doctors to a latitude/longitude bounding
+box first, which the (latitude, longitude) index answers, then computes the exact haversine
+distance for the rows inside the box only.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, When, Q, Value, IntegerField, FloatField, CharField
+from django.db.models.functions import ASin, Cast, Cos, Floor, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+VERSION_CACHE_KEY = 'doctor_search_index_version'
+
+_DIACRITICS = re.compile('[\u064B-\u0652\u0670\u0640]')  # Harakat, superscript alef, tatweel
+_LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+_TOKEN = re.compile(r'\w+')
+
+EXACT_MATCH_SCORE = 2
+PREFIX_MATCH_SCORE = 1
+
+
+def normalize(text):
+    """Search form of a text: lower-cased words without diacritics and letter variants."""
+    text = _DIACRITICS.sub('', (text or '').lower()).translate(_LETTER_VARIANTS)
+    return ' '.join(_TOKEN.findall(text))
+
+
+def doctor_search_document(user, specialty):
+    return normalize(f'{user.first_name} {user.last_name} {specialty}')
+
+
+def bump_search_index():
+    """Mark the index as stale (called on commit after a search document changed)."""
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+class DoctorSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []  # Sorted, for prefix lookups
+        self._postings = {}  # token → set of doctor ids
+        self._version = None
+        self._built_at = None
+
+    def _ensure_fresh(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        ttl = getattr(settings, 'DOCTOR_SEARCH_INDEX_TTL', 300)
+        if self._built_at is not None and version == self._version and time.monotonic() - self._built_at < ttl:
+            return
+        with self._lock:
+            # Another thread may have rebuilt it while we waited
+            if self._built_at is not None and version == self._version and time.monotonic() - self._built_at < ttl:
+                return
+            self.rebuild(version)
+
+    def rebuild(self, version=None):
+        from .models import Doctor
+
+        postings = defaultdict(set)
+        for doctor_id, document in Doctor.objects.values_list('id', 'search_document').iterator(chunk_size=2000):
+            for token in document.split():
+                postings[token].add(doctor_id)
+
+        # Swap in the new structures in one go; searches in flight keep using the old ones
+        self._tokens, self._postings = sorted(postings), dict(postings)
+        self._version, self._built_at = version, time.monotonic()
+
+    def search(self, query):
+        """{doctor id: score} for the doctors matching every term of the query"""
+        self._ensure_fresh()
+        tokens, postings = self._tokens, self._postings
+
+        scores = None
+        for term in normalize(query).split():
+            term_scores = {}
+            i = bisect.bisect_left(tokens, term)
+            while i < len(tokens) and tokens[i].startswith(term):
+                score = EXACT_MATCH_SCORE if tokens[i] == term else PREFIX_MATCH_SCORE
+                for doctor_id in postings[tokens[i]]:
+                    if term_scores.get(doctor_id, 0) < score:
+                        term_scores[doctor_id] = score
+                i += 1
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doctor_id: score + term_scores[doctor_id] for doctor_id, score in scores.items() if doctor_id in term_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+doctor_search_index = DoctorSearchIndex()
+
+
+class DoctorSearchFilter(BaseFilterBackend):
+    """?search= filter for doctor lists, ranked by match quality then the view's ordering."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not normalize(query):
+            return queryset
+
+        scores = doctor_search_index.search(query)
+        if not scores:
+            return queryset.none()
+
+        ids_by_score = defaultdict(list)
+        for doctor_id, score in scores.items():
+            ids_by_score[score].append(doctor_id)
+        rank = Case(
+            *[When(id__in=ids, then=Value(score)) for score, ids in ids_by_score.items()],
+            default=Value(0), output_field=IntegerField(),
+        )
+        return queryset.filter(id__in=list(scores)).annotate(search_rank=rank).order_by('-search_rank', *queryset.query.order_by)
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LATITUDE = 111.045
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 200
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) around the point; the longitude range is None near the poles."""
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    min_lat, max_lat = max(lat - lat_delta, -90), min(lat + lat_delta, 90)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6 or max_lat >= 90 or min_lat <= -90:
+        return min_lat, max_lat, None, None
+    lng_delta = radius_km / (KM_PER_DEGREE_LATITUDE * cos_lat)
+    return min_lat, max_lat, lng - lng_delta, lng + lng_delta
+
+
+def haversine_km(lat, lng):
+    """DB expression: great-circle distance in km from (lat, lng) to the doctor's location"""
+    doctor_lat = Radians(Cast('latitude', FloatField()))
+    doctor_lng = Radians(Cast('longitude', FloatField()))
+    lat, lng = math.radians(lat), math.radians(lng)
+    a = (
+        Power(Sin((doctor_lat - lat) / 2), 2)
+        + math.cos(lat) * Cos(doctor_lat) * Power(Sin((doctor_lng - lng) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+class DoctorNearFilter(BaseFilterBackend):
+    """?near=lat,lng[&radius_km=10]: doctors within the radius, nearest first, with distance_km"""
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get('near')
+        if not near:
+            return queryset
+
+        try:
+            lat, lng = (float(value) for value in near.split(','))
+            radius_km = float(request.query_params.get('radius_km', DEFAULT_RADIUS_KM))
+        except ValueError:
+            raise ValidationError({'near': 'Expected near=<latitude>,<longitude> and a numeric radius_km'})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'near': 'Latitude must be within ±90 and longitude within ±180'})
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            raise ValidationError({'radius_km': f'radius_km must be between 0 and {MAX_RADIUS_KM}'})
+
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+        if min_lng is not None and -180 <= min_lng and max_lng <= 180:
+            # Boxes crossing the antimeridian only filter on latitude
+            queryset = queryset.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+
+        return queryset.annotate(distance_km=haversine_km(lat, lng)).filter(
+            distance_km__lte=radius_km
+        ).order_by('distance_km', *queryset.query.order_by)
+
+
+# (key, min, max) consultation price ranges; max is exclusive, None = no upper bound
+PRICE_RANGES = [
+    ('0-10000', 0, 10000),
+    ('10000-25000', 10000, 25000),
+    ('25000-50000', 25000, 50000),
+    ('50000+', 50000, None),
+]
+RATING_THRESHOLDS = [4, 3, 2, 1]  # "min_rating" facet values
+
+
+def _price_range_q(key):
+    for range_key, low, high in PRICE_RANGES:
+        if range_key == key:
+            q = Q(consultation_price__gte=low)
+            return q & Q(consultation_price__lt=high) if high is not None else q
+    raise ValidationError({'price_range': f'Unknown price range: {key}'})
+
+
+def parse_facets(request):
+    """The selected facet values: {'specialty': [...], 'gender': [...], 'price_range': [...], 'min_rating': n}"""
+    params = request.query_params
+    facets = {}
+    for facet in ('specialty', 'gender', 'price_range'):
+        values = [value for value in params.getlist(facet) if value]
+        if values:
+            facets[facet] = values
+
+    valid_ranges = {key for key, _, _ in PRICE_RANGES}
+    unknown = set(facets.get('price_range', [])) - valid_ranges
+    if unknown:
+        raise ValidationError({'price_range': f"Unknown price range(s): {', '.join(sorted(unknown))}"})
+
+    if params.get('min_rating'):
+        try:
+            facets['min_rating'] = int(params['min_rating'])
+        except ValueError:
+            raise ValidationError({'min_rating': 'Expected a whole number of stars'})
+    return facets
+
+
+def _facet_q(facet, selected):
+    if facet == 'specialty':
+        return Q(specialty__in=selected)
+    if facet == 'gender':
+        return Q(gender__in=selected)
+    if facet == 'price_range':
+        q = Q()
+        for key in selected:
+            q |= _price_range_q(key)
+        return q
+    return Q(rating_avg__gte=selected)
+
+
+def _facet_matches(facet, selected, group):
+    """Same test as _facet_q, on a row of the facet_counts aggregation"""
+    if facet == 'min_rating':
+        return group['rating_floor'] is not None and group['rating_floor'] >= selected
+    return group[facet] in selected
+
+
+class DoctorFacetFilter(BaseFilterBackend):
+    """?specialty=&gender=&price_range=&min_rating= (specialty, gender and price_range repeatable)"""
+
+    def filter_queryset(self, request, queryset, view):
+        for facet, selected in parse_facets(request).items():
+            queryset = queryset.filter(_facet_q(facet, selected))
+        return queryset
+
+
+def facet_counts(queryset, facets):
+    """
+    Doctor counts per facet value for the queryset (already narrowed by search / near).
+    One GROUP BY over (specialty, gender, price range, rating floor); each facet's counts
+    apply the other facets' filters but not its own, so every option shows how many
+    doctors selecting it would give.
+    """
+    price_bucket = Case(
+        *[When(_price_range_q(key), then=Value(key)) for key, _, _ in PRICE_RANGES],
+        default=Value(''), output_field=CharField(),
+    )
+    groups = list(
+        queryset.order_by()
+        .annotate(price_range=price_bucket, rating_floor=Floor('rating_avg'))
+        .values('specialty', 'gender', 'price_range', 'rating_floor')
+        .annotate(count=Count('id'))
+    )
+
+    def count(facet, selected):
+        other_facets = [(name, value) for name, value in facets.items() if name != facet]
+        if facet is not None:
+            other_facets.append((facet, selected))
+        return sum(
+            g['count'] for g in groups
+            if all(_facet_matches(name, value, g) for name, value in other_facets)
+        )
+
+    specialties = sorted(
+        ({'value': value, 'count': count('specialty', [value])} for value in {g['specialty'] for g in groups}),
+        key=lambda item: (-item['count'], item['value']),
+    )
+    return {
+        'total': count(None, None),
+        'specialty': specialties,
+        'gender': [{'value': value, 'count': count('gender', [value])} for value in sorted({g['gender'] for g in groups})],
+        'price_range': [
+            {'value': key, 'min': low, 'max': high, 'count': count('price_range', [key])}
+            for key, low, high in PRICE_RANGES
+        ],
+        'min_rating': [{'value': threshold, 'count': count('min_rating', threshold)} for threshold in RATING_THRESHOLDS],
+    }
@@ -50,13 +50,19 @@ class DoctorListSerializer(serializers.ModelSerializer):
     profile_picture = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     ratings_count = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
     
     class Meta:
         model = Doctor
         fields = ['id', 'first_name', 'last_name', 'email', 'profile_picture', 'specialty', 
                   'consultation_price', 'bio', 'location', 'landmark', 'latitude', 'longitude', 'maps_link',
                   'facebook', 'instagram', 'tiktok', 'twitter', 'youtube',
-                  'is_verified', 'average_rating', 'ratings_count']
+                  'is_verified', 'average_rating', 'ratings_count', 'distance_km']
+    
+    def get_distance_km(self, obj):
+        # Only set for ?near= searches (see users/search.py)
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 2) if distance is not None else None
     
     def get_profile_picture(self, obj):
         if obj.user.profile_picture:
@@ -67,16 +73,11 @@ class DoctorListSerializer(serializers.ModelSerializer):
         return None
     
     def get_average_rating(self, obj):
-        from clinic.models import Rating
-        ratings = Rating.objects.filter(doctor=obj)
-        if ratings.exists():
-            avg = ratings.aggregate(avg=models.Avg('stars'))['avg']
-            return round(avg, 1) if avg else 0
-        return 0
+        # Denormalized on Doctor (see clinic/rating_stats.py)
+        return round(float(obj.rating_avg), 1) if obj.rating_count else 0
     
     def get_ratings_count(self, obj):
-        from clinic.models import Rating
-        return Rating.objects.filter(doctor=obj).count()
+        return obj.rating_count
 
 class PatientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,46 @@
+"""
+Admin statistics bookkeeping (see users/stats.py).
+Bookings have no post_delete receiver: it would run one counter UPDATE per row of a bulk
+delete, so deletes are counted by whoever issues them. Cascades (a deleted user takes its
+profile and bookings with it) are counted once per deleted patient or doctor.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from clinic.models import Booking
+from .models import Doctor, Patient
+from .stats import BOOKINGS, PATIENTS, bump_counter, bump_daily
+
+
+@receiver(post_save, sender=Patient)
+def patient_created(sender, instance, created, **kwargs):
+    if created:
+        bump_counter(PATIENTS)
+        bump_daily(instance.user.date_joined, 'patients_registered')
+
+
+@receiver(post_delete, sender=Patient)
+def patient_deleted(sender, instance, **kwargs):
+    bump_counter(PATIENTS, -1)
+
+
+@receiver(pre_delete, sender=Patient)
+@receiver(pre_delete, sender=Doctor)
+def bookings_cascaded(sender, instance, **kwargs):
+    # The cascade takes the profile's live and archived bookings with it. A booking between
+    # a doctor and a patient deleted together is counted twice; backfill_stats corrects that.
+    bump_counter(BOOKINGS, -(instance.bookings.count() + instance.archived_bookings.count()))
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_created(sender, instance, created, **kwargs):
+    if created:
+        bump_daily(instance.user.date_joined, 'doctors_registered')
+
+
+@receiver(post_save, sender=Booking)
+def booking_created(sender, instance, created, **kwargs):
+    if created:
+        bump_counter(BOOKINGS)
+        bump_daily(instance.created_at, 'bookings_created')
+
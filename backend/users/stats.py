@@ -0,0 +1,89 @@
+"""
+Admin dashboard statistics.
+DailyStats holds one row per day (patients and doctors registered, bookings created) and
+StatCounter the running totals of the large tables (patients, bookings including archived
+ones), so AdminStatsView reads 30 rows and a few counters instead of counting the tables and
+bucketing every recent registration in Python.
+
+Creates are counted by post_save receivers on Patient, Doctor and Booking (users/signals.py).
+Each bump runs after the surrounding transaction commits, so a booking's transaction
+never holds the lock on the shared counter row and a rollback leaves the counters alone.
+Deletes are counted where they happen rather than per row: Booking.delete(), the patient
+and doctor pre_delete receivers (for the bookings a cascade takes with them) and bulk
+deletes such as clinic/archive.py. Queryset update() and bulk_create() bypass all of this,
+so `python manage.py backfill_stats` rebuilds the counters from the tables.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+PATIENTS = 'patients'
+BOOKINGS = 'bookings'  # Booking + ArchivedBooking
+
+
+def _increment(model, lookup, field, delta):
+    if model.objects.filter(**lookup).update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **{field: delta})
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**lookup).update(**{field: F(field) + delta})
+
+
+def bump_counter(name, delta=1):
+    """Add `delta` to a counter once the current transaction commits"""
+    from .models import StatCounter
+    if delta:
+        transaction.on_commit(lambda: _increment(StatCounter, {'name': name}, 'value', delta))
+
+
+def bump_daily(moment, field):
+    """Count one event (field of DailyStats) on the local date of `moment`, once the current transaction commits"""
+    from .models import DailyStats
+    date = timezone.localdate(moment)
+    transaction.on_commit(lambda: _increment(DailyStats, {'date': date}, field, 1))
+
+
+def stat_counters():
+    """{name: value} of every counter"""
+    from .models import StatCounter
+    return dict(StatCounter.objects.values_list('name', 'value'))
+
+
+def rebuild_stats(since=None):
+    """
+    Recompute the counters and the DailyStats rows from the tables; with `since` (a date)
+    only the rows from that day on. Returns the number of DailyStats rows written.
+    """
+    from clinic.models import Booking, ArchivedBooking
+    from .models import Doctor, Patient, DailyStats, StatCounter
+
+    sources = [
+        ('patients_registered', Patient.objects.all(), 'user__date_joined'),
+        ('doctors_registered', Doctor.objects.all(), 'user__date_joined'),
+        ('bookings_created', Booking.objects.all(), 'created_at'),
+        ('bookings_created', ArchivedBooking.objects.all(), 'created_at'),
+    ]
+    days = {}
+    for field, queryset, date_field in sources:
+        if since is not None:
+            queryset = queryset.filter(**{f'{date_field}__date__gte': since})
+        per_day = queryset.annotate(day=TruncDate(date_field)).order_by().values('day').annotate(count=Count('id'))
+        for row in per_day:
+            counts = days.setdefault(row['day'], {})
+            counts[field] = counts.get(field, 0) + row['count']
+
+    with transaction.atomic():
+        rows = DailyStats.objects.all() if since is None else DailyStats.objects.filter(date__gte=since)
+        rows.delete()
+        DailyStats.objects.bulk_create([DailyStats(date=day, **counts) for day, counts in days.items()])
+
+        for name, value in (
+            (PATIENTS, Patient.objects.count()),
+            (BOOKINGS, Booking.objects.count() + ArchivedBooking.objects.count()),
+        ):
+            StatCounter.objects.update_or_create(name=name, defaults={'value': value})
+    return len(days)
@@ -1,3 +1,496 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from clinic.archive import archive_bookings
+from clinic.models import Booking, ArchivedBooking, Rating
+from clinic.rating_stats import recompute_rating_stats
+from core.email_service import (
+    EmailWorker, _claim_batch, get_active_smtp_config, invalidate_smtp_config, render_email, send_dynamic_email
+)
+from .directory_cache import _etag_matches
+from .management.commands.bench_email import PARKED_AT
+from .models import User, Doctor, Patient, SMTPSettings, OutboundEmail, DailyStats
+from .search import normalize
+from .stats import BOOKINGS, PATIENTS, rebuild_stats, stat_counters
+
+
+def make_doctor(email, first_name='Doc', last_name='Test', specialty='Cardiology', **fields):
+    user = User.objects.create_user(
+        email=email, password='x', role=User.Role.DOCTOR, first_name=first_name, last_name=last_name
+    )
+    return Doctor.objects.create(user=user, specialty=specialty, is_verified=True, **fields)
+
+
+@override_settings(EMAIL_MAX_ATTEMPTS=2, EMAIL_BATCH_SIZE=10)
+class EmailOutboxTests(TestCase):
+    """send_dynamic_email only queues; EmailWorker claims, sends and retries (core/email_service.py)"""
+
+    def setUp(self):
+        SMTPSettings.objects.create(host='smtp.invalid', port=25, email_host_user='clinic@example.com',
+                                    email_host_password='x', use_tls=False, is_active=True)
+        invalidate_smtp_config()
+        self.worker = EmailWorker('test')
+
+    def queue(self):
+        return send_dynamic_email('Subject', 'emails/password_changed.html', {'name': 'Pat'}, ['pat@example.com'])
+
+    def process(self, error=None):
+        with mock.patch.object(EmailWorker, 'send', side_effect=error) as send:
+            while self.worker.process_batch():
+                pass
+        return send
+
+    def test_send_dynamic_email_only_queues(self):
+        email = self.queue()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertIn('Pat', email.html_content)
+        self.assertEqual(email.recipients, ['pat@example.com'])
+
+    def test_worker_sends_queued_emails(self):
+        emails = [self.queue() for _ in range(3)]
+        self.assertEqual(self.process().call_count, 3)
+        for email in emails:
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.SENT, 1))
+            self.assertIsNotNone(email.sent_at)
+
+    def test_failures_are_retried_with_backoff_then_dead(self):
+        email = self.queue()
+        with self.assertLogs('core.email_service', 'WARNING'):
+            self.process(error=OSError('refused'))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboundEmail.Status.PENDING, 1, 'refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(self.process().call_count, 0)
+
+        OutboundEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        with self.assertLogs('core.email_service', 'ERROR'):
+            self.process(error=OSError('refused'))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.DEAD, 2))
+
+    def test_nothing_is_sent_without_an_active_configuration(self):
+        SMTPSettings.objects.update(is_active=False)
+        invalidate_smtp_config()
+        email = self.queue()
+        self.assertEqual(self.process().call_count, 0)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+
+    def test_stale_claims_are_picked_up_again(self):
+        email = self.queue()
+        OutboundEmail.objects.filter(id=email.id).update(
+            status=OutboundEmail.Status.SENDING, claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual([claimed.id for claimed in _claim_batch(10)], [email.id])
+        self.assertEqual(_claim_batch(10), [])
+
+
+class BenchmarkIsolationTests(TestCase):
+    """bench_email's rows and configuration never reach the shared email workers"""
+
+    def setUp(self):
+        invalidate_smtp_config()
+        self.sink_config = SMTPSettings(host='127.0.0.1', port=2525, email_host_user='bench@bench.invalid',
+                                        email_host_password='bench', use_tls=False)
+        self.bench_emails = OutboundEmail.objects.filter(from_email='bench@bench.invalid')
+        self.email = OutboundEmail.objects.create(
+            subject='Bench', html_content='x', recipients=['1@bench.invalid'],
+            from_email='bench@bench.invalid', next_attempt_at=PARKED_AT
+        )
+
+    def test_parked_rows_are_only_claimed_by_the_bench_workers(self):
+        self.assertEqual(_claim_batch(10), [])
+        self.assertEqual([email.id for email in _claim_batch(10, self.bench_emails)], [self.email.id])
+
+    def test_bench_worker_uses_its_own_configuration(self):
+        worker = EmailWorker('bench', smtp_config=self.sink_config, outbox=self.bench_emails)
+        with mock.patch.object(EmailWorker, 'send') as send:
+            self.assertTrue(worker.process_batch())
+        self.assertIs(send.call_args.args[1], self.sink_config)
+        self.assertFalse(SMTPSettings.objects.exists())
+
+    def test_failed_bench_rows_stay_parked(self):
+        worker = EmailWorker('bench', smtp_config=self.sink_config, outbox=self.bench_emails)
+        with mock.patch.object(EmailWorker, 'send', side_effect=OSError('refused')), self.assertLogs('core.email_service'):
+            worker.process_batch()
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.next_attempt_at), (OutboundEmail.Status.PENDING, PARKED_AT))
+        self.assertEqual(_claim_batch(10), [])
+
+
+class SMTPConfigCacheTests(TestCase):
+    def setUp(self):
+        invalidate_smtp_config()
+
+    def test_active_config_is_cached_until_saved(self):
+        config = SMTPSettings.objects.create(host='a.invalid', email_host_user='a@example.com', email_host_password='x', is_active=True)
+        self.assertEqual(get_active_smtp_config().host, 'a.invalid')
+
+        # update() bypasses SMTPSettings.save: the cached row is still served
+        SMTPSettings.objects.filter(id=config.id).update(host='b.invalid')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_smtp_config().host, 'a.invalid')
+
+        config.host = 'b.invalid'
+        with self.captureOnCommitCallbacks(execute=True):
+            config.save()
+        self.assertEqual(get_active_smtp_config().host, 'b.invalid')
+
+    def test_templates_render_without_a_lookup(self):
+        html = render_email('emails/password_changed.html', {'name': 'Pat'})
+        self.assertIn('Pat', html)
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_arabic_variants_and_diacritics_are_folded(self):
+        self.assertEqual(normalize('أَحْمَد'), normalize('احمد'))
+        self.assertEqual(normalize('إيمان آمنة'), 'ايمان امنه')
+        self.assertEqual(normalize('مصطفى فؤاد هانئ'), 'مصطفي فواد هاني')
+        self.assertEqual(normalize('عـــلي'), 'علي')
+
+    def test_latin_is_lower_cased_and_tokenized(self):
+        self.assertEqual(normalize('  Dr. Sara-Ali '), 'dr sara ali')
+
+
+class DoctorSearchTests(APITestCase):
+    """?search= on the doctor list goes through the normalized index (users/search.py)"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ahmed = make_doctor('ahmed@example.com', 'أحمد', 'سالم', 'طب الأطفال')
+            self.ahmadi = make_doctor('ahmadi@example.com', 'احمدي', 'كريم', 'جلدية')
+            self.sara = make_doctor('sara@example.com', 'Sara', 'Hassan', 'Dermatology')
+
+    def search(self, query):
+        response = self.client.get('/api/doctors/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_matches_ignore_arabic_variants(self):
+        self.assertEqual(self.search('اَحمد سالم'), [str(self.ahmed.id)])
+        self.assertEqual(self.search('الاطفال'), [str(self.ahmed.id)])
+
+    def test_exact_tokens_rank_above_prefixes(self):
+        self.assertEqual(self.search('احمد'), [str(self.ahmed.id), str(self.ahmadi.id)])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('sara derm'), [str(self.sara.id)])
+        self.assertEqual(self.search('sara جلدية'), [])
+
+    def test_renaming_updates_the_index(self):
+        user = self.sara.user
+        user.first_name = 'Salma'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.search('salma'), [str(self.sara.id)])
+        self.assertEqual(self.search('sara'), [])
+
+
+class NearestDoctorTests(APITestCase):
+    """?near=lat,lng&radius_km= on the doctor list"""
+
+    def setUp(self):
+        cache.clear()
+        # Around Baghdad: ~0, ~5.5 and ~55 km north of the search point
+        with self.captureOnCommitCallbacks(execute=True):
+            self.here = make_doctor('here@example.com', specialty='Cardiology', latitude='33.3152', longitude='44.3661')
+            self.close = make_doctor('close@example.com', specialty='Dermatology', latitude='33.3652', longitude='44.3661')
+            self.far = make_doctor('far@example.com', specialty='Cardiology', latitude='33.8152', longitude='44.3661')
+            make_doctor('nowhere@example.com')
+
+    def near(self, **params):
+        return self.client.get('/api/doctors/', {'near': '33.3152,44.3661', **params})
+
+    def test_nearest_first_within_the_radius(self):
+        results = self.near().data['results']
+        self.assertEqual([row['id'] for row in results], [str(self.here.id), str(self.close.id)])
+        self.assertAlmostEqual(results[0]['distance_km'], 0, places=1)
+        self.assertAlmostEqual(results[1]['distance_km'], 5.56, delta=0.05)
+
+        self.assertEqual(len(self.near(radius_km=100).data['results']), 3)
+
+    def test_combines_with_search(self):
+        results = self.near(radius_km=100, search='cardio').data['results']
+        self.assertEqual([row['id'] for row in results], [str(self.here.id), str(self.far.id)])
+
+    def test_invalid_input(self):
+        self.assertEqual(self.client.get('/api/doctors/', {'near': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/doctors/', {'near': '91,0'}).status_code, 400)
+        self.assertEqual(self.near(radius_km=500).status_code, 400)
+
+
+class DoctorFacetTests(APITestCase):
+    """Facet filters on the doctor list and the counts from /api/doctors/facets/"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap = make_doctor('cheap@example.com', specialty='Cardiology', gender='M',
+                                     consultation_price=5000, rating_avg='4.50')
+            self.mid = make_doctor('mid@example.com', specialty='Cardiology', gender='F',
+                                   consultation_price=20000, rating_avg='3.20')
+            self.dear = make_doctor('dear@example.com', specialty='Dermatology', gender='F',
+                                    consultation_price=60000, rating_avg='2.00')
+
+    def ids(self, **params):
+        response = self.client.get('/api/doctors/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def facets(self, **params):
+        response = self.client.get('/api/doctors/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_filters_combine(self):
+        self.assertEqual(self.ids(specialty='Cardiology'), {str(self.cheap.id), str(self.mid.id)})
+        self.assertEqual(self.ids(specialty='Cardiology', gender='F'), {str(self.mid.id)})
+        self.assertEqual(self.ids(price_range=['0-10000', '50000+']), {str(self.cheap.id), str(self.dear.id)})
+        self.assertEqual(self.ids(min_rating=3), {str(self.cheap.id), str(self.mid.id)})
+
+    def test_counts(self):
+        facets = self.facets()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['specialty'], [{'value': 'Cardiology', 'count': 2}, {'value': 'Dermatology', 'count': 1}])
+        self.assertEqual(facets['gender'], [{'value': 'F', 'count': 2}, {'value': 'M', 'count': 1}])
+        self.assertEqual([item['count'] for item in facets['price_range']], [1, 1, 0, 1])
+        self.assertEqual(facets['min_rating'], [
+            {'value': 4, 'count': 1}, {'value': 3, 'count': 2}, {'value': 2, 'count': 3}, {'value': 1, 'count': 3},
+        ])
+
+    def test_counts_skip_their_own_filter(self):
+        facets = self.facets(gender='F')
+        self.assertEqual(facets['total'], 2)
+        # Gender counts ignore ?gender=, so the other option still shows what it would give
+        self.assertEqual(facets['gender'], [{'value': 'F', 'count': 2}, {'value': 'M', 'count': 1}])
+        self.assertEqual(facets['specialty'], [{'value': 'Cardiology', 'count': 1}, {'value': 'Dermatology', 'count': 1}])
+
+    def test_invalid_values(self):
+        self.assertEqual(self.client.get('/api/doctors/', {'price_range': '1-2'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/doctors/facets/', {'min_rating': 'x'}).status_code, 400)
+
+
+class DoctorBookingPageTests(APITestCase):
+    """/api/doctors/<id>/booking-page/ bundles the profile, rating summary, latest ratings and slots"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor = make_doctor('page@example.com')
+            patient_user = User.objects.create_user(email='page-patient@example.com', password='x', role=User.Role.PATIENT)
+            self.patient = Patient.objects.create(user=patient_user)
+        self.url = f'/api/doctors/{self.doctor.id}/booking-page/'
+
+    def rate(self, *stars, is_public=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            for value in stars:
+                Rating.objects.create(doctor=self.doctor, patient=self.patient, stars=value, is_public=is_public)
+            recompute_rating_stats()
+
+    def get_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_contents(self):
+        self.rate(5, 4, 4)
+        self.rate(1, is_public=False)
+        page = self.get_page()
+
+        self.assertEqual(page['doctor']['id'], str(self.doctor.id))
+        self.assertEqual(page['rating_summary']['count'], 3)
+        self.assertAlmostEqual(page['rating_summary']['average'], 13 / 3, places=2)
+        self.assertEqual(page['rating_summary']['histogram'], {'1': 0, '2': 0, '3': 0, '4': 2, '5': 1})
+        self.assertEqual(sorted(rating['stars'] for rating in page['ratings']), [4, 4, 5])
+        self.assertFalse(page['has_more_ratings'])
+        self.assertEqual(page['slots']['days'], 7)
+        self.assertTrue(page['slots']['is_digital_booking_active'])
+
+    @override_settings(BOOKING_PAGE_RATINGS=2)
+    def test_latest_ratings_only(self):
+        self.rate(5, 4, 3)
+        page = self.get_page()
+        self.assertEqual(len(page['ratings']), 2)
+        self.assertTrue(page['has_more_ratings'])
+
+    def test_query_count_does_not_grow_with_ratings(self):
+        self.rate(5)
+        with CaptureQueriesContext(connection) as few:
+            self.get_page()
+
+        self.rate(*[4] * 9)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.get_page()
+        self.assertEqual(len(many), len(few))
+
+    def test_rating_changes_refresh_the_cached_page(self):
+        self.rate(5)
+        self.assertEqual(self.get_page()['rating_summary']['count'], 1)
+        self.rate(3)
+        self.assertEqual(self.get_page()['rating_summary']['count'], 2)
+
+    def test_booking_closed(self):
+        self.doctor.is_digital_booking_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.save()
+        slots = self.get_page()['slots']
+        self.assertEqual(slots['days'], 0)
+        self.assertEqual(slots['slots'], [])
+
+
+class StatCounterTests(TestCase):
+    """StatCounter / DailyStats follow creates and deletes, including cascades (users/stats.py)"""
+
+    def assertCountersMatchTables(self):
+        self.assertEqual(stat_counters(), {
+            PATIENTS: Patient.objects.count(),
+            BOOKINGS: Booking.objects.count() + ArchivedBooking.objects.count(),
+        })
+
+    def make_doctor_and_patient(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor = make_doctor('doctor-stats@example.com')
+            patient_user = User.objects.create_user(email='patient-stats@example.com', password='x', role=User.Role.PATIENT)
+            return doctor, Patient.objects.create(user=patient_user)
+
+    def make_booking(self, doctor, patient, days_ago):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                doctor=doctor, patient=patient,
+                booking_datetime=timezone.now() - timedelta(days=days_ago), status=Booking.Status.COMPLETED
+            )
+
+    def test_created_rows_are_counted(self):
+        doctor, patient = self.make_doctor_and_patient()
+        self.make_booking(doctor, patient, 1)
+        self.assertCountersMatchTables()
+
+        today = DailyStats.objects.get(date=timezone.localdate())
+        self.assertEqual((today.patients_registered, today.doctors_registered, today.bookings_created), (1, 1, 1))
+
+    def test_counted_only_on_commit(self):
+        doctor, patient = self.make_doctor_and_patient()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(doctor=doctor, patient=patient, booking_datetime=timezone.now())
+        self.assertEqual(stat_counters().get(BOOKINGS, 0), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(stat_counters()[BOOKINGS], 1)
+
+    def test_deletes_are_counted(self):
+        doctor, patient = self.make_doctor_and_patient()
+        booking = self.make_booking(doctor, patient, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertCountersMatchTables()
+
+    def test_cascaded_deletes_are_counted(self):
+        doctor, patient = self.make_doctor_and_patient()
+        self.make_booking(doctor, patient, 1)
+        self.make_booking(doctor, patient, 400)
+        archive_bookings(days=365)
+
+        # Deleting the user takes the patient profile, its booking and its archived booking with it
+        with self.captureOnCommitCallbacks(execute=True):
+            patient.user.delete()
+        self.assertCountersMatchTables()
+        self.assertEqual(stat_counters(), {PATIENTS: 0, BOOKINGS: 0})
+
+    def test_archiving_keeps_the_booking_total(self):
+        doctor, patient = self.make_doctor_and_patient()
+        for days_ago in (400, 401, 2):
+            self.make_booking(doctor, patient, days_ago)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(archive_bookings(days=365), 2)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(stat_counters()[BOOKINGS], 3)
+
+    def test_rebuild(self):
+        doctor, patient = self.make_doctor_and_patient()
+        self.make_booking(doctor, patient, 1)
+        # Queryset deletes are not counted
+        Booking.objects.all().delete()
+        self.assertNotEqual(stat_counters()[BOOKINGS], 0)
+
+        rebuild_stats()
+        self.assertCountersMatchTables()
+
+
+class AdminStatsTests(APITestCase):
+    def test_reads_the_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_doctor('doctor-admin-stats@example.com')
+            patient_user = User.objects.create_user(email='patient-admin-stats@example.com', password='x', role=User.Role.PATIENT)
+            Patient.objects.create(user=patient_user)
+        admin = User.objects.create_superuser(email='admin@example.com', password='x')
+        self.client.force_authenticate(admin)
+
+        response = self.client.get('/api/admin/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['totalPatients'], response.data['totalBookings']), (1, 0))
+        self.assertEqual(len(response.data['registrationHistory']), 30)
+        self.assertEqual(response.data['registrationHistory'][-1]['patients'], 1)
+        self.assertEqual(response.data['registrationHistory'][-1]['doctors'], 1)
+
+
+class EtagMatchTests(SimpleTestCase):
+    etag = '"0123abcd"'
+
+    def test_exact_tag(self):
+        self.assertTrue(_etag_matches(self.etag, '"0123abcd"'))
+
+    def test_weak_and_listed_tags(self):
+        self.assertTrue(_etag_matches(self.etag, 'W/"0123abcd"'))
+        self.assertTrue(_etag_matches(self.etag, '"other", W/"0123abcd"'))
+
+    def test_wildcard(self):
+        self.assertTrue(_etag_matches(self.etag, '*'))
+
+    def test_fragments_do_not_match(self):
+        self.assertFalse(_etag_matches(self.etag, '"0123abcd-old"'))
+        self.assertFalse(_etag_matches(self.etag, '"0123"'))
+        self.assertFalse(_etag_matches(self.etag, ''))
+
+
+class DoctorDirectoryCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        make_doctor('directory@example.com')
+
+    def test_if_none_match(self):
+        response = self.client.get('/api/doctors/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+        self.assertEqual(self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=f'{etag[:-2]}"').status_code, 200)
+
+    def test_profile_edit_changes_the_etag(self):
+        etag = self.client.get('/api/doctors/')['ETag']
+        doctor = Doctor.objects.get()
+        doctor.specialty = 'Dermatology'
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.save()
+
+        response = self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_pages_skip_the_database(self):
+        self.client.get('/api/doctors/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/doctors/').status_code, 200)
@@ -129,11 +129,12 @@ class RegisterUserView(generics.CreateAPIView):
             )
             
             # Create an Admin notification
-            from notifications.models import AdminNotification
-            AdminNotification.objects.create(
-                message=f"New Doctor Registration: Dr. {user.first_name} {user.last_name}",
-                notification_type="NEW_DOCTOR",
-                related_object_id=str(doctor.id)
+            from notifications.views import create_admin_notification
+            from notifications.messages import message
+            create_admin_notification(
+                "NEW_DOCTOR",
+                message('new_doctor', doctor_name=f"{user.first_name} {user.last_name}"),
+                related_object_id=doctor.id
             )
         
         # Determine the base URL for the frontend link
@@ -358,6 +359,8 @@ class UpdateProfileView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 from rest_framework import filters
+from .search import DoctorSearchFilter, DoctorNearFilter, DoctorFacetFilter, parse_facets, facet_counts
+from .directory_cache import DirectoryCacheMixin, booking_page_version
 from rest_framework.pagination import PageNumberPagination
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -365,19 +368,91 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class DoctorListView(generics.ListAPIView):
+class DoctorListView(DirectoryCacheMixin, generics.ListAPIView):
+    directory_cache_name = 'list'
     queryset = Doctor.objects.filter(is_verified=True, user__is_banned=False, user__is_deleted=False).select_related('user').order_by('user__first_name')
     serializer_class = DoctorListSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['user__first_name', 'user__last_name', 'specialty']
+    filter_backends = [DoctorSearchFilter, DoctorNearFilter, DoctorFacetFilter, filters.OrderingFilter]
+    # ?ordering=-rating_avg uses doctor_rating_idx
+    ordering_fields = ['rating_avg', 'rating_count']
 
-class DoctorDetailView(generics.RetrieveAPIView):
+class DoctorFacetsView(DirectoryCacheMixin, generics.ListAPIView):
+    """
+    Facet counts for the doctor directory: takes the same ?search=, ?near= and facet
+    parameters as DoctorListView and returns the number of doctors per specialty, gender,
+    price range and minimum rating.
+    """
+    directory_cache_name = 'facets'
+    queryset = Doctor.objects.filter(is_verified=True, user__is_banned=False, user__is_deleted=False)
+    permission_classes = [permissions.AllowAny]
+    filter_backends = [DoctorSearchFilter, DoctorNearFilter]
+
+    def list(self, request, *args, **kwargs):
+        return Response(facet_counts(self.filter_queryset(self.get_queryset()), parse_facets(request)))
+
+class DoctorDetailView(DirectoryCacheMixin, generics.RetrieveAPIView):
+    directory_cache_name = 'detail'
+    queryset = Doctor.objects.select_related('user').all()
+    serializer_class = DoctorListSerializer
+    permission_classes = [permissions.AllowAny]
+
+class DoctorBookingPageView(DirectoryCacheMixin, generics.RetrieveAPIView):
+    """
+    Everything the booking page shows in one response: the doctor profile, the rating summary
+    with a star histogram, the latest public ratings and the first BOOKING_PAGE_SLOT_DAYS days
+    of slots. The doctor and user row are loaded once and shared by every part, so the
+    response takes a fixed number of queries; it is cached as a unit (see directory_cache.py).
+    """
+    directory_cache_name = 'booking_page'
+    directory_cache_timeout_setting = 'BOOKING_PAGE_CACHE_SECONDS'
+    directory_max_age_setting = 'BOOKING_PAGE_MAX_AGE'
     queryset = Doctor.objects.select_related('user').all()
     serializer_class = DoctorListSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_cache_version(self):
+        return f"{super().get_cache_version()}.{booking_page_version(self.kwargs['pk'])}"
+
+    def retrieve(self, request, *args, **kwargs):
+        from django.conf import settings
+        from clinic.models import Rating
+        from clinic.serializers import RatingSerializer
+        from scheduling.services import DoctorSlotService
+
+        doctor = self.get_object()
+
+        ratings = list(
+            Rating.objects.filter(doctor=doctor, is_public=True).select_related('patient__user')
+            .order_by('-created_at')[:getattr(settings, 'BOOKING_PAGE_RATINGS', 10)]
+        )
+        for rating in ratings:
+            rating.doctor = doctor
+
+        if doctor.is_digital_booking_active:
+            slot_days = min(getattr(settings, 'BOOKING_PAGE_SLOT_DAYS', 7), doctor.booking_visibility_weeks * 7 + 1)
+            slots, blocked_dates = DoctorSlotService.get_slots(doctor, slot_days)
+        else:
+            slot_days, slots, blocked_dates = 0, [], []
+
+        return Response({
+            'doctor': self.get_serializer(doctor).data,
+            'rating_summary': {
+                'average': float(doctor.rating_avg),
+                'count': doctor.rating_count,
+                'histogram': doctor.rating_histogram,
+            },
+            'ratings': RatingSerializer(ratings, many=True).data,
+            'has_more_ratings': doctor.rating_count > len(ratings),
+            'slots': {
+                'days': slot_days,
+                'is_digital_booking_active': doctor.is_digital_booking_active,
+                'slots': slots,
+                'blocked_dates': blocked_dates,
+            },
+        })
+
 class DoctorProfileUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -494,11 +569,12 @@ class DoctorProfileUpdateView(APIView):
             doctor.rejection_reason = ''
             
             # Trigger Admin Notification
-            from notifications.models import AdminNotification
-            AdminNotification.objects.create(
-                message=f"Document Re-upload: Dr. {request.user.first_name} {request.user.last_name} uploaded a new license document.",
-                notification_type="DOCUMENT_REUPLOAD",
-                related_object_id=str(doctor.id)
+            from notifications.views import create_admin_notification
+            from notifications.messages import message
+            create_admin_notification(
+                "DOCUMENT_REUPLOAD",
+                message('document_reupload', doctor_name=f"{request.user.first_name} {request.user.last_name}"),
+                related_object_id=doctor.id
             )
         
         doctor.save()
@@ -786,40 +862,43 @@ class AdminStatsView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
     def get(self, request):
-        """Get system statistics for admin dashboard"""
+        """Get system statistics for admin dashboard (precomputed, see users/stats.py)"""
         from django.utils import timezone
-        from datetime import timedelta
+        from django.db.models import Count, Q
+        from datetime import datetime, time, timedelta
         from clinic.models import Booking
+        from .models import DailyStats
+        from .stats import stat_counters, PATIENTS, BOOKINGS
         
-        today = timezone.now().date()
+        today = timezone.localdate()
         thirty_days_ago = today - timedelta(days=29)
         
+        counters = stat_counters()
+        doctors = Doctor.objects.aggregate(total=Count('id'), verified=Count('id', filter=Q(is_verified=True)))
+        # Range on the booking_datetime index rather than booking_datetime__date
+        day_start = timezone.make_aware(datetime.combine(today, time.min))
         stats = {
-            'totalDoctors': Doctor.objects.count(),
-            'verifiedDoctors': Doctor.objects.filter(is_verified=True).count(),
-            'pendingDoctors': Doctor.objects.filter(is_verified=False).count(),
-            'totalPatients': Patient.objects.count(),
-            'totalBookings': Booking.objects.count() if 'Booking' in dir() else 0,
-            'todayBookings': Booking.objects.filter(booking_datetime__date=today).count() if 'Booking' in dir() else 0,
+            'totalDoctors': doctors['total'],
+            'verifiedDoctors': doctors['verified'],
+            'pendingDoctors': doctors['total'] - doctors['verified'],
+            'totalPatients': counters.get(PATIENTS, 0),
+            'totalBookings': counters.get(BOOKINGS, 0),
+            'todayBookings': Booking.objects.filter(
+                booking_datetime__gte=day_start, booking_datetime__lt=day_start + timedelta(days=1)
+            ).count(),
         }
         
-        # Calculate daily user registrations (patients + doctors) for the past 30 days
-        date_range = [(today - timedelta(days=i)) for i in range(29, -1, -1)]
-        daily_counts = {date.strftime('%m/%d'): {'patients': 0, 'doctors': 0} for date in date_range}
-        
-        recent_patients = Patient.objects.filter(user__date_joined__date__gte=thirty_days_ago)
-        for p in recent_patients:
-            d_str = p.user.date_joined.date().strftime('%m/%d')
-            if d_str in daily_counts:
-                daily_counts[d_str]['patients'] += 1
-                
-        recent_doctors = Doctor.objects.filter(user__date_joined__date__gte=thirty_days_ago)
-        for d in recent_doctors:
-            d_str = d.user.date_joined.date().strftime('%m/%d')
-            if d_str in daily_counts:
-                daily_counts[d_str]['doctors'] += 1
-                
-        registration_history = [{"name": date, "doctors": counts['doctors'], "patients": counts['patients']} for date, counts in daily_counts.items()]
+        # Daily user registrations (patients + doctors) for the past 30 days
+        daily = {row.date: row for row in DailyStats.objects.filter(date__gte=thirty_days_ago, date__lte=today)}
+        registration_history = []
+        for date in [(today - timedelta(days=i)) for i in range(29, -1, -1)]:
+            row = daily.get(date) or DailyStats(date=date)
+            registration_history.append({
+                "name": date.strftime('%m/%d'),
+                "doctors": row.doctors_registered,
+                "patients": row.patients_registered,
+                "bookings": row.bookings_created,
+            })
         stats['registrationHistory'] = registration_history
         
         return Response(stats)
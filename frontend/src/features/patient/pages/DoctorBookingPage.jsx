@@ -35,17 +35,19 @@ const DoctorBookingPage = () => {
         }))
     }
 
-    // Fetch doctor details
-    const { data: doctor, isLoading: doctorLoading } = useQuery({
-        queryKey: ['doctor', doctorId],
+    // Fetch doctor details, rating summary and the first week of slots in one request
+    const { data: bookingPage, isLoading: doctorLoading } = useQuery({
+        queryKey: ['doctorBookingPage', doctorId],
         queryFn: async () => {
-            const res = await api.get(`doctors/${doctorId}/`)
+            const res = await api.get(`doctors/${doctorId}/booking-page/`)
             return res.data
         }
     })
+    const doctor = bookingPage?.doctor
 
-    // Fetch available slots from API - Real-time data, no cache
-    const { data: slotsData, isLoading: slotsLoading } = useQuery({
+    // Fetch all visible slots from API - Real-time data, no cache
+    // (the booking page's first week is shown until they arrive)
+    const { data: allSlotsData, isLoading: allSlotsLoading } = useQuery({
         queryKey: ['doctorSlots', doctorId],
         queryFn: async () => {
             const res = await api.get(`doctors/${doctorId}/slots/`)
@@ -54,6 +56,8 @@ const DoctorBookingPage = () => {
         staleTime: 0,
         refetchOnWindowFocus: true
     })
+    const slotsData = allSlotsData || bookingPage?.slots
+    const slotsLoading = allSlotsLoading && !bookingPage
 
     // Check if patient already has an active booking with this doctor
     const { data: myBookings } = useQuery({
@@ -110,6 +114,7 @@ const DoctorBookingPage = () => {
             queryClient.invalidateQueries({ queryKey: ['myBookings'] })
             queryClient.invalidateQueries({ queryKey: ['myBookingsWithDoctor', doctorId] })
             queryClient.invalidateQueries({ queryKey: ['doctorSlots', doctorId] })
+            queryClient.invalidateQueries({ queryKey: ['doctorBookingPage', doctorId] })
             confetti({
                 particleCount: 100,
                 spread: 70,
@@ -32,14 +32,30 @@ const PatientDashboard = () => {
     const { data: doctorsData, isLoading } = useQuery({
         queryKey: ['doctors', debouncedSearch, selectedSpecialty],
         queryFn: async () => {
-            const searchTerms = [selectedSpecialty, debouncedSearch].filter(Boolean).join(' ')
-            const params = searchTerms ? { search: searchTerms } : {}
+            const params = {}
+            if (debouncedSearch) params.search = debouncedSearch
+            if (selectedSpecialty) params.specialty = selectedSpecialty
             const res = await api.get('doctors/', { params })
             return res.data
         },
         placeholderData: keepPreviousData
     })
 
+    // Doctor count per specialty for the current search
+    const { data: facetsData } = useQuery({
+        queryKey: ['doctor-facets', debouncedSearch],
+        queryFn: async () => {
+            const params = debouncedSearch ? { search: debouncedSearch } : {}
+            const res = await api.get('doctors/facets/', { params })
+            return res.data
+        },
+        placeholderData: keepPreviousData
+    })
+    const specialtyCounts = useMemo(
+        () => Object.fromEntries((facetsData?.specialty || []).map((item) => [item.value, item.count])),
+        [facetsData]
+    )
+
     const allDoctors = doctorsData?.results || doctorsData || []
 
     // Show only 6 random doctors when no search/filter active
@@ -102,6 +118,7 @@ const PatientDashboard = () => {
                                     {MEDICAL_SPECIALTIES.map((spec) => (
                                         <option key={spec.value} value={spec.value}>
                                             {isRtl ? spec.labelAr : spec.labelEn}
+                                            {facetsData ? ` (${specialtyCounts[spec.value] || 0})` : ''}
                                         </option>
                                     ))}
                                 </select>
@@ -140,14 +140,13 @@ const DoctorDashboardNew = () => {
         refetchInterval: 5000,
     })
 
-    // Fetch notifications count - Real-time polling
-    const { data: notifications } = useQuery({
-        queryKey: ['notifications'],
+    // Fetch notifications count - refreshed by the notification stream
+    const { data: unreadNotifications = 0 } = useQuery({
+        queryKey: ['notifications', 'unreadCount'],
         queryFn: async () => {
-            const res = await api.get('notifications/')
-            return res.data
+            const res = await api.get('notifications/unread-count/')
+            return res.data.unread_count
         },
-        refetchInterval: 5000,
     })
 
     // Fetch user profile
@@ -240,7 +239,6 @@ const DoctorDashboardNew = () => {
     const confirmedBookings = todayBookings.filter(b => b.status === 'CONFIRMED')
     const inProgressBookings = todayBookings.filter(b => b.status === 'IN_PROGRESS')
     const completedBookings = todayBookings.filter(b => b.status === 'COMPLETED')
-    const unreadNotifications = notifications?.filter(n => !n.is_read).length || 0
 
     // Performance Calculations
     const nowTime = new Date().getTime()
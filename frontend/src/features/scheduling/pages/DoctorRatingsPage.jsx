@@ -1,5 +1,5 @@
 import React, { useState } from 'react'
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useTranslation } from 'react-i18next'
 import { format } from 'date-fns'
 import Layout from '@/components/layout/Layout'
@@ -82,11 +82,23 @@ const DoctorRatingsPage = () => {
     const [selectedRating, setSelectedRating] = useState(null)
     const [modalOpen, setModalOpen] = useState(false)
 
-    // Fetch doctor's ratings
-    const { data: ratings, isLoading } = useQuery({
+    // Fetch doctor's ratings, newest first, one cursor page at a time
+    const { data: ratingsData, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
         queryKey: ['doctorRatings'],
+        queryFn: async ({ pageParam }) => {
+            const res = await api.get(pageParam || 'clinic/ratings/')
+            return res.data
+        },
+        initialPageParam: null,
+        getNextPageParam: (lastPage) => lastPage.next || undefined
+    })
+    const ratings = ratingsData?.pages.flatMap(page => page.results)
+
+    // Totals over all ratings (precomputed on the server)
+    const { data: summary } = useQuery({
+        queryKey: ['doctorRatingsSummary'],
         queryFn: async () => {
-            const res = await api.get('clinic/ratings/')
+            const res = await api.get('clinic/ratings/summary/')
             return res.data
         }
     })
@@ -102,9 +114,7 @@ const DoctorRatingsPage = () => {
     const pendingResponses = ratings?.filter(r => !r.doctor_response) || []
     const respondedRatings = ratings?.filter(r => r.doctor_response) || []
 
-    const averageRating = ratings?.length
-        ? (ratings.reduce((sum, r) => sum + r.stars, 0) / ratings.length).toFixed(1)
-        : 0
+    const averageRating = summary?.count ? summary.average.toFixed(1) : 0
 
     return (
         <Layout>
@@ -120,7 +130,7 @@ const DoctorRatingsPage = () => {
                 <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
                     <Card>
                         <CardContent className="pt-6 text-center">
-                            <p className="text-3xl font-bold text-primary">{ratings?.length || 0}</p>
+                            <p className="text-3xl font-bold text-primary">{summary?.count || 0}</p>
                             <p className="text-sm text-muted-foreground">{isRtl ? 'إجمالي التقييمات' : 'Total Ratings'}</p>
                         </CardContent>
                     </Card>
@@ -135,7 +145,7 @@ const DoctorRatingsPage = () => {
                     </Card>
                     <Card>
                         <CardContent className="pt-6 text-center">
-                            <p className="text-3xl font-bold text-orange-500">{pendingResponses.length}</p>
+                            <p className="text-3xl font-bold text-orange-500">{summary?.pending_responses ?? pendingResponses.length}</p>
                             <p className="text-sm text-muted-foreground">{isRtl ? 'بانتظار الرد' : 'Pending Response'}</p>
                         </CardContent>
                     </Card>
@@ -224,6 +234,15 @@ const DoctorRatingsPage = () => {
                             </div>
                         )}
 
+                        {hasNextPage && (
+                            <div className="flex justify-center">
+                                <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                                    {isFetchingNextPage && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                                    {isRtl ? 'عرض المزيد' : 'Load more'}
+                                </Button>
+                            </div>
+                        )}
+
                         {ratings?.length === 0 && (
                             <Card>
                                 <CardContent className="py-12 text-center text-muted-foreground">
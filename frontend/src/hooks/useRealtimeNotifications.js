@@ -1,102 +1,161 @@
-import { useEffect } from 'react'
+import { useEffect, useState } from 'react'
 import { useQuery, useQueryClient } from '@tanstack/react-query'
-import { useTranslation } from 'react-i18next'
 import { toast } from 'sonner'
 import api from '@/lib/axios'
+import i18n from '@/lib/i18n'
+
+const STREAM_URL = `http://${window.location.hostname}:8000/api/notifications/stream/`
+const RECONNECT_DELAY = 5000 // 5 seconds
+const POLL_INTERVAL = 15000 // Badge polling while the stream is down (e.g. under runserver)
+
+// ── Module-level singleton stream (shared across ALL hook instances) ──
+// One EventSource per tab, so each notification is toasted only once
+let eventSource = null
+let reconnectTimer = null
+let subscriberCount = 0
+let onNotification = null  // Handler of the most recently mounted instance
+let streamUp = false
+const streamListeners = new Set()  // setState of each mounted instance
+
+const setStreamUp = (up) => {
+    if (streamUp === up) return
+    streamUp = up
+    streamListeners.forEach(listener => listener(up))
+}
+
+const openStream = () => {
+    const token = localStorage.getItem('access_token')
+    if (!token || eventSource) return
+
+    const lang = encodeURIComponent(i18n.language || 'ar')
+    const source = new EventSource(`${STREAM_URL}?token=${encodeURIComponent(token)}&lang=${lang}`)
+    eventSource = source
+    source.onopen = () => setStreamUp(true)
+    source.addEventListener('notification', (e) => {
+        if (onNotification) onNotification(JSON.parse(e.data))
+    })
+    source.onerror = () => {
+        // Poll the badge until the stream is back
+        setStreamUp(false)
+        // The browser retries dropped connections by itself; a closed stream
+        // (e.g. expired token, or a 503 from a WSGI server) is reopened here with the current token
+        if (source.readyState === EventSource.CLOSED && eventSource === source) {
+            eventSource = null
+            clearTimeout(reconnectTimer)
+            reconnectTimer = setTimeout(() => {
+                if (subscriberCount > 0) openStream()
+            }, RECONNECT_DELAY)
+        }
+    }
+}
 
-const POLL_INTERVAL = 5000 // 5 seconds
+const closeStream = () => {
+    clearTimeout(reconnectTimer)
+    if (eventSource) {
+        eventSource.close()
+        eventSource = null
+    }
+    setStreamUp(false)
+}
 
-// ── Module-level singleton tracking (shared across ALL hook instances) ──
-// This prevents duplicate toasts when the hook is used in multiple components
-let prevNotifIds = null  // null = first load, Set = loaded
-let toastLock = false     // Prevent race conditions between instances
+// Reconnect so streamed messages follow the new UI language
+i18n.on('languageChanged', () => {
+    if (eventSource) {
+        closeStream()
+        openStream()
+    }
+})
 
 /**
- * Shared hook for real-time notification polling.
- * - Polls every 5 seconds for new notifications
+ * Shared hook for real-time notifications.
+ * - Receives new notifications over a Server-Sent Events stream; while the stream is
+ *   down or unavailable it polls the unread count and refreshes the inbox when it changes
  * - Shows a toast when a NEW notification arrives (only once, even if used in multiple components)
  * - Returns unread count and notifications data
  */
 export const useRealtimeNotifications = () => {
-    const { i18n } = useTranslation()
-    const isRtl = i18n.language === 'ar'
     const queryClient = useQueryClient()
     const token = localStorage.getItem('access_token')
+    const [isStreaming, setIsStreaming] = useState(streamUp)
 
     const { data: notifications } = useQuery({
         queryKey: ['notifications'],
         queryFn: async () => {
             const res = await api.get('notifications/')
-            return res.data
+            return res.data.results
         },
-        refetchInterval: POLL_INTERVAL,
-        refetchIntervalInBackground: false,
         enabled: !!token,
-        staleTime: 0,
     })
 
-    const unreadCount = notifications?.filter(n => !n.is_read).length || 0
+    // Badge count comes from the cached counter endpoint, not from the (paginated) list
+    const { data: unreadCount = 0 } = useQuery({
+        queryKey: ['notifications', 'unreadCount'],
+        queryFn: async () => {
+            const res = await api.get('notifications/unread-count/')
+            return res.data.unread_count
+        },
+        enabled: !!token,
+        refetchInterval: isStreaming ? false : POLL_INTERVAL,
+        refetchIntervalInBackground: false,
+    })
 
-    // Detect new notifications and show toast (singleton — only first hook instance processes)
+    // Without the stream, a changed badge count is the signal that something new arrived
     useEffect(() => {
-        if (!notifications || notifications.length === 0) return
-        if (toastLock) return // Another instance is already processing
-
-        toastLock = true
-
-        try {
-            const currentIds = new Set(notifications.map(n => n.id))
+        if (!isStreaming) {
+            queryClient.invalidateQueries({
+                predicate: (query) => query.queryKey[0] === 'notifications' && query.queryKey[1] !== 'unreadCount',
+            })
+        }
+    }, [unreadCount])
 
-            // First load — just store IDs, don't toast
-            if (prevNotifIds === null) {
-                prevNotifIds = currentIds
-                return
-            }
+    useEffect(() => {
+        if (!token) return
+
+        onNotification = (notif) => {
+            const icon = getNotifIcon(notif.notification_type)
+            toast(notif.message, {
+                icon,
+                duration: 6000,
+                position: 'top-center',
+            })
+
+            // Refresh the inbox and badge, and the booking queries so dashboards update
+            queryClient.invalidateQueries({ queryKey: ['notifications'] })
+            queryClient.invalidateQueries({ queryKey: ['doctorBookings'] })
+            queryClient.invalidateQueries({ queryKey: ['scheduleBookings'] })
+            queryClient.invalidateQueries({ queryKey: ['secretaryBookings'] })
+            queryClient.invalidateQueries({ queryKey: ['myBookings'] })
+            queryClient.invalidateQueries({ queryKey: ['myBookingsWithDoctor'] })
+        }
 
-            // Find truly new notifications
-            const newNotifs = notifications.filter(n => !prevNotifIds.has(n.id))
-
-            if (newNotifs.length > 0) {
-                // Show toast for each new notification (max 3)
-                newNotifs.slice(0, 3).forEach(notif => {
-                    const icon = getNotifIcon(notif.notification_type)
-                    toast(notif.message, {
-                        icon,
-                        duration: 6000,
-                        position: 'top-center',
-                    })
-                })
-
-                if (newNotifs.length > 3) {
-                    toast.info(
-                        isRtl
-                            ? `و ${newNotifs.length - 3} إشعارات أخرى`
-                            : `And ${newNotifs.length - 3} more notifications`,
-                        { duration: 4000 }
-                    )
-                }
-
-                // Invalidate booking queries so dashboards update
-                queryClient.invalidateQueries({ queryKey: ['doctorBookings'] })
-                queryClient.invalidateQueries({ queryKey: ['scheduleBookings'] })
-                queryClient.invalidateQueries({ queryKey: ['secretaryBookings'] })
-                queryClient.invalidateQueries({ queryKey: ['myBookings'] })
-                queryClient.invalidateQueries({ queryKey: ['myBookingsWithDoctor'] })
+        // Messages are rendered in the UI language: refetch when it changes
+        const onLanguageChanged = () => {
+            queryClient.invalidateQueries({ queryKey: ['notifications'] })
+        }
+        i18n.on('languageChanged', onLanguageChanged)
+
+        streamListeners.add(setIsStreaming)
+        setIsStreaming(streamUp)
+        subscriberCount += 1
+        openStream()
+
+        return () => {
+            streamListeners.delete(setIsStreaming)
+            i18n.off('languageChanged', onLanguageChanged)
+            subscriberCount -= 1
+            if (subscriberCount === 0) {
+                closeStream()
+                onNotification = null
             }
-
-            prevNotifIds = currentIds
-        } finally {
-            toastLock = false
         }
-    }, [notifications])
+    }, [token])
 
     return { notifications, unreadCount }
 }
 
-// Reset tracking on logout (call this when user logs out)
+// Close the stream on logout (call this when user logs out)
 export const resetNotificationTracking = () => {
-    prevNotifIds = null
-    toastLock = false
+    closeStream()
 }
 
 function getNotifIcon(type) {
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import i18n from '@/lib/i18n';
 
 const api = axios.create({
     baseURL: `http://${window.location.hostname}:8000/api/`,
@@ -12,6 +13,10 @@ api.interceptors.request.use((config) => {
     if (token) {
         config.headers.Authorization = `Bearer ${token}`;
     }
+    // Notifications are rendered server-side in the UI language
+    if (i18n.language) {
+        config.headers['Accept-Language'] = i18n.language;
+    }
     return config;
 }, (error) => {
     return Promise.reject(error);
@@ -54,6 +54,22 @@ const MyBookingsPage = () => {
         refetchInterval: 5000,
     })
 
+    // Older finished bookings live in the archive table: fetch them once from the history endpoint
+    const { data: archivedBookings } = useQuery({
+        queryKey: ['myBookings', 'history'],
+        queryFn: async () => {
+            const archived = []
+            let cursor = null
+            do {
+                const res = await api.get('clinic/bookings/history/', { params: { archived: 1, limit: 200, cursor } })
+                archived.push(...res.data.results)
+                cursor = res.data.next_cursor
+            } while (cursor)
+            return archived
+        },
+        staleTime: 5 * 60 * 1000,
+    })
+
     // Fetch patient's existing ratings to check which doctors are already rated
     const { data: myRatings } = useQuery({
         queryKey: ['myRatings'],
@@ -70,9 +86,10 @@ const MyBookingsPage = () => {
     ]
 
     // Handle potential stale cache (paginated object) vs new fetch (array)
-    const safeBookings = Array.isArray(bookings)
-        ? bookings
-        : (bookings?.results || [])
+    const safeBookings = [
+        ...(Array.isArray(bookings) ? bookings : (bookings?.results || [])),
+        ...(archivedBookings || []),
+    ]
 
     // Helper: determine effective status (treat past active bookings correctly)
     const getEffectiveStatus = (booking) => {
@@ -1,5 +1,5 @@
 import React, { useState } from 'react'
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useTranslation } from 'react-i18next'
 import { formatDistanceToNow, format, isToday, isYesterday } from 'date-fns'
 import { ar, enUS } from 'date-fns/locale'
@@ -26,15 +26,17 @@ const NotificationsPage = () => {
     const [rejectMode, setRejectMode] = useState('auto') // 'auto' or 'custom'
     const [customMessage, setCustomMessage] = useState('')
 
-    // Fetch real notifications from API - Real-time polling
-    const { data: notifications, isLoading, error } = useQuery({
-        queryKey: ['notifications'],
-        queryFn: async () => {
-            const res = await api.get('notifications/')
+    // Fetch real notifications from API, one cursor page at a time - refreshed by the notification stream
+    const { data: notificationsData, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+        queryKey: ['notifications', 'inbox'],
+        queryFn: async ({ pageParam }) => {
+            const res = await api.get(pageParam || 'notifications/')
             return res.data
         },
-        refetchInterval: 5000,
+        initialPageParam: null,
+        getNextPageParam: (lastPage) => lastPage.next || undefined
     })
+    const notifications = notificationsData?.pages.flatMap(page => page.results)
 
     // Mark all as read mutation
     const markAllMutation = useMutation({
@@ -379,6 +381,18 @@ const NotificationsPage = () => {
             )
         }
 
+        // Digest of several bookings: they are handled from the schedule, not one by one here
+        if (notif.notification_type === 'NEW_BOOKING' && notif.event_count > 1) {
+            return (
+                <div className="flex items-center gap-2 mt-3 pt-2 border-t border-border">
+                    <Calendar className="w-4 h-4 text-muted-foreground" />
+                    <span className="text-sm text-muted-foreground">
+                        {isRtl ? `${notif.event_count} حجوزات - راجعها من جدول المواعيد` : `${notif.event_count} bookings - review them in the schedule`}
+                    </span>
+                </div>
+            )
+        }
+
         // Show buttons only for NEW_BOOKING with related_object_id and booking is still PENDING
         if (notif.related_object_id && notif.notification_type === 'NEW_BOOKING') {
             // Check if booking is still pending (from backend)
@@ -444,7 +458,13 @@ const NotificationsPage = () => {
         return null
     }
 
-    const unreadCount = notifications?.filter(n => !n.is_read).length || 0
+    const { data: unreadCount = 0 } = useQuery({
+        queryKey: ['notifications', 'unreadCount'],
+        queryFn: async () => {
+            const res = await api.get('notifications/unread-count/')
+            return res.data.unread_count
+        },
+    })
 
     return (
         <Layout>
@@ -514,8 +534,8 @@ const NotificationsPage = () => {
                                                     <span className={`text-xs px-2 py-0.5 rounded-full ${!notif.is_read ? 'bg-primary/20 text-primary' : 'bg-muted text-muted-foreground'}`}>
                                                         {getNotificationTypeLabel(notif.notification_type)}
                                                     </span>
-                                                    <span className="text-xs text-muted-foreground" title={format(new Date(notif.created_at), 'yyyy-MM-dd HH:mm:ss')}>
-                                                        {formatNotificationDate(notif.created_at)}
+                                                    <span className="text-xs text-muted-foreground" title={format(new Date(notif.last_event_at || notif.created_at), 'yyyy-MM-dd HH:mm:ss')}>
+                                                        {formatNotificationDate(notif.last_event_at || notif.created_at)}
                                                     </span>
                                                 </div>
                                                 <p className={`text-sm mt-2 ${!notif.is_read ? 'font-medium' : 'text-muted-foreground'}`}>
@@ -533,6 +553,15 @@ const NotificationsPage = () => {
                                 </Card>
                             )
                         })}
+
+                        {hasNextPage && (
+                            <div className="flex justify-center">
+                                <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                                    {isFetchingNextPage && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                                    {isRtl ? 'عرض المزيد' : 'Load more'}
+                                </Button>
+                            </div>
+                        )}
                     </div>
                 )}
             </div>